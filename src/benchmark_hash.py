@@ -0,0 +1,71 @@
+from utils.hash_strategies import HASH_STRATEGIES, FIELD_SEPARATOR, get_hash_strategy, build_field_normalizer
+import random
+import sys
+import time
+
+# VENTA-like record layout: (name, length)
+FIELDS = [
+    ('NO_REFEREN', 10), ('FECHA', 8), ('TIENDA', 4), ('CAJA', 3), ('CAJERO', 6), ('CLIENTE', 10),
+    ('TOTAL', 12), ('IMPUESTO', 12), ('DESCUENTO', 12), ('FORMA_PAGO', 2), ('NOTA_FOLIO', 8),
+    ('OBSERVA', 60), ('ESTADO', 1)
+]
+HASH_FIELDS = ['FECHA', 'TIENDA', 'NO_REFEREN']
+
+
+def build_records(count):
+    """Random fixed-width records with the deletion flag, padded like a DBF"""
+    rng = random.Random(1)
+    records = []
+    for recno in range(1, count + 1):
+        values = [
+            f"R{recno}", f"2024{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}", f"T{rng.randint(1, 40)}",
+            str(rng.randint(1, 9)), f"C{rng.randint(1, 500)}", f"CL{rng.randint(1, 99999)}",
+            f"{rng.uniform(1, 99999):.2f}", f"{rng.uniform(1, 9999):.2f}", f"{rng.uniform(0, 999):.2f}",
+            str(rng.randint(1, 5)), f"N{recno}", "VENTA DE MOSTRADOR" if rng.random() < 0.7 else "",
+            rng.choice("ACX")
+        ]
+        body = b''.join(value.encode('cp1252').ljust(length)[:length] for value, (_, length) in zip(values, FIELDS))
+        records.append(memoryview(b' ' + body))
+    return records
+
+
+def field_slices(names):
+    offsets = {}
+    offset = 1
+    for name, length in FIELDS:
+        offsets[name] = (offset, offset + length)
+        offset += length
+    return [offsets[name] for name in names]
+
+
+def bench(label, function, records, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(records)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<32} {best:8.3f}s {len(records) / best:12.0f} records/s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    records = build_records(count)
+    normalize = build_field_normalizer(field_slices(HASH_FIELDS), FIELD_SEPARATOR)
+    print(f"{count} records of {len(records[0])} bytes, hash_fields {HASH_FIELDS}")
+
+    strategies = [name for name in HASH_STRATEGIES] + [{'name': 'blake2b', 'digest_size': 8}]
+    for config in strategies:
+        digest = get_hash_strategy(config)
+        print(f"\n{config}")
+        # hash_comparador: the whole record without the deletion flag
+        bench("hash_comparador", lambda rows: [digest(record[1:]) for record in rows], records)
+        # hash_id of composed_hash tables: precompiled normalizer over the raw field bytes
+        bench("hash_id (hash_fields)", lambda rows: [digest(normalize(record)) for record in rows], records)
+
+    print("\nnormalizer only")
+    bench("hash_fields normalizer", lambda rows: [normalize(record) for record in rows], records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+from utils.database_manager import DatabaseManager
+from utils.synthetic_dbf import SyntheticDataset, TABLE_LAYOUTS
+from utils.upload_stub import StubUploadServer
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+HELPER_TABLES = ['reintentos', 'api_log', 'estado_dbf']
+# Slower than the compared run by more than this ratio is reported as a regression
+REGRESSION_RATIO = 1.10
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sync pipeline benchmark over synthetic point of sale DBF files")
+    parser.add_argument('--sizes', default='10000,100000', help="records per table, comma separated (10k to 10M)")
+    parser.add_argument('--tables', default=','.join(TABLE_LAYOUTS), help="tables to generate and sync")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--change', type=float, default=0.01, help="fraction of records changed before the diff run")
+    parser.add_argument('--append', type=float, default=0.01, help="fraction of records appended before the diff run")
+    parser.add_argument('--delete', type=float, default=0.005, help="fraction flagged deleted before the deletion run")
+    parser.add_argument('--pack', type=float, default=0.002, help="fraction removed from the file before the deletion run")
+    parser.add_argument('--no-upload', action='store_true', help="skip the upload stage")
+    parser.add_argument('--workdir', default=None, help="folder for the DBF files and databases (temporary by default)")
+    parser.add_argument('--output', default='benchmark_results.json', help="where the JSON results are written")
+    parser.add_argument('--compare', default=None, help="earlier results file to compare against")
+    return parser.parse_args()
+
+
+def code_version():
+    """git describe of the tree being measured, None outside a checkout"""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_setup(folder, dbf_folder, upload_url):
+    """Copy of setup.json pointing the database, the DBF folder and the upload url at the benchmark"""
+    utils_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'utils')
+    with open(os.path.join(utils_dir, 'setup.json'), 'r') as file:
+        setup = json.load(file)
+
+    setup['db'] = dict(setup.get('db', {}), name='benchmark', path=folder)
+    # Full scans every run, so the diff stages always compare the whole file
+    setup['dbf'] = dict(setup.get('dbf', {}), path=dbf_folder, tail_scan=False)
+    setup['upload'] = dict(setup.get('upload', {}), url=upload_url, poll_interval=0.05)
+    setup['logging'] = dict(setup.get('logging', {}), metrics_path=None)
+
+    path = os.path.join(folder, 'setup.json')
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(setup, file, indent=2, ensure_ascii=False)
+    return path
+
+
+def run_stage(results, db_manager, size, stage, function):
+    db_manager.metrics.reset()
+    start = time.perf_counter()
+    ok = function()
+    seconds = time.perf_counter() - start
+    summary = db_manager.metrics.summary()
+    results.append({
+        'size': size,
+        'stage': stage,
+        'ok': bool(ok),
+        'seconds': round(seconds, 6),
+        'rows': summary['rows'],
+        'statements': summary['statements'],
+        'phases': summary['phases']
+    })
+    print(f"  {stage:<18} {seconds:9.3f}s {summary['rows']:12d} rows {'' if ok else ' FAILED'}")
+
+
+def run_size(results, args, size, tables, upload_url):
+    folder = os.path.join(args.workdir, str(size))
+    os.makedirs(folder, exist_ok=True)
+    db_path = os.path.join(folder, 'benchmark.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    dataset = SyntheticDataset(os.path.join(folder, 'dbf'), records=size, seed=args.seed, tables=tables)
+    setup_path = write_setup(folder, dataset.folder, upload_url)
+    print(f"\n{size} records per table: {', '.join(tables)}")
+
+    def generate(label):
+        start = time.perf_counter()
+        counts = dataset.write()
+        print(f"  {'generate ' + label:<18} {time.perf_counter() - start:9.3f}s {sum(counts.values()):12d} records")
+
+    with DatabaseManager(setup_path=setup_path) as db_manager:
+        if not db_manager.connect_or_create_db():
+            raise RuntimeError(f"Cannot open benchmark database in {folder}")
+
+        run_stage(results, db_manager, size, 'schema',
+                  lambda: db_manager.sync_schema(tables + HELPER_TABLES) is not None)
+
+        generate('run 0')
+        run_stage(results, db_manager, size, 'initial_load', lambda: db_manager.scan_tables(tables))
+
+        dataset.advance(change=args.change, append=args.append)
+        generate('run 1')
+        run_stage(results, db_manager, size, 'incremental_diff', lambda: db_manager.scan_tables(tables))
+
+        dataset.advance(delete=args.delete, pack=args.pack)
+        generate('run 2')
+        run_stage(results, db_manager, size, 'deletion_pass', lambda: db_manager.scan_tables(tables))
+
+        if upload_url:
+            run_stage(results, db_manager, size, 'upload', lambda: db_manager.upload_tables(tables))
+
+
+def compare(results, previous_path):
+    """Print seconds per (size, stage) against an earlier results file"""
+    with open(previous_path, 'r', encoding='utf-8') as file:
+        previous = json.load(file)
+    before = {(item['size'], item['stage']): item for item in previous.get('results', [])}
+
+    print(f"\nCompared with {previous_path} ({previous.get('version')}, {previous.get('created')})")
+    regressions = 0
+    for item in results:
+        old = before.get((item['size'], item['stage']))
+        if not old or not old['seconds']:
+            continue
+        ratio = item['seconds'] / old['seconds']
+        flag = ''
+        if ratio > REGRESSION_RATIO:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"  {item['size']:>9} {item['stage']:<18} {old['seconds']:9.3f}s -> {item['seconds']:9.3f}s "
+              f"x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    tables = [table for table in args.tables.split(',') if table]
+    unknown = [table for table in tables if table not in TABLE_LAYOUTS]
+    if unknown:
+        sys.exit(f"No synthetic layout for {unknown}, options: {list(TABLE_LAYOUTS)}")
+
+    if args.workdir is None:
+        args.workdir = tempfile.mkdtemp(prefix='smart-dbf-bench-')
+    print(f"Working in {args.workdir}")
+
+    results = []
+    stub = None if args.no_upload else StubUploadServer()
+    try:
+        upload_url = stub.start() if stub else None
+        for size in sizes:
+            run_size(results, args, size, tables, upload_url)
+    finally:
+        if stub:
+            stub.stop()
+
+    report = {
+        'version': code_version(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'parameters': {
+            'sizes': sizes, 'tables': tables, 'seed': args.seed, 'change': args.change,
+            'append': args.append, 'delete': args.delete, 'pack': args.pack
+        },
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+from utils.database_manager import DatabaseManager
+from utils.table_list_manager import TableListManager
+from utils.instrumentation import configure_logging
+from utils.watcher import WatchManager
+import argparse
+import signal
+import sys
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Keep the tracking tables in sync while the DBF files change")
+    parser.add_argument('--setup', default=None, help="setup.json to use (utils/setup.json by default)")
+    parser.add_argument('--cycles', type=int, default=None, help="stop after this many poll cycles")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    configure_logging(TableListManager(args.setup, None).get_logging_params())
+
+    with DatabaseManager(setup_path=args.setup) as db_manager:
+        if not db_manager.connect_or_create_db():
+            sys.exit("Cannot open the database")
+
+        watcher = WatchManager(db_manager)
+        # Finish the table being synced, then exit
+        signal.signal(signal.SIGINT, lambda signum, frame: watcher.stop())
+        signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+        watcher.run(max_cycles=args.cycles)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,8 +13,8 @@ for spec in specs:
             if col.get('pk', False):
                 print(f"  - {col['name']}: pk={col.get('pk')}")
         
-        # Simulate what create_table does
-        columns = spec['table_columns']
-        pk_columns = [col.get('name') for col in columns if col.get('pk', False)]
+        # Resolved when the spec is compiled, create_table uses the same list
+        pk_columns = list(spec.pk)
         print(f"\nPK columns found: {pk_columns}")
         print(f"Number of PK columns: {len(pk_columns)}")
+        print(f"\n{spec.create_sql}")
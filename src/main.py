@@ -1,9 +1,13 @@
 from utils.table_spec_manager import TableSpecManager
 from utils.table_list_manager import TableListManager
 from utils.database_manager import DatabaseManager
+from utils.instrumentation import configure_logging
 import json
 
 def main():
+    # Leveled logging for the managers, configured from the logging section of setup.json
+    configure_logging(TableListManager(None, None).get_logging_params())
+    
     # Test database operations
     print("=== Database Manager Test ===")
     
@@ -41,7 +45,7 @@ def main():
         if spec:
             print(f"\nTable: {spec['name']}")
             print("Complete JSON object:")
-            print(json.dumps(spec, indent=2, ensure_ascii=False))
+            print(json.dumps(spec.to_dict(), indent=2, ensure_ascii=False))
         else:
             print(f"Failed to get spec for table")
         print("-" * 50)
@@ -0,0 +1,24 @@
+import json
+import os
+import sys
+
+import pytest
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC)
+
+
+@pytest.fixture
+def make_setup(tmp_path):
+    """Writes a copy of utils/setup.json pointed at tmp_path, with the given sections merged in"""
+    def make(**sections):
+        with open(os.path.join(SRC, 'utils', 'setup.json'), encoding='utf-8') as file:
+            setup = json.load(file)
+        setup['db'] = dict(setup['db'], name='test', path=str(tmp_path))
+        setup['dbf'] = dict(setup['dbf'], path=str(tmp_path / 'dbf'))
+        for name, values in sections.items():
+            setup[name] = dict(setup.get(name) or {}, **values)
+        path = tmp_path / 'setup.json'
+        path.write_text(json.dumps(setup), encoding='utf-8')
+        return str(path)
+    return make
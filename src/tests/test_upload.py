@@ -0,0 +1,116 @@
+import pytest
+
+from utils.database_manager import DatabaseManager
+from utils.retry_scheduler import RetryScheduler
+from utils.synthetic_dbf import SyntheticDataset
+from utils.upload_stub import StubUploadServer
+from utils.uploader import UploadManager
+
+BATCH = 'batch_001'
+RECORDS = 50
+# Nothing listens on the discard port
+UNREACHABLE_URL = 'http://127.0.0.1:9'
+
+
+@pytest.fixture
+def db_manager(tmp_path, make_setup):
+    """Database with VENTA scanned from a synthetic DBF: RECORDS pending rows"""
+    SyntheticDataset(str(tmp_path / 'dbf'), records=RECORDS, seed=5, tables=['VENTA']).write()
+    with DatabaseManager(setup_path=make_setup(batch_version={'id': BATCH})) as db_manager:
+        assert db_manager.connect_or_create_db()
+        db_manager.sync_schema(['VENTA', 'estado_dbf', 'reintentos', 'api_log'])
+        assert db_manager.scan_table(db_manager.spec_manager.get_spec(['VENTA'])[0])['new'] == RECORDS
+        yield db_manager
+
+
+@pytest.fixture
+def spec(db_manager):
+    return db_manager.spec_manager.get_spec(['VENTA'])[0]
+
+
+def uploader(db_manager, url, **options):
+    options = dict({'batch_size': 20, 'poll_interval': 0.01, 'poll_timeout': 5, 'timeout': 2}, **options)
+    return UploadManager(db_manager, url, retry_scheduler=RetryScheduler(db_manager), **options)
+
+
+def query(db_manager, sql):
+    return [tuple(row) for row in db_manager.connection.execute(sql)]
+
+
+def statuses(db_manager):
+    return dict(query(db_manager, "SELECT status, COUNT(*) FROM VENTA GROUP BY status"))
+
+
+def test_upload_and_poll(db_manager, spec):
+    with StubUploadServer(delay=0.05, fail_every=10) as server:
+        counts = uploader(db_manager, server.url).run([spec], BATCH)['VENTA']
+
+    assert counts['batches'] == 3 and server.posts == 3
+    assert (counts['uploaded'], counts['rejected'], counts['unresolved'], counts['errors']) == (45, 5, 0, 0)
+    assert statuses(db_manager) == {1: 45, 2: 5}
+    assert query(db_manager, "SELECT COUNT(*) FROM VENTA WHERE status = 1 AND (psql_id = 0 OR id_cola = 0)") == [(0,)]
+    assert query(db_manager, "SELECT COUNT(*), SUM(con_error) FROM api_log") == [(3, 3)]
+    assert query(db_manager, "SELECT COUNT(*) FROM reintentos WHERE status = 0") == [(5,)]
+
+
+def test_unresolved_batches_are_resumed_by_id_cola(db_manager, spec):
+    with StubUploadServer(delay=0.3) as server:
+        counts = uploader(db_manager, server.url, poll_timeout=0).run([spec], BATCH)['VENTA']
+        assert counts['unresolved'] == RECORDS
+        assert query(db_manager, "SELECT COUNT(*) FROM VENTA WHERE status = 0 AND id_cola <> 0") == [(RECORDS,)]
+        # In flight rows are polled, not posted again
+        assert db_manager.fetch_pending(spec, BATCH) == []
+
+        server.delay = 0
+        for batch in server.batches.values():
+            batch['ready_at'] = 0
+        counts = uploader(db_manager, server.url).run([spec], BATCH)['VENTA']
+
+    assert server.posts == 3
+    assert (counts['resumed'], counts['batches'], counts['uploaded']) == (3, 0, RECORDS)
+    assert statuses(db_manager) == {1: RECORDS}
+
+
+def test_unknown_id_cola_is_posted_again(db_manager, spec):
+    db_manager.connection.execute("UPDATE VENTA SET id_cola = 999")
+    db_manager.connection.commit()
+
+    with StubUploadServer() as server:
+        counts = uploader(db_manager, server.url, batch_size=100).run([spec], BATCH)['VENTA']
+
+    # The 404 clears the queue id, so the rows are paged and posted in the same run
+    assert (counts['resumed'], counts['batches'], counts['uploaded']) == (1, 1, RECORDS)
+    assert server.posts == 1
+    assert statuses(db_manager) == {1: RECORDS}
+    assert query(db_manager, "SELECT COUNT(*) FROM VENTA WHERE id_cola = 999") == [(0,)]
+
+
+def test_rejected_records_are_claimed_and_retried(db_manager, spec):
+    with StubUploadServer(fail_every=5) as server:
+        uploader(db_manager, server.url).run([spec], BATCH)
+        assert statuses(db_manager) == {1: 40, 2: 10}
+
+        scheduler = RetryScheduler(db_manager)
+        claimed = scheduler.claim_due(tables=['VENTA'])
+        assert len(claimed['VENTA']) == 10
+        # Leased: a second claim finds nothing due
+        assert scheduler.claim_due(tables=['VENTA']) == {}
+
+        server.fail_every = 0
+        manager = UploadManager(db_manager, server.url, poll_interval=0.01, retry_scheduler=scheduler)
+        counts = manager.run_retries([spec], claimed, BATCH)['VENTA']
+
+    assert (counts['uploaded'], counts['completed'], counts['rescheduled']) == (10, 10, 0)
+    assert statuses(db_manager) == {1: RECORDS}
+    assert query(db_manager, "SELECT status, intentos, COUNT(*) FROM reintentos GROUP BY 1, 2") == [(1, 1, 10)]
+    assert scheduler.due_count() == 0
+
+
+def test_unreachable_server_rejects_the_batches(db_manager, spec):
+    counts = uploader(db_manager, UNREACHABLE_URL).run([spec], BATCH)['VENTA']
+
+    assert counts is not None
+    assert (counts['batches'], counts['rejected'], counts['errors']) == (3, RECORDS, 0)
+    assert statuses(db_manager) == {2: RECORDS}
+    assert query(db_manager, "SELECT COUNT(*), SUM(con_error), SUM(respuesta_post IS NULL) FROM api_log") == [(3, 3, 3)]
+    assert query(db_manager, "SELECT COUNT(*) FROM reintentos WHERE status = 0") == [(RECORDS,)]
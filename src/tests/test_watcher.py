@@ -0,0 +1,43 @@
+import os
+
+from utils.database_manager import DatabaseManager
+from utils.synthetic_dbf import SyntheticDataset
+from utils.watcher import WatchManager
+
+# Offset of CLIENTE in a VENTA record: deletion flag + NO_REFEREN, FECHA, TIENDA, CAJA, CAJERO
+CLIENTE_OFFSET = 1 + 10 + 8 + 4 + 3 + 6
+
+
+def edit_in_place(path, record, value):
+    """Overwrite a field of one record keeping size, mtime and header untouched"""
+    stat = os.stat(path)
+    with open(path, 'r+b') as file:
+        header = file.read(12)
+        header_length = int.from_bytes(header[8:10], 'little')
+        record_length = int.from_bytes(header[10:12], 'little')
+        file.seek(header_length + record * record_length + CLIENTE_OFFSET)
+        file.write(value)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_changed_stamp_is_never_skipped(tmp_path, make_setup):
+    dataset = SyntheticDataset(str(tmp_path / 'dbf'), records=200, seed=3, tables=['VENTA'])
+    dataset.write()
+    setup_path = make_setup(watch={'quiet': 0, 'max_delay': 0, 'tables': ['VENTA'], 'upload': False})
+
+    with DatabaseManager(setup_path=setup_path) as db_manager:
+        assert db_manager.connect_or_create_db()
+        db_manager.sync_schema(['VENTA', 'estado_dbf'])
+        spec = db_manager.spec_manager.get_spec(['VENTA'])[0]
+        assert db_manager.scan_table(spec)['new'] == 200
+
+        # Same size, mtime, record count and update date: a plain scan sees nothing
+        edit_in_place(dataset.path('VENTA'), 5, b'CLZZZZZZZZ')
+        assert db_manager.scan_table(spec)['mode'] == 'skip'
+
+        # The watcher's first poll always reports a change, which must reach the records
+        watcher = WatchManager(db_manager)
+        assert watcher.cycle(now=0.0) == ['VENTA']
+        result = watcher.tables['VENTA']['last_result']
+        assert result['mode'] != 'skip'
+        assert result['changed'] == 1
@@ -0,0 +1,141 @@
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_COLUMNS = ('documento', 'respuesta_post', 'respuesta_get')
+
+# What is written for each call:
+#   all      every call with its document and both responses
+#   payload  every call with its document; responses only for calls with errors
+#   errors   only calls with errors, in full
+STORE_POLICIES = ('all', 'payload', 'errors')
+
+
+def decode_payload(value):
+    """Text of a stored payload: zlib BLOBs are inflated, text (uncompressed or older rows) is returned as is"""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode('utf-8')
+    return value
+
+
+class ApiLogManager:
+    """
+    Writes and trims the api_log helper table.
+
+    Payload columns can be stored zlib-compressed as BLOBs; read them back with
+    read() or, from SQL, with the api_payload(column) function registered on the
+    connection. prune() enforces retention by age and by row count in batched
+    deletes and then releases the freed pages with incremental_vacuum (databases
+    created with the auto_vacuum=INCREMENTAL profile setting).
+    """
+
+    TABLE = "api_log"
+
+    def __init__(self, db_manager, compress=True, level=6, store='all', retention_days=30, max_rows=100000,
+                 delete_batch=5000) -> None:
+        if store not in STORE_POLICIES:
+            raise ValueError(f"Invalid api_log store policy '{store}', options: {list(STORE_POLICIES)}")
+        self.db_manager = db_manager
+        self.compress = compress
+        self.level = level
+        self.store = store
+        self.retention_days = retention_days
+        self.max_rows = max_rows
+        self.delete_batch = delete_batch
+        db_manager.connection.create_function('api_payload', 1, decode_payload, deterministic=True)
+
+    def encode(self, text):
+        if text is None:
+            return None
+        if self.compress:
+            return zlib.compress(text.encode('utf-8'), self.level)
+        return text
+
+    def log(self, tabla, lote_referencia, documento, respuesta_post=None, respuesta_get=None, error=False):
+        """Write one call according to the store policy; joins the caller's transaction. False if not written"""
+        if self.store == 'errors' and not error:
+            return False
+        if self.store == 'payload' and not error:
+            respuesta_post = respuesta_get = None
+
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(
+            f"INSERT INTO {self.TABLE} (tabla, lote_referencia, documento, respuesta_post, respuesta_get, con_error) "
+            f"VALUES (?, ?, ?, ?, ?, ?)",
+            (tabla, lote_referencia, self.encode(documento), self.encode(respuesta_post),
+             self.encode(respuesta_get), 1 if error else 0)
+        )
+        return True
+
+    def read(self, tabla=None, limit=100, errors_only=False):
+        """Latest entries as dicts with decoded payloads"""
+        conditions = []
+        params = []
+        if tabla:
+            conditions.append("tabla = ?")
+            params.append(tabla)
+        if errors_only:
+            conditions.append("con_error = 1")
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        params.append(limit)
+
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(
+            f"SELECT rowid, tabla, lote_referencia, documento, respuesta_post, respuesta_get, con_error, insertado "
+            f"FROM {self.TABLE} {where}ORDER BY rowid DESC LIMIT ?",
+            params
+        )
+        entries = []
+        for row in cursor.fetchall():
+            entry = dict(zip(('id', 'tabla', 'lote_referencia'), row[:3]))
+            entry.update(zip(PAYLOAD_COLUMNS, (decode_payload(value) for value in row[3:6])))
+            entry['con_error'] = row[6]
+            entry['insertado'] = row[7]
+            entries.append(entry)
+        return entries
+
+    def _delete_batches(self, condition, params):
+        """Delete matching rows delete_batch at a time, one short transaction per batch"""
+        connection = self.db_manager.connection
+        cursor = connection.cursor()
+        deleted = 0
+        while True:
+            cursor.execute(
+                f"DELETE FROM {self.TABLE} WHERE rowid IN "
+                f"(SELECT rowid FROM {self.TABLE} WHERE {condition} LIMIT ?)",
+                (*params, self.delete_batch)
+            )
+            connection.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < self.delete_batch:
+                return deleted
+
+    def prune(self, vacuum_pages=0):
+        """
+        Apply retention (older than retention_days, beyond the newest max_rows) and release
+        free pages; vacuum_pages limits the pages released (0 = all).
+        Returns {'expired', 'overflow', 'freed_pages'}
+        """
+        cursor = self.db_manager.connection.cursor()
+        result = {'expired': 0, 'overflow': 0, 'freed_pages': 0}
+
+        with self.db_manager.metrics.timer('prune', self.TABLE) as phase:
+            if self.retention_days:
+                result['expired'] = self._delete_batches(
+                    "insertado < datetime('now', ?)", (f"-{int(self.retention_days)} days",))
+
+            if self.max_rows:
+                # rowids grow with inserts, everything below the newest max_rows goes
+                cursor.execute(
+                    f"SELECT rowid FROM {self.TABLE} ORDER BY rowid DESC LIMIT 1 OFFSET ?", (self.max_rows,))
+                row = cursor.fetchone()
+                if row:
+                    result['overflow'] = self._delete_batches("rowid <= ?", (row[0],))
+
+            phase.add(rows=result['expired'] + result['overflow'])
+            result['freed_pages'] = self.db_manager.incremental_vacuum(vacuum_pages)
+
+        if result['expired'] or result['overflow']:
+            logger.info(f"Pruned {self.TABLE}: {result}")
+        return result
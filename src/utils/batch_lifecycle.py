@@ -0,0 +1,163 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATUS_KEYS = {0: 'pending', 1: 'uploaded', 2: 'rejected'}
+
+# Compaction after pruning:
+#   none         leave the freed pages in the file
+#   incremental  return them with incremental_vacuum (auto_vacuum=INCREMENTAL databases)
+#   full         VACUUM: rebuilds the file and every index, needs free disk space for a copy
+COMPACT_MODES = ('none', 'incremental', 'full')
+
+
+class BatchLifecycleManager:
+    """
+    Moves data tables between batch_version ids and trims the old ones.
+
+    batch_version leads the primary key of every data table, so each batch keeps
+    its own copy of the rows in the PK index. promote() starts the configured
+    batch from the rows still current in the previous one with a single
+    INSERT ... SELECT per table; prune() deletes the batches beyond the newest
+    keep in short chunked transactions and compact() releases the freed pages.
+
+    Batches are ordered by their newest row (highest rowid), read together with
+    the per-status counts from the (batch_version, status) index.
+    """
+
+    def __init__(self, db_manager, keep=1, delete_batch=5000, compact='incremental') -> None:
+        if compact not in COMPACT_MODES:
+            raise ValueError(f"Invalid batch compact mode '{compact}', options: {list(COMPACT_MODES)}")
+        self.db_manager = db_manager
+        self.keep = keep
+        self.delete_batch = delete_batch
+        self.compact_mode = compact
+
+    def batch_counts(self, table_spec):
+        """
+        Rows per batch, newest first:
+        [{'batch_version', 'rows', 'pending', 'uploaded', 'rejected'}, ...]
+        """
+        sql = table_spec.statement('batch_counts', lambda spec: (
+            f"SELECT batch_version, status, COUNT(*), MAX(rowid) FROM {spec.name} "
+            f"GROUP BY batch_version, status"
+        ))
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(sql)
+
+        batches = {}
+        newest = {}
+        for batch_version, status, count, max_rowid in cursor.fetchall():
+            counts = batches.setdefault(batch_version, {
+                'batch_version': batch_version, 'rows': 0, 'pending': 0, 'uploaded': 0, 'rejected': 0})
+            counts['rows'] += count
+            key = STATUS_KEYS.get(status)
+            if key:
+                counts[key] += count
+            newest[batch_version] = max(newest.get(batch_version, 0), max_rowid)
+        return sorted(batches.values(), key=lambda counts: newest[counts['batch_version']], reverse=True)
+
+    def promote(self, table_spec, batch_version, source=None):
+        """
+        Copy the rows still current in source (default: the newest other batch) into
+        batch_version: live rows, plus deletions not uploaded yet. Upload state is kept,
+        so nothing is sent again. Rows already in batch_version win. Returns the rows copied,
+        None when there is no source batch.
+        """
+        table_name = table_spec.name
+        if source is None:
+            others = [counts['batch_version'] for counts in self.batch_counts(table_spec)
+                      if counts['batch_version'] != batch_version]
+            if not others:
+                logger.info(f"No previous batch to promote from in {table_name}")
+                return None
+            source = others[0]
+        elif source == batch_version:
+            raise ValueError(f"Source and target batch are both '{batch_version}'")
+
+        sql = table_spec.statement('promote_batch', self._build_promote_sql)
+        connection = self.db_manager.connection
+        cursor = connection.cursor()
+        try:
+            with self.db_manager.metrics.timer('promote', table_name) as phase:
+                if not connection.in_transaction:
+                    connection.execute("BEGIN")
+                cursor.execute(sql, (batch_version, source))
+                copied = cursor.rowcount
+                connection.commit()
+                phase.add(rows=copied, statements=1)
+        except Exception:
+            connection.rollback()
+            raise
+
+        logger.info(f"Promoted {copied} rows of {table_name} from {source} to {batch_version}")
+        return copied
+
+    def _build_promote_sql(self, table_spec):
+        columns = table_spec.column_names
+        select_values = ['?' if name == 'batch_version' else name for name in columns]
+        where = "WHERE batch_version = ?"
+        if 'eliminado' in table_spec.column_set:
+            # A deletion still waiting to be uploaded must follow the record into the new batch
+            pending = " OR status <> 1" if 'status' in table_spec.column_set else ""
+            where += f" AND (eliminado = 0{pending})"
+
+        return (
+            f"INSERT INTO {table_spec.name} ({', '.join(columns)}) "
+            f"SELECT {', '.join(select_values)} FROM {table_spec.name} {where} "
+            f"ON CONFLICT ({', '.join(table_spec.pk)}) DO NOTHING"
+        )
+
+    def _delete_batch_rows(self, table_spec, batch_version):
+        """Delete one batch delete_batch rows at a time, one short transaction per chunk"""
+        sql = table_spec.statement('delete_batch_rows', lambda spec: (
+            f"DELETE FROM {spec.name} WHERE rowid IN "
+            f"(SELECT rowid FROM {spec.name} WHERE batch_version = ? LIMIT ?)"
+        ))
+        connection = self.db_manager.connection
+        cursor = connection.cursor()
+        deleted = 0
+        while True:
+            cursor.execute(sql, (batch_version, self.delete_batch))
+            connection.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < self.delete_batch:
+                return deleted
+
+    def prune(self, table_spec, batch_version):
+        """
+        Delete every batch except batch_version and the newest keep others.
+        Returns {pruned batch_version: rows deleted}
+        """
+        others = [counts['batch_version'] for counts in self.batch_counts(table_spec)
+                  if counts['batch_version'] != batch_version]
+        pruned = {}
+        with self.db_manager.metrics.timer('prune', table_spec.name) as phase:
+            for old_batch in others[max(0, self.keep):]:
+                pruned[old_batch] = self._delete_batch_rows(table_spec, old_batch)
+            phase.add(rows=sum(pruned.values()), statements=len(pruned))
+
+        if pruned:
+            logger.info(f"Pruned batches of {table_spec.name}: {pruned}")
+        return pruned
+
+    def compact(self):
+        """
+        Release the pages freed by pruning per compact_mode, in every database file of the
+        shard layout, and refresh planner stats; returns pages freed
+        """
+        connection = self.db_manager.connection
+        freed = 0
+        with self.db_manager.metrics.timer('compact'):
+            for schema in self.db_manager.shards.schemas():
+                if self.compact_mode == 'incremental':
+                    freed += self.db_manager.incremental_vacuum(schema=schema)
+                elif self.compact_mode == 'full':
+                    before = connection.execute(f"PRAGMA {schema}.page_count").fetchone()[0]
+                    if connection.in_transaction:
+                        connection.commit()
+                    connection.execute(f"VACUUM {schema}")
+                    freed += before - connection.execute(f"PRAGMA {schema}.page_count").fetchone()[0]
+            connection.execute("PRAGMA optimize")
+        logger.info(f"Compacted database ({self.compact_mode}): {freed} pages released")
+        return freed
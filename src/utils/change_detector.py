@@ -0,0 +1,368 @@
+from .compiled_spec import ID_COLUMNS
+from .dbf_reader import MEMO_TYPES
+from .hash_strategies import FIELD_SEPARATOR, FIELD_PADDING, get_hash_strategy, build_field_normalizer
+from .vectorized_hash import VectorizedHasher, numpy_available, DEFAULT_CHUNK_RECORDS
+
+
+class RecordHasher:
+    """
+    Computes the tracking row of raw DBF records for one table:
+    (id, hash_comparador, referencia, fecha_original, deleted)
+
+    The id follows the table's schema option: the joined id_fields for natural_key,
+    the record number for physical_position and the hash of hash_fields for
+    composed_hash. hash_comparador is the hash of the whole record, so any change
+    in any field is detected without decoding the record. Both hashes use the
+    table's hash_strategy (see hash_strategies.py).
+
+    With vectorized (and NumPy installed) natural_key and composed_hash rows are
+    computed in chunks of chunk_records records, see VectorizedHasher.
+
+    Memo fields hold a block number in the record; their contents are only read
+    (lazily, through the reader's MemoReader) for memo fields named in id_fields,
+    hash_fields or the table's memo_fields list. Ids and hash_fields keys use the
+    memo contents, and the contents of memo_fields are appended to the
+    hash_comparador input so a memo rewritten in place counts as a change.
+    Tables that resolve memos are hashed per record.
+    """
+
+    def __init__(self, reader, table_spec, vectorized=False, chunk_records=DEFAULT_CHUNK_RECORDS) -> None:
+        self.reader = reader
+        self.schema = table_spec['schema']
+        self.digest = get_hash_strategy(table_spec.get('hash_strategy'))
+        self.separator = FIELD_SEPARATOR
+        if self.schema not in ID_COLUMNS:
+            raise ValueError(f"Table {table_spec['name']} has no id strategy for schema '{self.schema}'")
+
+        id_fields = table_spec.get('id_fields', [])
+        hash_fields = table_spec.get('hash_fields', [])
+        memo_fields = table_spec.get('memo_fields', [])
+        self.memo_fields = {field.name for field in self.reader.get_fields(self._dbf_names(id_fields + hash_fields))
+                            if field.type in MEMO_TYPES}
+        self.memo_fields.update(field.name for field in self.reader.get_fields(memo_fields))
+
+        self._id_slices = self._slices(id_fields)
+        self._hash_slices = self._slices(hash_fields)
+        self._id_key = self._field_key(id_fields, self._id_slices, b'|')
+        self._hash_key = self._field_key(hash_fields, self._hash_slices, self.separator)
+        self._memo_contents = [self.reader.memo_getter(field) for field in self.reader.get_fields(memo_fields)]
+
+        # Optional fields copied into referencia / fecha_original
+        self._reference = self._field_decoder(table_spec.get('reference_field'))
+        self._date = self._field_decoder(table_spec.get('date_field'))
+
+        if self.schema == 'natural_key' and not self._id_slices:
+            raise ValueError(f"Table {table_spec['name']} uses natural_key but has no id_fields")
+        if self.schema == 'composed_hash' and not self._hash_slices:
+            raise ValueError(f"Table {table_spec['name']} uses composed_hash but has no hash_fields")
+
+        self.vectorized = None
+        if vectorized and self.schema != 'physical_position' and not self.memo_fields and numpy_available():
+            self.vectorized = VectorizedHasher(self, chunk_records)
+
+    @staticmethod
+    def _dbf_names(names):
+        # RECNO is not a DBF field, it is the record position itself
+        return [name for name in names if name.upper() != 'RECNO']
+
+    def _slices(self, names):
+        return [(field.offset, field.offset + field.length) for field in self.reader.get_fields(self._dbf_names(names))]
+
+    def _field_key(self, names, slices, separator):
+        """build_field_normalizer, with memo fields replaced by their trimmed memo contents"""
+        fields = self.reader.get_fields(self._dbf_names(names))
+        if not any(field.name in self.memo_fields for field in fields):
+            return build_field_normalizer(slices, separator)
+
+        getters = []
+        for field in fields:
+            if field.name in self.memo_fields:
+                getters.append(self.reader.memo_getter(field))
+            else:
+                begin, end = field.offset, field.offset + field.length
+                getters.append(lambda record, begin=begin, end=end: bytes(record[begin:end]))
+
+        def normalize_fields(record):
+            return separator.join([get(record).strip(FIELD_PADDING) for get in getters])
+        return normalize_fields
+
+    def _field_decoder(self, name):
+        if not name:
+            return None
+        field = self.reader.get_fields([name])[0]
+        decode = self.reader._decoder(field)
+        begin, end = field.offset, field.offset + field.length
+
+        def decode_field(record):
+            value = decode(bytes(record[begin:end]))
+            return None if value is None else str(value)
+        return decode_field
+
+    def record_id(self, recno, record):
+        """Id of a raw record (memoryview or bytes including the deletion flag)"""
+        if self.schema == 'physical_position':
+            return recno
+
+        if self.schema == 'natural_key':
+            return self._id_key(record).decode(self.reader.encoding, errors='replace')
+
+        return self.digest(self._hash_key(record))
+
+    def hash_record(self, record):
+        """hash_comparador of a raw record, the deletion flag is not part of the content"""
+        if self._memo_contents:
+            separator = self.separator
+            return self.digest(b''.join([bytes(record[1:])] + [separator + get(record) for get in self._memo_contents]))
+        return self.digest(record[1:])
+
+    def row(self, recno, deleted, record):
+        """Tracking row for one raw record"""
+        return (
+            self.record_id(recno, record),
+            self.hash_record(record),
+            self._reference(record) if self._reference else None,
+            self._date(record) if self._date else None,
+            1 if deleted else 0
+        )
+
+    def rows(self, start=1, stop=None):
+        """Yield the tracking rows of records start..stop, deleted records included (flagged)"""
+        if self.vectorized:
+            yield from self.vectorized.rows(start, stop)
+            return
+        for recno, deleted, record in self.reader.raw_records(start, stop):
+            yield self.row(recno, deleted, record)
+
+
+class ChangeDetector:
+    """
+    Set-based change detection of one table scan against its tracking table.
+
+    The scanned rows are streamed in chunks into a TEMP table, then a single join
+    classifies them as new / changed / unchanged (plus tracked rows that were not
+    seen: deleted), a single UPSERT writes new and changed rows and refreshes
+    ultima_revision, and a single anti-join UPDATE soft-deletes the rows that are
+    gone or flagged (mark_deleted). Python memory is bounded by chunk_size, the per-row work is
+    done inside SQLite.
+    """
+
+    def __init__(self, db_manager, chunk_size=50000) -> None:
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+
+    def scan_table_name(self, table_spec):
+        """TEMP table holding the current scan of a table (one per table, so scans can interleave)"""
+        return f"temp.scan_{table_spec.name}"
+
+    def create_scan_table(self, table_spec):
+        """(Re)create the empty TEMP scan table of a table"""
+        cursor = self.db_manager.connection.cursor()
+        id_type = 'INTEGER' if table_spec.schema == 'physical_position' else 'TEXT'
+        scan_table = self.scan_table_name(table_spec)
+
+        cursor.execute(f"DROP TABLE IF EXISTS {scan_table}")
+        cursor.execute(
+            f"CREATE TABLE {scan_table} ("
+            f"id {id_type} PRIMARY KEY, hash TEXT NOT NULL, referencia TEXT, fecha_original TEXT, "
+            f"deleted INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID"
+        )
+
+    def load_rows(self, table_spec, rows):
+        """Load rows (id, hash, referencia, fecha, deleted) into the scan table in chunks"""
+        # Duplicated ids inside the DBF: the last live record wins, a deleted one never replaces a live one
+        scan_table = self.scan_table_name(table_spec)
+        return self.db_manager.bulk_insert(
+            scan_table, rows,
+            columns=('id', 'hash', 'referencia', 'fecha_original', 'deleted'),
+            conflict='upsert', conflict_columns=('id',),
+            conflict_where=f"excluded.deleted = 0 OR {scan_table.rpartition('.')[2]}.deleted = 1",
+            chunk_size=self.chunk_size, commit=False
+        )
+
+    def load_scan(self, table_spec, rows):
+        """Create the TEMP scan table and load rows into it"""
+        self.create_scan_table(table_spec)
+        return self.load_rows(table_spec, rows)
+
+    def classify(self, table_spec, batch_version, partial=False):
+        """Counts of new / changed / unchanged scanned rows and of tracked rows no longer seen
+        
+        With partial (tail scans) tracked rows outside the scanned range are not counted as deleted
+        """
+        table_name = table_spec.name
+        id_column = table_spec.id_column
+        scan_table = self.scan_table_name(table_spec)
+        cursor = self.db_manager.connection.cursor()
+
+        cursor.execute(
+            f"SELECT "
+            f"  COALESCE(SUM(t.{id_column} IS NULL), 0), "
+            f"  COALESCE(SUM(t.{id_column} IS NOT NULL AND t.hash_comparador <> s.hash), 0), "
+            f"  COALESCE(SUM(t.{id_column} IS NOT NULL AND t.hash_comparador = s.hash), 0) "
+            f"FROM {scan_table} AS s "
+            f"LEFT JOIN {table_name} AS t ON t.batch_version = ? AND t.{id_column} = s.id "
+            f"WHERE s.deleted = 0",
+            (batch_version,)
+        )
+        new, changed, unchanged = cursor.fetchone()
+
+        not_deleted = "AND t.eliminado = 0 " if 'eliminado' in table_spec.column_set else ""
+
+        if partial:
+            # Only part of the file was scanned, rows outside it were not seen but are not deleted;
+            # only records flagged as deleted inside the scanned range count
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {scan_table} AS s "
+                f"JOIN {table_name} AS t ON t.batch_version = ? AND t.{id_column} = s.id "
+                f"WHERE s.deleted = 1 {not_deleted}",
+                (batch_version,)
+            )
+            return {'new': new, 'changed': changed, 'unchanged': unchanged, 'deleted': cursor.fetchone()[0]}
+
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {table_name} AS t "
+            f"WHERE t.batch_version = ? {not_deleted}"
+            f"AND NOT EXISTS (SELECT 1 FROM {scan_table} AS s WHERE s.id = t.{id_column} AND s.deleted = 0)",
+            (batch_version,)
+        )
+        deleted = cursor.fetchone()[0]
+
+        return {'new': new, 'changed': changed, 'unchanged': unchanged, 'deleted': deleted}
+
+    def upsert(self, table_spec, batch_version):
+        """
+        Single INSERT ... SELECT ... ON CONFLICT over the scan table.
+        Changed (or reappeared) rows go back to status 0 so they are uploaded again
+        """
+        sql = table_spec.statement('scan_upsert', self._build_upsert_sql)
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(sql, (batch_version,))
+        return cursor.rowcount
+
+    def _build_upsert_sql(self, table_spec):
+        table_name = table_spec.name
+        id_column = table_spec.id_column
+        scan_table = self.scan_table_name(table_spec)
+        columns = table_spec.column_set
+
+        insert_columns = [id_column, 'batch_version', 'hash_comparador']
+        select_values = ['s.id', '?', 's.hash']
+        updates = ["hash_comparador = excluded.hash_comparador"]
+
+        # Optional common columns, a table may drop them through skip_columns
+        optional = [
+            ('referencia', 's.referencia', "referencia = excluded.referencia"),
+            ('fecha_original', 's.fecha_original', "fecha_original = excluded.fecha_original"),
+            ('ultima_revision', 'CURRENT_TIMESTAMP', "ultima_revision = excluded.ultima_revision"),
+            ('eliminado', '0', "eliminado = 0"),
+            ('clave_eliminacion', 'NULL', "clave_eliminacion = NULL")
+        ]
+        for column, value, update in optional:
+            if column in columns:
+                insert_columns.append(column)
+                select_values.append(value)
+                updates.append(update)
+
+        if 'status' in columns:
+            changed_condition = f"{table_name}.hash_comparador <> excluded.hash_comparador"
+            if 'eliminado' in columns:
+                changed_condition += f" OR {table_name}.eliminado <> 0"
+            updates.append(f"status = CASE WHEN {changed_condition} THEN 0 ELSE {table_name}.status END")
+            if 'id_cola' in columns:
+                # New content was never posted, it must not wait on the old batch's queue id
+                updates.append(f"id_cola = CASE WHEN {changed_condition} THEN 0 ELSE {table_name}.id_cola END")
+
+        return (
+            f"INSERT INTO {table_name} ({', '.join(insert_columns)}) "
+            f"SELECT {', '.join(select_values)} FROM {scan_table} AS s WHERE s.deleted = 0 "
+            f"ON CONFLICT (batch_version, {id_column}) DO UPDATE SET {', '.join(updates)}"
+        )
+
+    def mark_deleted(self, table_spec, batch_version, partial=False):
+        """
+        Soft-delete pass: one anti-join UPDATE against the scan table marks tracked rows
+        eliminado = 1 when their record is flagged as deleted in the DBF (clave_eliminacion
+        'usuario') or is no longer in the file at all ('corte', e.g. packed at the day cut).
+        With partial only flagged records can be detected. Rows go back to status 0 so the
+        deletion is uploaded. Returns the number of rows marked; 0 for tables without eliminado.
+        """
+        if 'eliminado' not in table_spec.column_set:
+            return 0
+
+        sql = table_spec.statement(('mark_deleted', partial), lambda spec: self._build_mark_deleted_sql(spec, partial))
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(sql, (batch_version,))
+        return cursor.rowcount
+
+    def _build_mark_deleted_sql(self, table_spec, partial):
+        table_name = table_spec.name
+        id_column = table_spec.id_column
+        scan_table = self.scan_table_name(table_spec)
+        columns = table_spec.column_set
+
+        flagged = f"EXISTS (SELECT 1 FROM {scan_table} AS s WHERE s.id = {table_name}.{id_column} AND s.deleted = 1)"
+        updates = ["eliminado = 1"]
+        if 'clave_eliminacion' in columns:
+            updates.append(f"clave_eliminacion = CASE WHEN {flagged} THEN 'usuario' ELSE 'corte' END")
+        if 'ultima_revision' in columns:
+            updates.append("ultima_revision = CURRENT_TIMESTAMP")
+        if 'status' in columns:
+            updates.append("status = 0")
+            if 'id_cola' in columns:
+                updates.append("id_cola = 0")
+
+        if partial:
+            missing = flagged
+        else:
+            # Not seen as a live record: flagged, or not in the scan at all
+            missing = f"NOT EXISTS (SELECT 1 FROM {scan_table} AS s WHERE s.id = {table_name}.{id_column} AND s.deleted = 0)"
+
+        return (
+            f"UPDATE {table_name} SET {', '.join(updates)} "
+            f"WHERE batch_version = ? AND eliminado = 0 AND {missing}"
+        )
+
+    def finish_scan(self, table_spec, batch_version, scanned, dry_run=False, partial=False, before_commit=None):
+        """
+        Classify a loaded scan and (unless dry_run) apply it, then commit.
+        partial marks a scan of only part of the file, before_commit is called inside
+        the transaction after the upsert (e.g. to save scan state atomically with it).
+        Returns {'scanned', 'new', 'changed', 'unchanged', 'deleted'}
+        """
+        connection = self.db_manager.connection
+        try:
+            with self.db_manager.metrics.timer('diff', table_spec['name']) as phase:
+                counts = self.classify(table_spec, batch_version, partial=partial)
+                counts['scanned'] = scanned
+                phase.add(rows=scanned, statements=2)
+
+                if not dry_run:
+                    self.upsert(table_spec, batch_version)
+                    counts['deleted'] = self.mark_deleted(table_spec, batch_version, partial=partial)
+                    phase.add(statements=2)
+                    if before_commit:
+                        before_commit()
+
+                connection.commit()
+            return counts
+
+        except Exception:
+            connection.rollback()
+            raise
+
+    def detect(self, table_spec, rows, batch_version, dry_run=False, partial=False, before_commit=None):
+        """
+        Load a scan, classify it and (unless dry_run) apply it, in one transaction.
+        Returns {'scanned', 'new', 'changed', 'unchanged', 'deleted'}
+        """
+        connection = self.db_manager.connection
+        try:
+            if not connection.in_transaction:
+                connection.execute("BEGIN")
+            scanned = self.load_scan(table_spec, rows)
+        except Exception:
+            connection.rollback()
+            raise
+
+        return self.finish_scan(table_spec, batch_version, scanned, dry_run=dry_run,
+                                partial=partial, before_commit=before_commit)
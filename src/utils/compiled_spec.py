@@ -0,0 +1,271 @@
+from types import MappingProxyType
+
+# Id column of the tracking table for each schema option of data_tables_schemas.json
+ID_COLUMNS = {
+    'natural_key': 'natural_id',
+    'physical_position': 'recno_id',
+    'composed_hash': 'hash_id'
+}
+
+# JSON column types to SQLite types, anything else is stored as TEXT
+TYPE_MAPPING = {
+    'TEXT': 'TEXT',
+    'INTEGER': 'INTEGER',
+    'REAL': 'REAL',
+    'BLOB': 'BLOB',
+    'NUMERIC': 'NUMERIC'
+}
+
+
+def map_column_type(json_type):
+    """Map JSON column types to SQLite types"""
+    return TYPE_MAPPING.get(json_type.upper(), 'TEXT')
+
+
+def column_default_sql(column):
+    """Return the SQL literal for a column default, or None if the column has no default"""
+    if 'default' not in column:
+        return None
+
+    default_value = column['default']
+    if default_value == "CURRENT_TIMESTAMP":
+        return "CURRENT_TIMESTAMP"
+    elif isinstance(default_value, str):
+        return f"'{default_value}'"
+    else:
+        return f"{default_value}"
+
+
+def build_column_definition(column, is_single_pk=False):
+    """Build SQL column definition from JSON column spec
+
+    Args:
+        column: Column specification dict
+        is_single_pk: True if this is the only primary key column (allows inline PK with AUTOINCREMENT)
+    """
+    name = column.get('name')
+    col_type = map_column_type(column.get('type', 'TEXT'))
+
+    definition = f"{name} {col_type}"
+
+    # Add constraints
+    if column.get('not_null', False):
+        definition += " NOT NULL"
+
+    # Only add inline PRIMARY KEY if this is a single primary key column
+    # For composite PKs, we'll use a table constraint instead
+    if is_single_pk:
+        definition += " PRIMARY KEY"
+        # Add AUTOINCREMENT only for INTEGER single primary keys
+        if column.get('autoincrement', False) and col_type == 'INTEGER':
+            definition += " AUTOINCREMENT"
+
+    default_sql = column_default_sql(column)
+    if default_sql is not None:
+        definition += f" DEFAULT {default_sql}"
+
+    return definition
+
+
+def build_create_table_sql(table_name, columns, if_not_exists=True):
+    """Build the CREATE TABLE statement for a table name and its column specs"""
+    # Find all primary key columns
+    pk_columns = [col.get('name') for col in columns if col.get('pk', False)]
+
+    # Build column definitions
+    column_defs = []
+    for column in columns:
+        # Only use inline PRIMARY KEY if there's exactly one PK column
+        is_single_pk = (len(pk_columns) == 1 and column.get('name') in pk_columns)
+        column_defs.append(build_column_definition(column, is_single_pk))
+
+    # Create table SQL
+    if_not_exists_sql = "IF NOT EXISTS " if if_not_exists else ""
+    sql = f"CREATE TABLE {if_not_exists_sql}{table_name} (\n"
+    sql += ",\n".join(f"    {col_def}" for col_def in column_defs)
+
+    # Add composite primary key constraint if there are multiple PK columns
+    if len(pk_columns) > 1:
+        pk_constraint = f"PRIMARY KEY ({', '.join(pk_columns)})"
+        sql += f",\n    {pk_constraint}"
+
+    sql += "\n)"
+    return sql
+
+
+def index_name(table_name, index):
+    """Database-wide index name for an index declared in a table spec"""
+    return f"idx_{table_name}_{index['name']}"
+
+
+def build_index_sql(table_name, index, if_not_exists=True, schema=None):
+    """Build the CREATE INDEX statement for an index definition
+
+    Index definition keys: name, columns, include (extra trailing columns that make
+    the index covering), where (partial index condition), unique. With schema the
+    index is created in that attached database (the table must live there too)
+    """
+    unique_sql = "UNIQUE " if index.get('unique', False) else ""
+    if_not_exists_sql = "IF NOT EXISTS " if if_not_exists else ""
+    columns = index.get('columns', []) + index.get('include', [])
+    name = index_name(table_name, index)
+    if schema and schema != 'main':
+        name = f"{schema}.{name}"
+
+    sql = f"CREATE {unique_sql}INDEX {if_not_exists_sql}{name} ON {table_name} ({', '.join(columns)})"
+    if index.get('where'):
+        sql += f" WHERE {index['where']}"
+    return sql
+
+
+class _FrozenSpec:
+    """Base for immutable spec objects: attributes are set once in __init__"""
+
+    __slots__ = ('_frozen',)
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f"{type(self).__name__} is immutable")
+        object.__setattr__(self, name, value)
+
+    def _freeze(self):
+        object.__setattr__(self, '_frozen', True)
+
+    # Read-only mapping access to the original JSON definition, so code written
+    # against the spec dicts (spec['name'], column.get('pk')) keeps working
+    def __getitem__(self, key):
+        return self.raw[key]
+
+    def __contains__(self, key):
+        return key in self.raw
+
+    def get(self, key, default=None):
+        return self.raw.get(key, default)
+
+    def keys(self):
+        return self.raw.keys()
+
+
+class ColumnSpec(_FrozenSpec):
+    """One resolved column of a table spec"""
+
+    __slots__ = ('raw', 'name', 'type', 'not_null', 'pk', 'autoincrement', 'has_default', 'default_sql', 'definition')
+
+    def __init__(self, column) -> None:
+        self.raw = MappingProxyType(dict(column))
+        self.name = column.get('name')
+        self.type = map_column_type(column.get('type', 'TEXT'))
+        self.not_null = bool(column.get('not_null', False))
+        self.pk = bool(column.get('pk', False))
+        self.autoincrement = bool(column.get('autoincrement', False))
+        self.has_default = 'default' in column
+        self.default_sql = column_default_sql(column)
+        # Definition as a non-inline-PK column (used by ALTER TABLE ADD COLUMN)
+        self.definition = build_column_definition(column)
+        self._freeze()
+
+    def to_dict(self):
+        return dict(self.raw)
+
+    def __reduce__(self):
+        # Rebuilt from the JSON definition (mapping proxies do not pickle)
+        return (ColumnSpec, (self.to_dict(),))
+
+    def __repr__(self):
+        return f"ColumnSpec({self.definition!r})"
+
+
+class TableSpec(_FrozenSpec):
+    """
+    Immutable, compiled table specification.
+
+    Holds the resolved columns, the primary key, the id strategy and hash fields,
+    plus the statements that are built once per spec: CREATE TABLE / INDEX, and
+    INSERT, UPSERT and SELECT-by-primary-key over all columns. Other derived
+    statements can be cached per spec with statement(key, builder).
+
+    Mapping access (spec['name'], spec.get('id_fields')) reads the original
+    definition, so it can be used wherever the spec dicts were used.
+    """
+
+    __slots__ = (
+        'raw', 'name', 'schema', 'is_helper', 'columns', 'column_names', 'column_set', 'columns_by_name',
+        'pk', 'id_column', 'id_fields', 'hash_fields', 'memo_fields', 'hash_strategy', 'reference_field', 'date_field', 'indexes', 'values',
+        'create_sql', 'index_sqls', 'insert_sql', 'upsert_sql', 'select_by_id_sql', '_statements'
+    )
+
+    def __init__(self, spec) -> None:
+        self.name = spec['name']
+        self.schema = spec.get('schema')
+        self.is_helper = self.schema == 'helper'
+
+        self.columns = tuple(ColumnSpec(column) for column in spec.get('table_columns', []))
+        self.column_names = tuple(column.name for column in self.columns)
+        self.column_set = frozenset(self.column_names)
+        self.columns_by_name = MappingProxyType({column.name: column for column in self.columns})
+        self.pk = tuple(column.name for column in self.columns if column.pk)
+        self.id_column = ID_COLUMNS.get(self.schema)
+
+        self.id_fields = tuple(spec.get('id_fields', []))
+        self.hash_fields = tuple(spec.get('hash_fields', []))
+        self.memo_fields = tuple(spec.get('memo_fields', []))
+        self.hash_strategy = spec.get('hash_strategy')
+        self.reference_field = spec.get('reference_field')
+        self.date_field = spec.get('date_field')
+        self.indexes = tuple(MappingProxyType(dict(index)) for index in spec.get('indexes', []))
+        self.values = tuple(MappingProxyType(dict(row)) for row in spec.get('values', []))
+
+        raw = dict(spec)
+        raw['table_columns'] = self.columns
+        raw['indexes'] = self.indexes
+        if 'values' in raw:
+            raw['values'] = self.values
+        self.raw = MappingProxyType(raw)
+
+        # Precompiled statements
+        self.create_sql = build_create_table_sql(self.name, self.columns)
+        self.index_sqls = tuple(build_index_sql(self.name, index) for index in self.indexes)
+
+        names = ', '.join(self.column_names)
+        placeholders = ', '.join('?' for _ in self.column_names)
+        self.insert_sql = f"INSERT INTO {self.name} ({names}) VALUES ({placeholders})"
+
+        if self.pk:
+            updates = [f"{name} = excluded.{name}" for name in self.column_names if name not in self.pk]
+            action = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+            self.upsert_sql = f"{self.insert_sql} ON CONFLICT ({', '.join(self.pk)}) {action}"
+            where = ' AND '.join(f"{name} = ?" for name in self.pk)
+            self.select_by_id_sql = f"SELECT {names} FROM {self.name} WHERE {where}"
+        else:
+            self.upsert_sql = None
+            self.select_by_id_sql = None
+
+        self._statements = {}
+        self._freeze()
+
+    def statement(self, key, builder):
+        """Return the statement cached under key, building it once with builder(spec)"""
+        sql = self._statements.get(key)
+        if sql is None:
+            sql = self._statements[key] = builder(self)
+        return sql
+
+    def index_name(self, index_name_suffix):
+        """Full name of one of this table's declared indexes"""
+        return index_name(self.name, {'name': index_name_suffix})
+
+    def to_dict(self):
+        """Plain dict copy of the spec (e.g. for json.dumps)"""
+        spec = dict(self.raw)
+        spec['table_columns'] = [column.to_dict() for column in self.columns]
+        spec['indexes'] = [dict(index) for index in self.indexes]
+        if 'values' in spec:
+            spec['values'] = [dict(row) for row in self.values]
+        return spec
+
+    def __reduce__(self):
+        # Specs are sent to scan worker processes; rebuilt there from the JSON definition
+        return (TableSpec, (self.to_dict(),))
+
+    def __repr__(self):
+        return f"TableSpec({self.name!r}, schema={self.schema!r}, pk={self.pk})"
@@ -0,0 +1,95 @@
+import os
+import json
+import threading
+
+
+class ConfigStore:
+    """
+    Process-wide cache for the JSON configuration files (setup.json and the table schemas).
+
+    Each file is parsed once and kept in memory; on every access the file is stat'ed and
+    only re-read when its mtime or size changed. Derived structures (such as the
+    tables-by-name index of setup.json) are cached alongside the parsed data and are
+    dropped together with it when the file is reloaded.
+
+    Returned objects are shared between all callers and must be treated as read-only.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self) -> None:
+        # path -> {'stamp': (mtime_ns, size), 'data': parsed json, 'derived': {key: value}}
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def instance(cls):
+        """Returns the shared store for this process"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _stamp(self, path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _entry(self, path):
+        """
+        Returns the cache entry for path, (re)loading it if the file changed.
+        Raises FileNotFoundError / json.JSONDecodeError just like open() + json.load()
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            stamp = self._stamp(path)
+            entry = self._entries.get(path)
+            if entry is not None and entry['stamp'] == stamp:
+                return entry
+
+            with open(path, 'r') as file:
+                data = json.load(file)
+
+            entry = {'stamp': stamp, 'data': data, 'derived': {}}
+            self._entries[path] = entry
+            return entry
+
+    def load(self, path):
+        """Returns the parsed JSON content of path"""
+        return self._entry(path)['data']
+
+    def derived(self, path, key, builder):
+        """
+        Returns a structure computed from the parsed content of path by builder(data),
+        cached under key until the file changes
+        """
+        with self._lock:
+            entry = self._entry(path)
+            derived = entry['derived']
+            if key not in derived:
+                derived[key] = builder(entry['data'])
+            return derived[key]
+
+    def get_table_config(self, setup_path, table_name):
+        """Returns the setup.json 'tables' entry for table_name, or None"""
+        index = self.derived(setup_path, 'tables_by_name', _index_tables)
+        return index.get(table_name)
+
+    def invalidate(self, path=None):
+        """Drops the cached content of path (or of every file when path is None)"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+
+def _index_tables(setup_data):
+    """Builds the name -> table config index of setup.json; first entry wins, like the old linear scan"""
+    index = {}
+    for table in setup_data.get('tables', []):
+        name = table.get('name')
+        if name is not None and name not in index:
+            index[name] = table
+    return index
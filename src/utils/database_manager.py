@@ -1,16 +1,41 @@
+import logging
 import os
 import sqlite3
 import json
 from .table_list_manager import TableListManager
 from .table_spec_manager import TableSpecManager
+from .config_store import ConfigStore
+from .schema_sync import SchemaSyncManager
+from .dbf_reader import DbfReader
+from .memo_reader import DEFAULT_MEMO_CACHE
+from .change_detector import ChangeDetector, RecordHasher
+from .compiled_spec import (TableSpec, map_column_type, column_default_sql, build_column_definition,
+                            build_create_table_sql, index_name, build_index_sql)
+from .tail_scan import TailScanManager
+from .parallel_scan import ParallelScanManager
+from .scan_pipeline import ScanPipeline
+from .uploader import UploadManager
+from .retry_scheduler import RetryScheduler
+from .api_log import ApiLogManager
+from .batch_lifecycle import BatchLifecycleManager
+from .status_counters import StatusCounterManager
+from .shards import ShardLayout, MAIN_SCHEMA
+from .instrumentation import Metrics
+from .sqlite_profiles import PROFILE_PRESETS, PRAGMA_CHOICES, INTEGER_PRAGMAS, PRAGMA_ORDER, DATABASE_PRAGMAS
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
 
 class DatabaseManager:
     def __init__(self, setup_path=None, data_tables_path=None):
         # Get the directory where this file is located (utils directory)
         utils_dir = os.path.dirname(os.path.abspath(__file__))
         
-        self.setup_path = os.path.join(utils_dir, "setup.json")
-        self.data_tables_path = os.path.join(utils_dir, "data_tables_schemas.json")
+        self.setup_path = setup_path or os.path.join(utils_dir, "setup.json")
+        self.data_tables_path = data_tables_path or os.path.join(utils_dir, "data_tables_schemas.json")
+        
+        # Shared config cache, the managers below reuse the same instance
+        self.config_store = ConfigStore.instance()
         
         # Initialize managers
         self.list_manager = TableListManager(setup_path, data_tables_path)
@@ -19,6 +44,18 @@ class DatabaseManager:
         # Database connection
         self.connection = None
         self.db_path = None
+        self.profile = {}
+        self.effective_profile = {}
+        
+        # Data tables placed in database files of their own, attached to the connection
+        self.shards = ShardLayout()
+        
+        # Per-phase timers and counters of this manager's work
+        self.metrics = Metrics()
+        
+        # Bulk-load statement cache: (table, columns, conflict, conflict columns) -> sql
+        self._statement_cache = {}
+        self._pk_cache = {}
         
     def _get_db_config(self):
         """Get database configuration from setup.json"""
@@ -48,27 +85,150 @@ class DatabaseManager:
             # Create directory if it doesn't exist
             os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
             
+            # Resolve the performance profile declared in the db section, if any
+            profile = self._resolve_profile(db_config.get('profile'))
+            
             # Connect to database (creates if doesn't exist)
             self.connection = sqlite3.connect(self.db_path)
             self.connection.row_factory = sqlite3.Row  # Enable column access by name
             
-            print(f"Connected to database: {self.db_path}")
+            logger.info(f"Connected to database: {self.db_path}")
+            
+            self.profile = profile
+            if profile:
+                self._apply_profile(profile)
+                self.effective_profile = self.get_effective_profile()
+                logger.info(f"SQLite profile: {self.effective_profile}")
+            
+            self.shards = ShardLayout.from_params(self.db_path, self.list_manager.get_shard_params())
+            self._attach_shards()
+            
             return True
             
         except Exception as e:
-            print(f"Error connecting to database: {e}")
+            logger.error(f"Error connecting to database: {e}")
             return False
     
+    def _resolve_profile(self, profile_config):
+        """Resolve the db 'profile' setting into a dict of pragma values
+        
+        Args:
+            profile_config: None, a preset name, or a dict with an optional 'preset' plus overrides
+        """
+        if not profile_config:
+            return {}
+        
+        if isinstance(profile_config, str):
+            profile_config = {'preset': profile_config}
+        
+        preset_name = profile_config.get('preset')
+        if preset_name is not None and preset_name not in PROFILE_PRESETS:
+            raise ValueError(f"Unknown SQLite profile preset '{preset_name}', options: {list(PROFILE_PRESETS)}")
+        
+        profile = dict(PROFILE_PRESETS.get(preset_name, {}))
+        profile.update({key: value for key, value in profile_config.items() if key in PRAGMA_ORDER})
+        
+        # Validate here, pragma values cannot be bound as parameters
+        for key, value in profile.items():
+            if key in PRAGMA_CHOICES:
+                value = str(value).upper()
+                if value not in PRAGMA_CHOICES[key]:
+                    raise ValueError(f"Invalid {key} '{profile[key]}', options: {sorted(PRAGMA_CHOICES[key])}")
+                profile[key] = value
+            elif key in INTEGER_PRAGMAS:
+                profile[key] = int(value)
+        
+        return profile
+    
+    def _apply_profile(self, profile, schema=None):
+        """Apply the pragmas of a resolved profile to the current connection
+        
+        Args:
+            profile: Resolved profile (pragma -> value)
+            schema: Attached database to apply the per-file pragmas to (default: main, plus the connection-wide ones)
+        """
+        cursor = self.connection.cursor()
+        prefix = f"{schema}." if schema else ""
+        
+        for key in PRAGMA_ORDER:
+            if key not in profile or (schema and key not in DATABASE_PRAGMAS):
+                continue
+            
+            # page_size only takes effect on a new (empty) database file
+            if key == 'page_size':
+                page_count = cursor.execute(f"PRAGMA {prefix}page_count").fetchone()[0]
+                if page_count > 0:
+                    continue
+            
+            # Switching auto_vacuum on an existing file needs a full VACUUM, left to the operator
+            if key == 'auto_vacuum':
+                page_count = cursor.execute(f"PRAGMA {prefix}page_count").fetchone()[0]
+                current = cursor.execute(f"PRAGMA {prefix}auto_vacuum").fetchone()[0]
+                if page_count > 0:
+                    if ('NONE', 'FULL', 'INCREMENTAL')[current] != profile[key]:
+                        logger.warning(f"auto_vacuum={profile[key]} only applies to {schema or 'this database'} "
+                                       f"after a full VACUUM")
+                    continue
+            
+            cursor.execute(f"PRAGMA {prefix}{key} = {profile[key]}")
+    
+    def _attach_shards(self):
+        """Attach the shard files of the layout under their group names, with the profile applied to each"""
+        for schema in self.shards.groups:
+            self.connection.execute("ATTACH DATABASE ? AS " + schema, (self.shards.path(schema),))
+            if self.profile:
+                self._apply_profile(self.profile, schema=schema)
+            logger.info(f"Attached shard {schema}: {self.shards.path(schema)} ({', '.join(self.shards.groups[schema])})")
+    
+    def open_writer(self, schema=MAIN_SCHEMA):
+        """
+        Separate manager with its own connection to one database file, so tables of
+        different files can be written at the same time. Shard writers attach the main
+        file too, where helper tables such as estado_dbf live. Specs and metrics are
+        shared with this manager; close the writer when done.
+        """
+        writer = DatabaseManager(self.setup_path, self.data_tables_path)
+        writer.spec_manager = self.spec_manager
+        writer.metrics = self.metrics
+        writer.db_path = self.shards.path(schema) if self.shards else self.db_path
+        writer.profile = self.profile
+        # check_same_thread off: writers are created here and used by one worker thread
+        writer.connection = sqlite3.connect(writer.db_path, check_same_thread=False)
+        writer.connection.row_factory = sqlite3.Row
+        if self.profile:
+            writer._apply_profile(self.profile)
+        if schema != MAIN_SCHEMA:
+            writer.connection.execute(f"ATTACH DATABASE ? AS {MAIN_SCHEMA}_db", (self.db_path,))
+        return writer
+    
+    def get_effective_profile(self):
+        """Read back the pragma values actually in effect on the current connection"""
+        if not self.connection:
+            return {}
+        
+        synchronous_names = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+        temp_store_names = {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'}
+        auto_vacuum_names = {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}
+        
+        cursor = self.connection.cursor()
+        effective = {}
+        for key in PRAGMA_ORDER:
+            value = cursor.execute(f"PRAGMA {key}").fetchone()[0]
+            if key == 'synchronous':
+                value = synchronous_names.get(value, value)
+            elif key == 'temp_store':
+                value = temp_store_names.get(value, value)
+            elif key == 'auto_vacuum':
+                value = auto_vacuum_names.get(value, value)
+            elif key == 'journal_mode':
+                value = value.upper()
+            effective[key] = value
+        
+        return effective
+    
     def _map_column_type(self, json_type):
         """Map JSON column types to SQLite types"""
-        type_mapping = {
-            'TEXT': 'TEXT',
-            'INTEGER': 'INTEGER',
-            'REAL': 'REAL',
-            'BLOB': 'BLOB',
-            'NUMERIC': 'NUMERIC'
-        }
-        return type_mapping.get(json_type.upper(), 'TEXT')
+        return map_column_type(json_type)
     
     def _build_column_definition(self, column, is_single_pk=False):
         """Build SQL column definition from JSON column spec
@@ -77,74 +237,67 @@ class DatabaseManager:
             column: Column specification dict
             is_single_pk: True if this is the only primary key column (allows inline PK with AUTOINCREMENT)
         """
-        name = column.get('name')
-        col_type = self._map_column_type(column.get('type', 'TEXT'))
-        
-        definition = f"{name} {col_type}"
-        
-        # Add constraints
-        if column.get('not_null', False):
-            definition += " NOT NULL"
-        
-        # Only add inline PRIMARY KEY if this is a single primary key column
-        # For composite PKs, we'll use a table constraint instead
-        if is_single_pk:
-            definition += " PRIMARY KEY"
-            # Add AUTOINCREMENT only for INTEGER single primary keys
-            if column.get('autoincrement', False) and col_type == 'INTEGER':
-                definition += " AUTOINCREMENT"
-        
-        if 'default' in column:
-            default_value = column['default']
-            if default_value == "CURRENT_TIMESTAMP":
-                definition += " DEFAULT CURRENT_TIMESTAMP"
-            elif isinstance(default_value, str):
-                definition += f" DEFAULT '{default_value}'"
-            else:
-                definition += f" DEFAULT {default_value}"
-        
-        return definition
+        return build_column_definition(column, is_single_pk)
+    
+    def _column_default_sql(self, column):
+        """Return the SQL literal for a column default, or None if the column has no default"""
+        return column_default_sql(column)
+    
+    def _build_create_table_sql(self, table_spec, table_name=None, if_not_exists=True):
+        """Build the CREATE TABLE statement for a table specification
+        
+        Args:
+            table_spec: Table specification (TableSpec or dict)
+            table_name: Name to create the table under (defaults to the spec name)
+            if_not_exists: Add IF NOT EXISTS to the statement
+        """
+        if table_name is None:
+            table_name = self.shards.qualified(table_spec['name'])
+            if isinstance(table_spec, TableSpec) and table_name == table_spec.name and if_not_exists:
+                return table_spec.create_sql
+        return build_create_table_sql(table_name, table_spec['table_columns'], if_not_exists)
+    
+    def _index_name(self, table_name, index):
+        """Database-wide index name for an index declared in a table spec"""
+        return index_name(table_name, index)
+    
+    def _build_index_sql(self, table_name, index, if_not_exists=True, schema=None):
+        """Build the CREATE INDEX statement for an index definition"""
+        return build_index_sql(table_name, index, if_not_exists, schema=schema)
+    
+    def _build_index_sqls(self, table_spec, if_not_exists=True):
+        """Build the CREATE INDEX statements of every index in a table specification, in the table's shard"""
+        schema = self.shards.schema(table_spec['name'])
+        if isinstance(table_spec, TableSpec) and if_not_exists and schema == MAIN_SCHEMA:
+            return list(table_spec.index_sqls)
+        return [build_index_sql(table_spec['name'], index, if_not_exists, schema=schema)
+                for index in table_spec.get('indexes', [])]
     
     def create_table(self, table_spec):
         """Create a table based on table specification"""
         if not self.connection:
-            print("No database connection")
+            logger.warning("No database connection")
             return False
         
         try:
             table_name = table_spec['name']
-            columns = table_spec['table_columns']
-            
-            # Find all primary key columns
-            pk_columns = [col.get('name') for col in columns if col.get('pk', False)]
+            sql = self._build_create_table_sql(table_spec)
             
-            # Build column definitions
-            column_defs = []
-            for column in columns:
-                # Only use inline PRIMARY KEY if there's exactly one PK column
-                is_single_pk = (len(pk_columns) == 1 and column.get('name') in pk_columns)
-                col_def = self._build_column_definition(column, is_single_pk)
-                column_defs.append(col_def)
+            logger.info(f"Creating table {table_name}...")
+            logger.debug(f"SQL: {sql}")
             
-            # Create table SQL
-            sql = f"CREATE TABLE IF NOT EXISTS {table_name} (\n"
-            sql += ",\n".join(f"    {col_def}" for col_def in column_defs)
+            with self.metrics.timer('ddl', table_name) as phase:
+                cursor = self.connection.cursor()
+                cursor.execute(sql)
+                index_sqls = self._build_index_sqls(table_spec)
+                for index_sql in index_sqls:
+                    cursor.execute(index_sql)
+                if self._status_counters_enabled():
+                    StatusCounterManager(self).install(table_spec)
+                self.connection.commit()
+                phase.add(statements=1 + len(index_sqls))
             
-            # Add composite primary key constraint if there are multiple PK columns
-            if len(pk_columns) > 1:
-                pk_constraint = f"PRIMARY KEY ({', '.join(pk_columns)})"
-                sql += f",\n    {pk_constraint}"
-            
-            sql += "\n)"
-            
-            print(f"Creating table {table_name}...")
-            print(f"SQL: {sql}")
-            
-            cursor = self.connection.cursor()
-            cursor.execute(sql)
-            self.connection.commit()
-            
-            print(f"Table {table_name} created successfully")
+            logger.info(f"Table {table_name} created successfully")
             
             # Insert initial values if they exist in the spec
             if 'values' in table_spec and table_spec['values']:
@@ -153,12 +306,17 @@ class DatabaseManager:
             return True
             
         except Exception as e:
-            print(f"Error creating table {table_spec.get('name', 'unknown')}: {e}")
+            logger.error(f"Error creating table {table_spec.get('name', 'unknown')}: {e}")
             return False
     
     
-    def _insert_initial_values(self, table_spec):
-        """Insert initial values into a table after creation"""
+    def _insert_initial_values(self, table_spec, commit=True):
+        """Insert initial values into a table after creation
+        
+        Args:
+            table_spec: Table specification dict with 'values'
+            commit: Commit after inserting; when False the caller owns the transaction and errors are raised
+        """
         table_name = table_spec['name']
         values = table_spec.get('values', [])
         
@@ -166,50 +324,182 @@ class DatabaseManager:
             return
         
         try:
-            cursor = self.connection.cursor()
-            
-            for value_row in values:
-                # Get column names from the value row keys
-                columns = list(value_row.keys())
-                placeholders = ', '.join(['?' for _ in columns])
-                column_names = ', '.join(columns)
-                
-                # Build INSERT statement
-                sql = f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders})"
-                
-                # Get values in the same order as columns
-                values_tuple = tuple(value_row[col] for col in columns)
-                
-                print(f"Inserting into {table_name}: {value_row}")
-                cursor.execute(sql, values_tuple)
-            
-            self.connection.commit()
-            print(f"Inserted {len(values)} initial values into {table_name}")
+            # Same bulk path as tracking rows; rows already seeded are left as they are
+            inserted = self.bulk_insert(table_name, values, conflict='ignore', commit=commit)
+            logger.info(f"Inserted {inserted}/{len(values)} initial values into {table_name}")
             
         except Exception as e:
-            print(f"Error inserting initial values into {table_name}: {e}")
+            logger.error(f"Error inserting initial values into {table_name}: {e}")
+            if not commit:
+                raise
             # Don't raise the exception, just log it - table creation was successful
     
+    def _get_pk_columns(self, table_name):
+        """Primary key columns of an existing table, in key order (cached per table)"""
+        if table_name not in self._pk_cache:
+            schema, _, name = table_name.rpartition('.')
+            pragma = f"{schema}.table_info" if schema else "table_info"
+            rows = self.connection.execute(f"PRAGMA {pragma}({name})").fetchall()
+            self._pk_cache[table_name] = tuple(row[1] for row in sorted(rows, key=lambda r: r[5]) if row[5])
+        return self._pk_cache[table_name]
+    
+    def _bulk_insert_sql(self, table_name, columns, conflict=None, conflict_columns=None, conflict_where=None):
+        """Build (once) and cache the INSERT statement for a table, column signature and conflict policy
+        
+        conflict: None (plain INSERT), 'ignore', 'replace' or 'upsert'
+        """
+        key = (table_name, columns, conflict, conflict_columns, conflict_where)
+        sql = self._statement_cache.get(key)
+        if sql is not None:
+            return sql
+        
+        column_names = ', '.join(columns)
+        placeholders = ', '.join('?' for _ in columns)
+        
+        if conflict is None:
+            sql = f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders})"
+        elif conflict == 'ignore':
+            sql = f"INSERT OR IGNORE INTO {table_name} ({column_names}) VALUES ({placeholders})"
+        elif conflict == 'replace':
+            sql = f"INSERT OR REPLACE INTO {table_name} ({column_names}) VALUES ({placeholders})"
+        elif conflict == 'upsert':
+            target = conflict_columns or self._get_pk_columns(table_name)
+            if not target:
+                raise ValueError(f"Upsert into {table_name} needs conflict columns or a primary key")
+            updates = [f"{col} = excluded.{col}" for col in columns if col not in target]
+            action = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+            if updates and conflict_where:
+                action += f" WHERE {conflict_where}"
+            sql = (f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders}) "
+                   f"ON CONFLICT ({', '.join(target)}) {action}")
+        else:
+            raise ValueError(f"Unknown conflict policy '{conflict}', options: None, 'ignore', 'replace', 'upsert'")
+        
+        self._statement_cache[key] = sql
+        return sql
+    
+    def bulk_insert(self, table_name, rows, columns=None, conflict=None, conflict_columns=None,
+                    chunk_size=10000, commit=True, conflict_where=None):
+        """Bulk-load rows into a table with executemany over chunks
+        
+        Args:
+            table_name: Target table (may be schema qualified, e.g. temp.scan_VENTA)
+            rows: Iterable of dicts, or of sequences when columns is given
+            columns: Column names for sequence rows; dict rows are grouped by their key signature
+            conflict: None, 'ignore', 'replace' or 'upsert' (on conflict_columns, default the primary key)
+            conflict_where: Condition for 'upsert' to update an existing row (excluded.<col> is the new row)
+            chunk_size: Rows per executemany call
+            commit: Commit once per chunk; when False the caller owns the transaction
+        
+        Dict rows with different key sets are written per signature, so the order
+        between signatures is not preserved.
+        
+        Returns the number of rows written (rows skipped by 'ignore' or conflict_where are not counted)
+        """
+        if not self.connection:
+            raise RuntimeError("No database connection")
+        
+        cursor = self.connection.cursor()
+        conflict_columns = tuple(conflict_columns) if conflict_columns else None
+        # Time spent pulling rows from a generator (reading / hashing) is included
+        metrics_table = table_name.rpartition('.')[2]
+        
+        def flush(signature, chunk):
+            sql = self._bulk_insert_sql(table_name, signature, conflict, conflict_columns, conflict_where)
+            cursor.executemany(sql, chunk)
+            if commit:
+                self.connection.commit()
+            self.metrics.add('insert', metrics_table, rows=len(chunk), statements=1)
+            # executemany reports the total of changed rows
+            return cursor.rowcount if cursor.rowcount >= 0 else len(chunk)
+        
+        try:
+            with self.metrics.timer('insert', metrics_table):
+                return self._bulk_insert_rows(rows, columns, chunk_size, flush)
+        
+        except Exception:
+            if commit and self.connection.in_transaction:
+                self.connection.rollback()
+            raise
+    
+    def _bulk_insert_rows(self, rows, columns, chunk_size, flush):
+        """Chunk rows by column signature and hand every chunk to flush(signature, chunk)"""
+        written = 0
+        if columns is not None:
+            signature = tuple(columns)
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    written += flush(signature, chunk)
+                    chunk = []
+            if chunk:
+                written += flush(signature, chunk)
+            return written
+        
+        pending = {}
+        for row in rows:
+            signature = tuple(row.keys())
+            chunk = pending.setdefault(signature, [])
+            chunk.append(tuple(row.values()))
+            if len(chunk) >= chunk_size:
+                written += flush(signature, chunk)
+                pending[signature] = []
+        for signature, chunk in pending.items():
+            if chunk:
+                written += flush(signature, chunk)
+        return written
+    
+    def fetch_pending(self, table_spec, batch_version, limit=1000, after_id=None):
+        """Fetch a page of pending rows (status = 0) of a data table (TableSpec), in id order
+        
+        Always served by the partial covering index idx_<table>_pendientes (INDEXED BY
+        makes SQLite fail instead of silently falling back to a table scan).
+        Pass the last id of a page as after_id to get the next page. Rows already
+        accepted by the server and waiting to be resolved (id_cola set, no psql_id)
+        are left out, the uploader polls them by id_cola instead.
+        
+        Returns a list of rows (id, hash_comparador)
+        """
+        id_column = table_spec.id_column
+        in_flight = " AND NOT (id_cola <> 0 AND psql_id = 0)" if {'id_cola', 'psql_id'} <= table_spec.column_set else ""
+        sql = table_spec.statement('fetch_pending', lambda spec: (
+            f"SELECT {spec.id_column}, hash_comparador FROM {spec.name} INDEXED BY {spec.index_name('pendientes')} "
+            f"WHERE status = 0 AND batch_version = ?{in_flight}"
+        ))
+        params = [batch_version]
+        if after_id is not None:
+            sql += f" AND {id_column} > ?"
+            params.append(after_id)
+        sql += f" ORDER BY {id_column} LIMIT ?"
+        params.append(limit)
+        
+        cursor = self.connection.cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    
     def drop_table(self, table_name):
         """Drop a table"""
         if not self.connection:
-            print("No database connection")
+            logger.warning("No database connection")
             return False
         
         try:
-            sql = f"DROP TABLE IF EXISTS {table_name}"
+            sql = f"DROP TABLE IF EXISTS {self.shards.qualified(table_name)}"
             
-            print(f"Dropping table {table_name}...")
+            logger.info(f"Dropping table {table_name}...")
             
             cursor = self.connection.cursor()
             cursor.execute(sql)
+            # Its triggers went with it, leftover counters would report ghost rows
+            StatusCounterManager(self).forget(table_name)
             self.connection.commit()
             
-            print(f"Table {table_name} dropped successfully")
+            logger.info(f"Table {table_name} dropped successfully")
             return True
             
         except Exception as e:
-            print(f"Error dropping table {table_name}: {e}")
+            logger.error(f"Error dropping table {table_name}: {e}")
             return False
     
     def execute_action(self):
@@ -218,33 +508,446 @@ class DatabaseManager:
             return False
         
         # Get the action and table list
-        action = self.list_manager._fetch_action()
-        table_names = self.list_manager.get_list()
+        with self.metrics.timer('config_load'):
+            action = self.list_manager._fetch_action()
+            table_names = self.list_manager.get_list()
+            logging_params = self.list_manager.get_logging_params()
         
-        print(f"Executing action: {action}")
-        print(f"Tables: {table_names}")
+        logger.info(f"Executing action: {action}")
+        logger.info(f"Tables: {table_names}")
         
+        success = self._run_action(action, table_names)
+        
+        # Where the time went, per phase and table
+        self.metrics.log_summary(logger)
+        metrics_path = logging_params.get('metrics_path')
+        if metrics_path:
+            try:
+                self.metrics.dump_json(metrics_path)
+                logger.info(f"Metrics written to {metrics_path}")
+            except OSError as e:
+                logger.error(f"Error writing metrics to {metrics_path}: {e}")
+        
+        return success
+    
+    def _run_action(self, action, table_names):
+        """Dispatch an action over its table list"""
         if action == "create":
             return self._create_tables(table_names)
+        elif action == "sync":
+            sync_params = self.list_manager.get_schema_sync_params()
+            return self.sync_schema(table_names, dry_run=sync_params.get('dry_run', False)) is not None
+        elif action == "scan":
+            return self.scan_tables(table_names)
+        elif action == "upload":
+            return self.upload_tables(table_names)
+        elif action == "retry":
+            return self.retry_uploads(table_names)
+        elif action == "prune":
+            # api_log retention plus old batches of the data tables in the list
+            success = self.prune_api_log() if "api_log" in table_names else True
+            data_tables = [name for name in table_names if name != "api_log"]
+            if data_tables:
+                success = self.prune_batches(data_tables) and success
+            return success
+        elif action == "promote":
+            return self.promote_batch(table_names)
+        elif action == "batches":
+            return self.report_batches(table_names) is not None
+        elif action == "counters":
+            return self.rebuild_status_counters(table_names)
         elif action == "delete":
             return self._delete_tables(table_names)
         else:
-            print(f"Unknown action: {action}")
+            logger.error(f"Unknown action: {action}")
             return False
     
     def _create_tables(self, table_names):
         """Create all tables in the list"""
         # Get specifications for all tables
-        specs = self.spec_manager.get_spec(table_names)
+        with self.metrics.timer('spec_build'):
+            specs = self.spec_manager.get_spec(table_names)
         
         success_count = 0
         for spec in specs:
             if spec and self.create_table(spec):
                 success_count += 1
         
-        print(f"Created {success_count}/{len(table_names)} tables successfully")
+        logger.info(f"Created {success_count}/{len(table_names)} tables successfully")
         return success_count == len(table_names)
     
+    def sync_schema(self, table_names, dry_run=False):
+        """Bring the tables in line with their specs in a single transaction
+        
+        Only the needed CREATE / ALTER statements are run, tables whose columns were
+        removed or changed are rebuilt keeping their rows. With dry_run the plan is
+        reported but nothing is executed.
+        
+        Returns the plan (list of dicts), or None on error
+        """
+        if not self.connection:
+            logger.warning("No database connection")
+            return None
+        
+        try:
+            with self.metrics.timer('spec_build'):
+                specs = self.spec_manager.get_spec(table_names)
+            for table_name, spec in zip(table_names, specs):
+                if not spec:
+                    logger.warning(f"No specification found for table {table_name}, skipping")
+            
+            sync_manager = SchemaSyncManager(self)
+            plan = sync_manager.plan(specs)
+        except Exception as e:
+            logger.error(f"Error computing schema sync plan: {e}")
+            return None
+        
+        logger.info(f"Schema sync plan{' (dry run)' if dry_run else ''}:")
+        for entry in plan:
+            logger.info(f"  {entry['table']}: {entry['action']} ({entry['reason']})")
+            if dry_run:
+                for sql in entry['statements']:
+                    logger.debug(f"    {sql}")
+        
+        if dry_run:
+            return plan
+        
+        if not sync_manager.apply(plan):
+            return None
+        
+        # Rebuilt tables may have a different primary key
+        self._pk_cache.clear()
+        
+        # Created and rebuilt tables come without counter triggers
+        if self._status_counters_enabled():
+            counter_manager = StatusCounterManager(self)
+            for spec in specs:
+                if spec and counter_manager.supports(spec) and counter_manager.missing_triggers(spec):
+                    try:
+                        counter_manager.rebuild(spec)
+                    except Exception as e:
+                        logger.error(f"Error installing status counters on {spec.name}: {e}")
+        
+        changed = sum(1 for entry in plan if entry['action'] != 'none')
+        logger.info(f"Schema sync applied: {changed}/{len(plan)} tables changed")
+        return plan
+    
+    def scan_table(self, table_spec, dry_run=False, force=False):
+        """Scan the DBF of a data table and apply its changes to the tracking table
+        
+        force never skips the scan on an unchanged header (the caller already saw the file change);
+        the previous state still decides between a tail and a full scan.
+        Returns the change counts {'scanned', 'new', 'changed', 'unchanged', 'deleted'}, or None on error
+        """
+        table_name = table_spec['name']
+        dbf_params = self.list_manager.get_dbf_params()
+        batch_version = self.list_manager.get_batch_version()
+        
+        dbf_path = DbfReader.find_table_file(dbf_params.get('path'), table_name)
+        if not dbf_path:
+            logger.warning(f"DBF file for table {table_name} not found in {dbf_params.get('path')}")
+            return None
+        
+        try:
+            # Header info of the previous cycle decides between skip, tail and full scans
+            tail_manager = TailScanManager(self, sample_size=dbf_params.get('sample_size', 64))
+            use_tail_scan = dbf_params.get('tail_scan', True)
+            state = tail_manager.get_state(table_name, batch_version) if use_tail_scan else None
+            
+            if not force and tail_manager.is_unchanged(state, dbf_path):
+                logger.info(f"Skipping {table_name}: DBF unchanged since last scan")
+                return {'scanned': 0, 'new': 0, 'changed': 0, 'unchanged': 0, 'deleted': 0, 'mode': 'skip'}
+            
+            with DbfReader(dbf_path, encoding=dbf_params.get('encoding', 'cp1252'),
+                           memo_cache=dbf_params.get('memo_cache', DEFAULT_MEMO_CACHE)) as reader:
+                mode, start, reason = tail_manager.plan(reader, state, table_spec['schema'])
+                logger.info(f"Scanning {table_name} ({mode}: {reason})")
+                
+                def save_state():
+                    if use_tail_scan:
+                        tail_manager.save_state(table_name, tail_manager.header_info(reader), batch_version)
+                
+                hasher = RecordHasher(reader, table_spec, vectorized=dbf_params.get('vectorized', True),
+                                      chunk_records=dbf_params.get('vector_chunk', 131072))
+                pipeline_params = self.list_manager.get_pipeline_params()
+                if pipeline_params.get('enabled', False):
+                    # Reading, hashing and SQLite commits overlap in separate stages
+                    pipeline = ScanPipeline(
+                        self,
+                        batch_size=pipeline_params.get('batch_size', 5000),
+                        queue_depth=pipeline_params.get('queue_depth', 4),
+                        flush_interval=pipeline_params.get('flush_interval', 0.5)
+                    )
+                    counts = pipeline.run(table_spec, reader, hasher, batch_version, start=start, dry_run=dry_run,
+                                          partial=(mode == 'tail'), before_commit=save_state,
+                                          chunk_size=dbf_params.get('chunk_size', 50000))
+                else:
+                    detector = ChangeDetector(self, chunk_size=dbf_params.get('chunk_size', 50000))
+                    counts = detector.detect(table_spec, hasher.rows(start=start), batch_version, dry_run=dry_run,
+                                             partial=(mode == 'tail'), before_commit=save_state)
+                counts['mode'] = mode
+            
+            logger.info(f"Scanned {table_name}: {counts}")
+            return counts
+            
+        except Exception as e:
+            logger.error(f"Error scanning table {table_name}: {e}")
+            return None
+    
+    def scan_tables(self, table_names, results=None, force=False):
+        """Scan all data tables in the list, in worker processes if parallel scanning is enabled,
+        otherwise one thread per database file when shards are configured
+        
+        results, if given, is filled with {table: change counts, or None on error};
+        force is passed to scan_table
+        """
+        results = {} if results is None else results
+        with self.metrics.timer('spec_build'):
+            specs = self.spec_manager.get_spec(table_names)
+        data_specs = [spec for spec in specs if spec and spec['schema'] != 'helper']
+        
+        parallel_params = self.list_manager.get_parallel_params()
+        if parallel_params.get('enabled', False) and len(data_specs) > 1:
+            parallel_manager = ParallelScanManager(
+                self,
+                workers=parallel_params.get('workers', 0),
+                batch_size=parallel_params.get('batch_size', 5000),
+                queue_depth=parallel_params.get('queue_depth', 8)
+            )
+            results.update(parallel_manager.run(data_specs, force=force))
+        elif self.shards:
+            # One thread and connection per database file; tables sharing a file go in turn
+            groups = {}
+            for spec in data_specs:
+                groups.setdefault(self.shards.schema(spec['name']), []).append(spec)
+            
+            def scan_group(schema, group_specs):
+                writer = self.open_writer(schema)
+                try:
+                    for spec in group_specs:
+                        results[spec['name']] = writer.scan_table(spec, force=force)
+                finally:
+                    writer.close()
+            
+            with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+                futures = [executor.submit(scan_group, schema, group_specs) for schema, group_specs in groups.items()]
+                for future in futures:
+                    future.result()
+        else:
+            for spec in data_specs:
+                results[spec['name']] = self.scan_table(spec, force=force)
+        
+        success_count = sum(1 for spec in data_specs if results.get(spec['name']) is not None)
+        logger.info(f"Scanned {success_count}/{len(data_specs)} tables successfully")
+        return success_count == len(data_specs)
+    
+    def _retry_scheduler(self):
+        retry_params = self.list_manager.get_retry_params()
+        return RetryScheduler(
+            self,
+            base_delay=retry_params.get('base_delay', 30),
+            max_delay=retry_params.get('max_delay', 3600),
+            max_attempts=retry_params.get('max_attempts', 8),
+            jitter=retry_params.get('jitter', 0.5),
+            lease=retry_params.get('lease', 300)
+        )
+    
+    def _api_log_manager(self):
+        api_log_params = self.list_manager.get_api_log_params()
+        return ApiLogManager(
+            self,
+            compress=api_log_params.get('compress', True),
+            level=api_log_params.get('level', 6),
+            store=api_log_params.get('store', 'all'),
+            retention_days=api_log_params.get('retention_days', 30),
+            max_rows=api_log_params.get('max_rows', 100000),
+            delete_batch=api_log_params.get('delete_batch', 5000)
+        )
+    
+    def prune_api_log(self):
+        """Apply the api_log retention policy and release the freed pages"""
+        try:
+            vacuum_pages = self.list_manager.get_api_log_params().get('vacuum_pages', 0)
+            self._api_log_manager().prune(vacuum_pages=vacuum_pages)
+            return True
+        except Exception as e:
+            logger.error(f"Error pruning api_log: {e}")
+            return False
+    
+    def incremental_vacuum(self, pages=0, schema=MAIN_SCHEMA):
+        """Return up to pages free pages (0 = all) of one database file to the file system;
+        0 if its auto_vacuum is not INCREMENTAL"""
+        cursor = self.connection.cursor()
+        if cursor.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0] != 2:
+            return 0
+        before = cursor.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+        # Run as a script: through execute() the module steps the pragma once and frees a single page
+        self.connection.executescript(f"PRAGMA {schema}.incremental_vacuum({int(pages)})")
+        return before - cursor.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+    
+    def _status_counters_enabled(self):
+        return self.list_manager.get_status_counter_params().get('enabled', False)
+    
+    def rebuild_status_counters(self, table_names):
+        """Reinstall the status counter triggers of the data tables in the list and recount them"""
+        counter_manager = StatusCounterManager(self)
+        data_specs = [spec for spec in self._data_specs(table_names) if counter_manager.supports(spec)]
+        
+        success_count = 0
+        for spec in data_specs:
+            try:
+                counter_manager.rebuild(spec)
+                success_count += 1
+            except Exception as e:
+                logger.error(f"Error rebuilding status counters of {spec.name}: {e}")
+        
+        logger.info(f"Rebuilt status counters of {success_count}/{len(data_specs)} tables")
+        return success_count == len(data_specs)
+    
+    def status_counts(self, table_names=None, batch_version=None):
+        """
+        Pending / uploaded / rejected / deleted counts per table and batch from the counters table,
+        {tabla: {batch_version: counts}}; None on error
+        """
+        try:
+            return StatusCounterManager(self).read(table_names, batch_version)
+        except Exception as e:
+            logger.error(f"Error reading status counters: {e}")
+            return None
+    
+    def _batch_lifecycle_manager(self):
+        batch_params = self.list_manager.get_batch_params()
+        return BatchLifecycleManager(
+            self,
+            keep=batch_params.get('keep', 1),
+            delete_batch=batch_params.get('delete_batch', 5000),
+            compact=batch_params.get('compact', 'incremental')
+        )
+    
+    def _data_specs(self, table_names):
+        with self.metrics.timer('spec_build'):
+            specs = self.spec_manager.get_spec(table_names)
+        return [spec for spec in specs if spec and not spec.is_helper]
+    
+    def promote_batch(self, table_names):
+        """Start the configured batch_version from the rows still current in the previous batch"""
+        batch_version = self.list_manager.get_batch_version()
+        source = self.list_manager.get_batch_params().get('source')
+        lifecycle = self._batch_lifecycle_manager()
+        data_specs = self._data_specs(table_names)
+        
+        success_count = 0
+        for spec in data_specs:
+            try:
+                lifecycle.promote(spec, batch_version, source=source)
+                success_count += 1
+            except Exception as e:
+                logger.error(f"Error promoting {spec.name} to batch {batch_version}: {e}")
+        
+        logger.info(f"Promoted {success_count}/{len(data_specs)} tables to batch {batch_version}")
+        return success_count == len(data_specs)
+    
+    def report_batches(self, table_names):
+        """Log the row counts per batch_version and status of the data tables in the list"""
+        lifecycle = self._batch_lifecycle_manager()
+        report = {}
+        for spec in self._data_specs(table_names):
+            try:
+                report[spec.name] = lifecycle.batch_counts(spec)
+            except Exception as e:
+                logger.error(f"Error counting batches of {spec.name}: {e}")
+                return None
+            for counts in report[spec.name]:
+                logger.info(f"{spec.name} {counts['batch_version']}: {counts['rows']} rows "
+                            f"({counts['pending']} pending, {counts['uploaded']} uploaded, {counts['rejected']} rejected)")
+        return report
+    
+    def prune_batches(self, table_names):
+        """Delete the superseded batches of the data tables in the list, then compact the database"""
+        batch_version = self.list_manager.get_batch_version()
+        lifecycle = self._batch_lifecycle_manager()
+        data_specs = self._data_specs(table_names)
+        
+        success_count = 0
+        for spec in data_specs:
+            try:
+                lifecycle.prune(spec, batch_version)
+                success_count += 1
+            except Exception as e:
+                logger.error(f"Error pruning batches of {spec.name}: {e}")
+        
+        try:
+            lifecycle.compact()
+        except Exception as e:
+            logger.error(f"Error compacting database: {e}")
+            return False
+        
+        logger.info(f"Pruned batches of {success_count}/{len(data_specs)} tables")
+        return success_count == len(data_specs)
+    
+    def _upload_manager(self, upload_params, retry_scheduler):
+        return UploadManager(
+            self,
+            upload_params['url'],
+            batch_size=upload_params.get('batch_size', 500),
+            concurrency=upload_params.get('concurrency', 4),
+            connections=upload_params.get('connections', 4),
+            timeout=upload_params.get('timeout', 30),
+            poll_interval=upload_params.get('poll_interval', 1.0),
+            poll_timeout=upload_params.get('poll_timeout', 120),
+            retry_scheduler=retry_scheduler,
+            api_log=self._api_log_manager()
+        )
+    
+    def upload_tables(self, table_names):
+        """Upload the pending rows of all data tables in the list to the configured server"""
+        upload_params = self.list_manager.get_upload_params()
+        if not upload_params.get('url'):
+            logger.error("No upload url configured in setup.json")
+            return False
+        
+        with self.metrics.timer('spec_build'):
+            specs = self.spec_manager.get_spec(table_names)
+        data_specs = [spec for spec in specs if spec and not spec.is_helper]
+        
+        # Rejected records open a retry in reintentos
+        upload_manager = self._upload_manager(upload_params, self._retry_scheduler())
+        results = upload_manager.run(data_specs, self.list_manager.get_batch_version())
+        success_count = sum(1 for counts in results.values() if counts is not None)
+        
+        logger.info(f"Uploaded {success_count}/{len(data_specs)} tables successfully")
+        return success_count == len(data_specs)
+    
+    def retry_uploads(self, table_names):
+        """Send again the due retries of the data tables in the list, claimed in batches and grouped by table"""
+        upload_params = self.list_manager.get_upload_params()
+        if not upload_params.get('url'):
+            logger.error("No upload url configured in setup.json")
+            return False
+        
+        with self.metrics.timer('spec_build'):
+            specs = self.spec_manager.get_spec(table_names)
+        data_specs = [spec for spec in specs if spec and not spec.is_helper]
+        
+        retry_scheduler = self._retry_scheduler()
+        upload_manager = self._upload_manager(upload_params, retry_scheduler)
+        batch_version = self.list_manager.get_batch_version()
+        claim_size = self.list_manager.get_retry_params().get('batch_size', 500)
+        
+        success = True
+        claimed_count = 0
+        # Claimed retries are leased into the future, so each pass only sees new due rows
+        while True:
+            claimed = retry_scheduler.claim_due(limit=claim_size, tables=[spec.name for spec in data_specs])
+            if not claimed:
+                break
+            claimed_count += sum(len(rows) for rows in claimed.values())
+            results = upload_manager.run_retries(data_specs, claimed, batch_version)
+            success = success and all(counts is not None for counts in results.values())
+        
+        logger.info(f"Processed {claimed_count} due retries")
+        return success
+    
     def _delete_tables(self, table_names):
         """Delete all tables in the list"""
         success_count = 0
@@ -252,7 +955,7 @@ class DatabaseManager:
             if self.drop_table(table_name):
                 success_count += 1
         
-        print(f"Deleted {success_count}/{len(table_names)} tables successfully")
+        logger.info(f"Deleted {success_count}/{len(table_names)} tables successfully")
         return success_count == len(table_names)
     
     def close(self):
@@ -260,7 +963,7 @@ class DatabaseManager:
         if self.connection:
             self.connection.close()
             self.connection = None
-            print("Database connection closed")
+            logger.info("Database connection closed")
     
     def __enter__(self):
         """Context manager entry"""
@@ -0,0 +1,372 @@
+import os
+import mmap
+import struct
+import datetime
+
+from .memo_reader import MemoReader, DEFAULT_MEMO_CACHE
+
+# Field types whose record bytes are a block number into the memo side file
+MEMO_TYPES = ('M', 'G', 'P')
+
+
+class DbfField:
+    """Field descriptor parsed from the DBF header"""
+
+    __slots__ = ('name', 'type', 'offset', 'length', 'decimals')
+
+    def __init__(self, name, field_type, offset, length, decimals) -> None:
+        self.name = name
+        self.type = field_type
+        self.offset = offset  # offset inside the record, the deletion flag is byte 0
+        self.length = length
+        self.decimals = decimals
+
+    def __repr__(self):
+        return f"DbfField({self.name!r}, {self.type!r}, offset={self.offset}, length={self.length}, decimals={self.decimals})"
+
+
+class DbfRecord:
+    """
+    One record yielded by DbfReader.records.
+
+    recno is the 1-based physical record number (RECNO() in FoxPro), deleted is the
+    DBF deletion flag and values holds the decoded projected fields, in the order
+    they were requested.
+    """
+
+    __slots__ = ('recno', 'deleted', 'values')
+
+    def __init__(self, recno, deleted, values) -> None:
+        self.recno = recno
+        self.deleted = deleted
+        self.values = values
+
+    def __repr__(self):
+        return f"DbfRecord(recno={self.recno}, deleted={self.deleted}, values={self.values!r})"
+
+
+class DbfReader:
+    """
+    Streaming reader for dBase III / FoxPro / Visual FoxPro .dbf files.
+
+    The file is memory-mapped and the header and field descriptors are parsed once.
+    Records are produced lazily and only the requested fields are decoded, so reading
+    a large file costs memory proportional to one record, not to the file.
+
+    Memo fields decode to their block number. The memo side file is only opened
+    when memo contents are asked for (memo, memo_getter), see MemoReader.
+
+    Usage:
+        with DbfReader(path) as reader:
+            for record in reader.records(['NO_REFEREN', 'FECHA']):
+                ...
+    """
+
+    DELETED_FLAG = 0x2A  # '*'
+    HEADER_TERMINATOR = 0x0D
+
+    def __init__(self, path, encoding='cp1252', memo_cache=DEFAULT_MEMO_CACHE) -> None:
+        self.path = path
+        self.encoding = encoding
+        self.memo_cache = memo_cache
+
+        self._file = None
+        self._buffer = None
+        self._memo = None
+
+        # Header info, filled by open()
+        self.version = None
+        self.last_update = None
+        self.header_record_count = 0
+        self.record_count = 0
+        self.header_length = 0
+        self.record_length = 0
+        self.file_size = 0
+        self.file_mtime = None
+        self.file_mtime_ns = None
+        self.fields = []
+        self.fields_by_name = {}
+
+    def open(self):
+        """Open and memory-map the file, parse the header and field descriptors"""
+        self._file = open(self.path, 'rb')
+        try:
+            stat = os.fstat(self._file.fileno())
+            self.file_size = stat.st_size
+            self.file_mtime = stat.st_mtime
+            self.file_mtime_ns = stat.st_mtime_ns
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parse_header()
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def _parse_header(self):
+        buffer = self._buffer
+        if len(buffer) < 32:
+            raise ValueError(f"Not a DBF file (too short): {self.path}")
+
+        self.version = buffer[0]
+        self.last_update = _decode_update_date(buffer)
+        self.header_record_count, self.header_length, self.record_length = struct.unpack_from('<IHH', buffer, 4)
+        if self.record_length <= 0:
+            raise ValueError(f"Invalid record length in DBF header: {self.path}")
+
+        # The header count can be ahead of the data while the POS is appending
+        available = max(0, (len(buffer) - self.header_length) // self.record_length)
+        self.record_count = min(self.header_record_count, available)
+
+        fields = []
+        offset = 1  # byte 0 of every record is the deletion flag
+        position = 32
+        while position + 32 <= self.header_length and buffer[position] != self.HEADER_TERMINATOR:
+            raw_name = buffer[position:position + 11].split(b'\x00', 1)[0]
+            name = raw_name.decode('ascii', errors='replace').strip().upper()
+            field_type = chr(buffer[position + 11])
+            length = buffer[position + 16]
+            decimals = buffer[position + 17]
+
+            fields.append(DbfField(name, field_type, offset, length, decimals))
+            offset += length
+            position += 32
+
+        self.fields = fields
+        self.fields_by_name = {field.name: field for field in fields}
+
+    def close(self):
+        """Release the memory maps and the file handles"""
+        if self._memo is not None:
+            self._memo.close()
+            self._memo = None
+        if self._buffer is not None:
+            try:
+                self._buffer.close()
+            except BufferError:
+                # A memoryview from raw_records is still alive, the map is
+                # released when the last view is garbage collected
+                pass
+            self._buffer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def peek_header(path):
+        """
+        (record_count, last_update, file_size, mtime_ns) from the first 12 bytes of a DBF,
+        without mapping it; record_count and last_update as an opened reader reports them
+        """
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            header = file.read(12)
+        if len(header) < 12:
+            raise ValueError(f"Not a DBF file (too short): {path}")
+        header_record_count, header_length, record_length = struct.unpack_from('<IHH', header, 4)
+        available = max(0, (stat.st_size - header_length) // record_length) if record_length else 0
+        return min(header_record_count, available), _decode_update_date(header), stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def find_table_file(folder, table_name, extension='.dbf'):
+        """Path of TABLE.DBF inside folder, matching the name case-insensitively; None if missing"""
+        if not folder or not os.path.isdir(folder):
+            return None
+
+        wanted = f"{table_name}{extension}".lower()
+        for entry in os.listdir(folder):
+            if entry.lower() == wanted:
+                return os.path.join(folder, entry)
+        return None
+
+    @property
+    def field_names(self):
+        return [field.name for field in self.fields]
+
+    def get_fields(self, names=None):
+        """Return the DbfField descriptors for names (all fields when None)"""
+        if names is None:
+            return list(self.fields)
+
+        fields = []
+        for name in names:
+            field = self.fields_by_name.get(name.upper())
+            if field is None:
+                raise KeyError(f"Field '{name}' not found in {self.path}")
+            fields.append(field)
+        return fields
+
+    @property
+    def memo_reader(self):
+        """MemoReader of the side file, opened on first use"""
+        if self._memo is None:
+            memo_path = MemoReader.find_memo_file(self.path)
+            if not memo_path:
+                raise FileNotFoundError(f"Memo file (.fpt/.dbt) for {self.path} not found")
+            self._memo = MemoReader(memo_path, cache_size=self.memo_cache).open()
+        return self._memo
+
+    def memo(self, block):
+        """Raw contents of a memo block, None for an empty memo"""
+        if not block:
+            return None
+        return self.memo_reader.read(block)
+
+    def memo_getter(self, field):
+        """record -> raw memo contents (b'' when empty) of a memo field, for hashing without decoding"""
+        if field.type not in MEMO_TYPES:
+            raise ValueError(f"Field '{field.name}' of {self.path} is not a memo field")
+        begin, end = field.offset, field.offset + field.length
+        memo = self.memo
+
+        def memo_contents(record):
+            return memo(_decode_memo_block(bytes(record[begin:end]))) or b''
+        return memo_contents
+
+    def record_offset(self, recno):
+        """Byte offset of a 1-based record number inside the file"""
+        return self.header_length + (recno - 1) * self.record_length
+
+    def is_deleted(self, recno):
+        """Deletion flag of a record, read straight from the mapped buffer"""
+        return self._buffer[self.record_offset(recno)] == self.DELETED_FLAG
+
+    def raw_records(self, start=1, stop=None):
+        """
+        Yield (recno, deleted, memoryview) for records start..stop (1-based, inclusive).
+        The memoryview points into the memory map, nothing is copied; release it
+        (or drop it) before closing the reader.
+        """
+        stop = self.record_count if stop is None else min(stop, self.record_count)
+        record_length = self.record_length
+        view = memoryview(self._buffer)
+        try:
+            offset = self.record_offset(start)
+            for recno in range(start, stop + 1):
+                yield recno, view[offset] == self.DELETED_FLAG, view[offset:offset + record_length]
+                offset += record_length
+        finally:
+            view.release()
+
+    def records(self, fields=None, start=1, stop=None, include_deleted=True):
+        """
+        Yield DbfRecord objects for records start..stop (1-based, inclusive),
+        decoding only the given fields (all fields when None)
+        """
+        projection = [(field.offset, field.offset + field.length, self._decoder(field))
+                      for field in self.get_fields(fields)]
+
+        buffer = self._buffer
+        record_length = self.record_length
+        deleted_flag = self.DELETED_FLAG
+        stop = self.record_count if stop is None else min(stop, self.record_count)
+
+        offset = self.record_offset(start)
+        for recno in range(start, stop + 1):
+            deleted = buffer[offset] == deleted_flag
+            if deleted and not include_deleted:
+                offset += record_length
+                continue
+
+            values = tuple(decode(buffer[offset + begin:offset + end]) for begin, end, decode in projection)
+            yield DbfRecord(recno, deleted, values)
+            offset += record_length
+
+    def _decoder(self, field):
+        """Return the function that turns the raw bytes of field into a Python value"""
+        field_type = field.type
+        encoding = self.encoding
+
+        if field_type == 'C':
+            return lambda raw: raw.decode(encoding, errors='replace').rstrip(' \x00')
+        if field_type in ('N', 'F'):
+            if field.decimals:
+                return _decode_float
+            return _decode_int
+        if field_type == 'D':
+            return _decode_date
+        if field_type == 'L':
+            return _decode_logical
+        if field_type == 'I':
+            return lambda raw: struct.unpack('<i', raw)[0]
+        if field_type == 'B':
+            return lambda raw: struct.unpack('<d', raw)[0]
+        if field_type == 'Y':
+            return lambda raw: struct.unpack('<q', raw)[0] / 10000
+        if field_type == 'T':
+            return _decode_datetime
+        if field_type in MEMO_TYPES:
+            # Memo block number; the memo contents live in the side file
+            return _decode_memo_block
+        return bytes
+
+
+def _decode_update_date(header):
+    try:
+        # Years are stored as an offset from 1900
+        return datetime.date(1900 + header[1], header[2], header[3])
+    except ValueError:
+        return None
+
+
+def _decode_int(raw):
+    text = raw.strip(b' \x00*')
+    if not text:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        return _decode_float(raw)
+
+
+def _decode_float(raw):
+    text = raw.strip(b' \x00*')
+    if not text:
+        return None
+    try:
+        return float(text.replace(b',', b'.'))
+    except ValueError:
+        return None
+
+
+def _decode_date(raw):
+    text = raw.strip(b' \x00')
+    if len(text) != 8:
+        return None
+    try:
+        return datetime.date(int(text[0:4]), int(text[4:6]), int(text[6:8]))
+    except ValueError:
+        return None
+
+
+def _decode_logical(raw):
+    value = raw[:1]
+    if value in (b'T', b't', b'Y', b'y'):
+        return True
+    if value in (b'F', b'f', b'N', b'n'):
+        return False
+    return None
+
+
+def _decode_datetime(raw):
+    # Visual FoxPro: Julian day number + milliseconds since midnight
+    julian_day, milliseconds = struct.unpack('<ii', raw)
+    if julian_day == 0:
+        return None
+    date = datetime.date.fromordinal(julian_day - 1721425)
+    return datetime.datetime.combine(date, datetime.time()) + datetime.timedelta(milliseconds=milliseconds)
+
+
+def _decode_memo_block(raw):
+    if len(raw) == 4:
+        # Visual FoxPro stores the block number as a 4 byte integer
+        block = struct.unpack('<I', raw)[0]
+    else:
+        text = raw.strip(b' \x00')
+        block = int(text) if text.isdigit() else 0
+    return block or None
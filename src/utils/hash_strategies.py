@@ -0,0 +1,98 @@
+import hashlib
+from operator import itemgetter
+
+# Strategy used when neither the table nor the dbf section of setup.json names one
+DEFAULT_HASH_STRATEGY = 'blake2b'
+
+# Separator used when several fields are combined into one id or hash input
+FIELD_SEPARATOR = b'\x1f'
+
+# Padding trimmed from each field: DBF writers pad with spaces or with NUL bytes
+FIELD_PADDING = b' \x00'
+
+
+def _blake2b(digest_size=16):
+    blake2b = hashlib.blake2b
+
+    def digest(data):
+        return blake2b(data, digest_size=digest_size).hexdigest()
+    return digest
+
+
+def _md5():
+    md5 = hashlib.md5
+
+    def digest(data):
+        return md5(data, usedforsecurity=False).hexdigest()
+    return digest
+
+
+def _sha1():
+    sha1 = hashlib.sha1
+
+    def digest(data):
+        return sha1(data, usedforsecurity=False).hexdigest()
+    return digest
+
+
+# name -> factory(**options) returning digest(bytes) -> hex str
+HASH_STRATEGIES = {
+    'blake2b': _blake2b,
+    'md5': _md5,
+    'sha1': _sha1
+}
+
+_digests = {}
+
+
+def register_hash_strategy(name, factory):
+    """Add a strategy: factory(**options) must return a digest(bytes) -> str function"""
+    HASH_STRATEGIES[name] = factory
+    for key in [key for key in _digests if key[0] == name]:
+        del _digests[key]
+
+
+def get_hash_strategy(config=None):
+    """
+    Digest function for a hash strategy config, as written in setup.json:
+        "md5"  or  {"name": "blake2b", "digest_size": 8}
+    Digest functions are built once per distinct config.
+    """
+    if not config:
+        config = DEFAULT_HASH_STRATEGY
+    if isinstance(config, str):
+        name, options = config, {}
+    else:
+        options = dict(config)
+        name = options.pop('name', DEFAULT_HASH_STRATEGY)
+
+    key = (name, tuple(sorted(options.items())))
+    digest = _digests.get(key)
+    if digest is None:
+        if name not in HASH_STRATEGIES:
+            raise ValueError(f"Unknown hash strategy '{name}', expected one of {sorted(HASH_STRATEGIES)}")
+        digest = _digests[key] = HASH_STRATEGIES[name](**options)
+    return digest
+
+
+def build_field_normalizer(slices, separator=FIELD_SEPARATOR):
+    """
+    Precompiled record -> bytes function for a list of (begin, end) field slices:
+    the raw bytes of each field, trimmed of FIELD_PADDING, joined with separator. Nothing is decoded,
+    the record (memoryview or bytes) is copied at most once.
+    """
+    if not slices:
+        return None
+
+    if len(slices) == 1:
+        begin, end = slices[0]
+
+        def normalize_field(record):
+            return bytes(record[begin:end]).strip(FIELD_PADDING)
+        return normalize_field
+
+    get_fields = itemgetter(*(slice(begin, end) for begin, end in slices))
+
+    def normalize_fields(record):
+        return separator.join([field.strip(FIELD_PADDING) for field in get_fields(bytes(record))])
+    return normalize_fields
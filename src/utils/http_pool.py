@@ -0,0 +1,147 @@
+import asyncio
+import json
+import ssl
+from urllib.parse import urlsplit
+
+
+class HttpError(Exception):
+    """Transport level failure talking to the server (connection, timeout, malformed response)"""
+
+
+class AsyncHttpPool:
+    """
+    Minimal asyncio HTTP/1.1 client for one server: keep-alive connections are
+    reused across requests and at most size requests are in flight at once.
+
+        pool = AsyncHttpPool("http://localhost:8080/api", size=4)
+        status, data, text = await pool.request_json('POST', '/lotes', {...})
+        await pool.close()
+    """
+
+    def __init__(self, base_url, size=4, timeout=30) -> None:
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"Unsupported url scheme in {base_url}")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.size = size
+        self._idle = []
+        self._slots = None
+
+    async def _open(self):
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+
+    @staticmethod
+    def _close_connection(connection):
+        connection[1].close()
+
+    async def _exchange(self, connection, method, path, body):
+        reader, writer = connection
+        head = (
+            f"{method} {self.base_path}{path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Accept: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: keep-alive\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        try:
+            status = int(status_line.split(None, 2)[1])
+        except (IndexError, ValueError):
+            raise HttpError(f"Malformed status line {status_line!r}")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            payload = b''.join(chunks)
+        elif 'content-length' in headers:
+            payload = await reader.readexactly(int(headers['content-length']))
+        else:
+            payload = await reader.read()
+            keep_alive = False
+
+        return status, payload, keep_alive
+
+    async def request(self, method, path, body=b''):
+        """Send one request; returns (status, body bytes)"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+
+        async with self._slots:
+            reused = bool(self._idle)
+            connection = self._idle.pop() if reused else None
+            try:
+                # Connecting is inside the try so a refused or timed out connect is an HttpError too
+                if connection is None:
+                    connection = await self._open()
+                try:
+                    status, payload, keep_alive = await asyncio.wait_for(
+                        self._exchange(connection, method, path, body), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if not reused:
+                        raise
+                    # The server dropped an idle keep-alive connection, retry once on a new one
+                    self._close_connection(connection)
+                    connection = None
+                    connection = await self._open()
+                    status, payload, keep_alive = await asyncio.wait_for(
+                        self._exchange(connection, method, path, body), self.timeout)
+            except HttpError:
+                if connection is not None:
+                    self._close_connection(connection)
+                raise
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                if connection is not None:
+                    self._close_connection(connection)
+                raise HttpError(f"{method} {path} failed: {type(e).__name__}: {e}") from e
+
+            if keep_alive:
+                self._idle.append(connection)
+            else:
+                self._close_connection(connection)
+            return status, payload
+
+    async def request_json(self, method, path, document=None):
+        """Send a JSON document; returns (status, parsed JSON or None, response text)"""
+        body = b'' if document is None else json.dumps(document, ensure_ascii=False).encode('utf-8')
+        status, payload = await self.request(method, path, body)
+        text = payload.decode('utf-8', errors='replace')
+        try:
+            data = json.loads(text) if text else None
+        except json.JSONDecodeError:
+            data = None
+        return status, data, text
+
+    async def close(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
@@ -0,0 +1,134 @@
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def configure_logging(params=None):
+    """
+    Configure the 'utils' loggers from the logging section of setup.json:
+        {"level": "INFO", "file": null, "format": "..."}
+    Safe to call more than once, the handler is replaced.
+    """
+    params = params or {}
+    level = getattr(logging, str(params.get('level', 'INFO')).upper(), logging.INFO)
+
+    if params.get('file'):
+        handler = logging.FileHandler(params['file'], encoding='utf-8')
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(params.get('format', LOG_FORMAT)))
+
+    logger = logging.getLogger('utils')
+    for old_handler in list(logger.handlers):
+        logger.removeHandler(old_handler)
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+class PhaseStats:
+    """Accumulated time, calls, rows and statements of one phase (optionally per table)"""
+
+    __slots__ = ('phase', 'table', 'calls', 'seconds', 'rows', 'statements')
+
+    def __init__(self, phase, table=None) -> None:
+        self.phase = phase
+        self.table = table
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.statements = 0
+
+    def add(self, rows=0, statements=0):
+        self.rows += rows
+        self.statements += statements
+
+    def to_dict(self):
+        return {
+            'phase': self.phase,
+            'table': self.table,
+            'calls': self.calls,
+            'seconds': round(self.seconds, 6),
+            'rows': self.rows,
+            'statements': self.statements,
+            'rows_per_sec': round(self.rows / self.seconds, 1) if self.seconds > 0 and self.rows else None
+        }
+
+
+class Metrics:
+    """
+    Per-phase timers and counters for a run:
+
+        with metrics.timer('ddl', table_name) as phase:
+            ...
+            phase.add(statements=1)
+
+    Phases used: config_load, spec_build, ddl, insert, diff (per table), upload, ...
+    """
+
+    def __init__(self) -> None:
+        self._phases = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _get(self, phase, table):
+        key = (phase, table)
+        with self._lock:
+            stats = self._phases.get(key)
+            if stats is None:
+                stats = self._phases[key] = PhaseStats(phase, table)
+            return stats
+
+    @contextmanager
+    def timer(self, phase, table=None):
+        stats = self._get(phase, table)
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats.calls += 1
+                stats.seconds += elapsed
+
+    def add(self, phase, table=None, rows=0, statements=0):
+        """Count rows / statements without timing"""
+        stats = self._get(phase, table)
+        with self._lock:
+            stats.add(rows, statements)
+
+    def summary(self):
+        with self._lock:
+            phases = [stats.to_dict() for stats in self._phases.values()]
+        phases.sort(key=lambda item: item['seconds'], reverse=True)
+        return {
+            'started': self.started,
+            'elapsed': round(time.time() - self.started, 6),
+            'statements': sum(item['statements'] for item in phases),
+            'rows': sum(item['rows'] for item in phases),
+            'phases': phases
+        }
+
+    def log_summary(self, logger, level=logging.INFO):
+        summary = self.summary()
+        logger.log(level, "Run took %.3fs, %d statements, %d rows",
+                   summary['elapsed'], summary['statements'], summary['rows'])
+        for item in summary['phases']:
+            logger.log(level, "  %-12s %-24s %4d calls %9.3fs %10d rows %6d stmts%s",
+                       item['phase'], item['table'] or '-', item['calls'], item['seconds'],
+                       item['rows'], item['statements'],
+                       f" {item['rows_per_sec']:.0f} rows/s" if item['rows_per_sec'] else '')
+
+    def dump_json(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._phases = {}
+            self.started = time.time()
@@ -0,0 +1,140 @@
+import os
+import mmap
+import struct
+from collections import OrderedDict
+
+# Memo side files of a DBF, in lookup order
+MEMO_EXTENSIONS = ('.fpt', '.dbt')
+
+# Blocks kept decoded by default; memos repeated across records (notes, comments) hit the cache
+DEFAULT_MEMO_CACHE = 256
+
+DBASE3_BLOCK_SIZE = 512
+DBASE3_TERMINATOR = b'\x1a'
+DBASE4_BLOCK_MARKER = b'\xff\xff\x08\x00'
+
+
+class MemoReader:
+    """
+    Random access reader for the memo side file of a DBF (.FPT for FoxPro / Visual
+    FoxPro, .DBT for dBase III and IV).
+
+    The file is memory-mapped and a memo is read from its block offset only when
+    asked for, so records whose memos are never needed cost no memo I/O. The last
+    cache_size memos read are kept in an LRU cache.
+
+    read() returns the raw memo bytes (None for block 0, or a block past the end
+    of the file, e.g. appended after the file was mapped).
+    """
+
+    def __init__(self, path, cache_size=DEFAULT_MEMO_CACHE) -> None:
+        self.path = path
+        self.cache_size = max(0, cache_size)
+        self.format = None
+        self.block_size = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._file = None
+        self._buffer = None
+        self._cache = OrderedDict()
+
+    def open(self):
+        self._file = open(self.path, 'rb')
+        try:
+            if os.fstat(self._file.fileno()).st_size == 0:
+                raise ValueError(f"Empty memo file: {self.path}")
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parse_header()
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def _parse_header(self):
+        buffer = self._buffer
+        if len(buffer) < 8:
+            raise ValueError(f"Not a memo file (too short): {self.path}")
+
+        if self.path.lower().endswith('.fpt'):
+            # Big-endian block size at offset 6; every block starts with type and length
+            self.format = 'fpt'
+            self.block_size = struct.unpack_from('>H', buffer, 6)[0] or 64
+            return
+
+        block_size = struct.unpack_from('<H', buffer, 20)[0] if len(buffer) >= 22 else 0
+        if block_size and buffer[block_size:block_size + 4] == DBASE4_BLOCK_MARKER:
+            self.format = 'dbase4'
+            self.block_size = block_size
+        else:
+            self.format = 'dbase3'
+            self.block_size = DBASE3_BLOCK_SIZE
+
+    def close(self):
+        self._cache.clear()
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def find_memo_file(dbf_path):
+        """Memo file next to a DBF (same name, .fpt or .dbt in any case); None if there is none"""
+        folder, name = os.path.split(dbf_path)
+        base = os.path.splitext(name)[0].lower()
+        candidates = {entry.lower(): entry for entry in os.listdir(folder or '.')}
+        for extension in MEMO_EXTENSIONS:
+            entry = candidates.get(base + extension)
+            if entry:
+                return os.path.join(folder, entry)
+        return None
+
+    def read(self, block):
+        """Raw contents of the memo starting at block"""
+        if not block:
+            return None
+
+        cache = self._cache
+        data = cache.get(block)
+        if data is not None:
+            cache.move_to_end(block)
+            self.hits += 1
+            return data
+
+        self.misses += 1
+        data = self._read_block(block)
+        if data is not None and self.cache_size:
+            cache[block] = data
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return data
+
+    def _read_block(self, block):
+        buffer = self._buffer
+        offset = block * self.block_size
+        if offset >= len(buffer):
+            return None
+
+        if self.format == 'fpt':
+            if offset + 8 > len(buffer):
+                return None
+            length = struct.unpack_from('>I', buffer, offset + 4)[0]
+            return buffer[offset + 8:offset + 8 + length]
+
+        if self.format == 'dbase4':
+            if buffer[offset:offset + 4] != DBASE4_BLOCK_MARKER:
+                return None
+            # The stored length counts the 8 byte block header
+            length = struct.unpack_from('<I', buffer, offset + 4)[0]
+            return buffer[offset + 8:offset + max(8, length)]
+
+        end = buffer.find(DBASE3_TERMINATOR, offset)
+        return buffer[offset:end if end >= 0 else len(buffer)]
@@ -0,0 +1,261 @@
+import logging
+import os
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .dbf_reader import DbfReader
+from .memo_reader import DEFAULT_MEMO_CACHE
+from .change_detector import ChangeDetector, RecordHasher
+from .tail_scan import TailScanManager
+
+logger = logging.getLogger(__name__)
+
+
+def _scan_worker(job, results):
+    """
+    Runs in a worker process: reads and hashes one DBF and sends the tracking rows
+    back in batches through the results queue. The worker never touches SQLite.
+
+    Messages: ('rows', table, [row, ...]), ('done', table, {...}), ('error', table, message)
+    """
+    table_name = job['table_spec']['name']
+    try:
+        tail_manager = TailScanManager(None, sample_size=job['sample_size'])
+
+        with DbfReader(job['dbf_path'], encoding=job['encoding'], memo_cache=job['memo_cache']) as reader:
+            mode, start, reason = tail_manager.plan(reader, job['state'], job['table_spec']['schema'])
+            hasher = RecordHasher(reader, job['table_spec'], vectorized=job['vectorized'],
+                                  chunk_records=job['vector_chunk'])
+
+            batch_size = job['batch_size']
+            batch = []
+            for row in hasher.rows(start=start):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    results.put(('rows', table_name, batch))
+                    batch = []
+            if batch:
+                results.put(('rows', table_name, batch))
+
+            results.put(('done', table_name, {
+                'mode': mode,
+                'reason': reason,
+                'info': tail_manager.header_info(reader)
+            }))
+
+    except Exception as e:
+        results.put(('error', table_name, f"{type(e).__name__}: {e}"))
+
+
+class _TableWriter:
+    """Applies the worker messages of the tables in one database file over one connection"""
+
+    def __init__(self, db_manager, batch_size, sample_size, use_tail_scan, batch_version) -> None:
+        self.db_manager = db_manager
+        self.detector = ChangeDetector(db_manager, chunk_size=batch_size)
+        self.tail_manager = TailScanManager(db_manager, sample_size=sample_size)
+        self.use_tail_scan = use_tail_scan
+        self.batch_version = batch_version
+        self.scanned = {}
+        self.failed = set()
+
+    def prepare(self, spec):
+        self.detector.create_scan_table(spec)
+        self.scanned[spec['name']] = 0
+
+    def apply(self, spec, kind, payload, results):
+        """Handle one message; returns True when the table is finished (applied or failed)"""
+        table_name = spec['name']
+        if table_name in self.failed:
+            return True
+        connection = self.db_manager.connection
+        try:
+            if kind == 'rows':
+                self.scanned[table_name] += self.detector.load_rows(spec, payload)
+                # Only TEMP pages are dirty here, the commit does not sync the main
+                # database and a later rollback can only undo the failing table's work
+                connection.commit()
+                return False
+
+            if kind == 'done':
+                logger.info(f"Scanned {table_name} ({payload['mode']}: {payload['reason']})")
+
+                def save_state():
+                    if self.use_tail_scan:
+                        self.tail_manager.save_state(table_name, payload['info'], self.batch_version)
+
+                counts = self.detector.finish_scan(spec, self.batch_version, self.scanned[table_name],
+                                                   partial=(payload['mode'] == 'tail'),
+                                                   before_commit=save_state)
+                counts['mode'] = payload['mode']
+                logger.info(f"Applied {table_name}: {counts}")
+                results[table_name] = counts
+                return True
+
+            logger.error(f"Error scanning table {table_name}: {payload}")
+            results[table_name] = None
+            return True
+
+        except Exception as e:
+            logger.error(f"Error writing table {table_name}: {e}")
+            if connection.in_transaction:
+                connection.rollback()
+            results[table_name] = None
+            self.failed.add(table_name)
+            return True
+
+    def serve(self, messages, specs_by_name, results):
+        """Thread body of a shard writer: apply queued messages until the None sentinel"""
+        while True:
+            message = messages.get()
+            if message is None:
+                return
+            kind, table_name, payload = message
+            self.apply(specs_by_name[table_name], kind, payload, results)
+
+
+class ParallelScanManager:
+    """
+    Scans several tables at once: every DBF is read and hashed in a worker process
+    and the rows come back in batches to this process, which writes them to SQLite.
+    Batches are loaded into each table's TEMP scan table as they arrive and the
+    table's UPSERT is applied when its worker is done.
+
+    Without a shard layout this process is the only writer. With one, every database
+    file gets a writer thread with its own connection (DatabaseManager.open_writer),
+    so tables in different shards load and commit at the same time.
+    """
+
+    def __init__(self, db_manager, workers=0, batch_size=5000, queue_depth=8) -> None:
+        self.db_manager = db_manager
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+
+    def run(self, specs, force=False):
+        """Scan the given data table specs; returns {table_name: counts or None on error}
+
+        force never skips a table on an unchanged header (see DatabaseManager.scan_table)
+        """
+        list_manager = self.db_manager.list_manager
+        dbf_params = list_manager.get_dbf_params()
+        batch_version = list_manager.get_batch_version()
+        use_tail_scan = dbf_params.get('tail_scan', True)
+
+        tail_manager = TailScanManager(self.db_manager, sample_size=dbf_params.get('sample_size', 64))
+
+        results = {}
+        jobs = []
+        for spec in specs:
+            table_name = spec['name']
+            dbf_path = DbfReader.find_table_file(dbf_params.get('path'), table_name)
+            if not dbf_path:
+                logger.warning(f"DBF file for table {table_name} not found in {dbf_params.get('path')}")
+                results[table_name] = None
+                continue
+
+            state = tail_manager.get_state(table_name, batch_version) if use_tail_scan else None
+            if not force and tail_manager.is_unchanged(state, dbf_path):
+                logger.info(f"Skipping {table_name}: DBF unchanged since last scan")
+                results[table_name] = {'scanned': 0, 'new': 0, 'changed': 0, 'unchanged': 0, 'deleted': 0, 'mode': 'skip'}
+                continue
+
+            jobs.append({
+                'table_spec': spec,
+                'dbf_path': dbf_path,
+                'encoding': dbf_params.get('encoding', 'cp1252'),
+                'memo_cache': dbf_params.get('memo_cache', DEFAULT_MEMO_CACHE),
+                'state': state,
+                'batch_size': self.batch_size,
+                'vectorized': dbf_params.get('vectorized', True),
+                'vector_chunk': dbf_params.get('vector_chunk', 131072),
+                'sample_size': tail_manager.sample_size
+            })
+
+        if not jobs:
+            return results
+
+        specs_by_name = {job['table_spec']['name']: job['table_spec'] for job in jobs}
+        shards = self.db_manager.shards
+
+        def new_writer(db_manager):
+            return _TableWriter(db_manager, self.batch_size, tail_manager.sample_size, use_tail_scan, batch_version)
+
+        # One writer per database file; without shards the rows are written inline by this thread
+        writers = {}
+        if shards:
+            for spec in specs_by_name.values():
+                schema = shards.schema(spec['name'])
+                if schema not in writers:
+                    writers[schema] = new_writer(self.db_manager.open_writer(schema))
+            writer_of = {name: writers[shards.schema(name)] for name in specs_by_name}
+        else:
+            inline_writer = new_writer(self.db_manager)
+            writer_of = {name: inline_writer for name in specs_by_name}
+
+        for name, spec in specs_by_name.items():
+            writer_of[name].prepare(spec)
+
+        queues = {}
+        threads = []
+        for schema, writer in writers.items():
+            queues[schema] = queue.Queue(maxsize=self.queue_depth)
+            thread = threading.Thread(target=writer.serve, args=(queues[schema], specs_by_name, results),
+                                      name=f"writer-{schema}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        def dispatch(kind, table_name, payload):
+            if queues:
+                queues[shards.schema(table_name)].put((kind, table_name, payload))
+            else:
+                writer_of[table_name].apply(specs_by_name[table_name], kind, payload, results)
+
+        logger.info(f"Scanning {len(jobs)} tables with {min(self.workers, len(jobs))} worker processes"
+                    f"{f' and {len(writers)} shard writers' if writers else ''}")
+
+        try:
+            with multiprocessing.Manager() as process_manager:
+                # Bounded queue: workers block instead of piling batches up in memory
+                result_queue = process_manager.Queue(maxsize=self.queue_depth)
+
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+                    futures = {executor.submit(_scan_worker, job, result_queue): job['table_spec']['name'] for job in jobs}
+                    pending = set(specs_by_name)
+
+                    while pending:
+                        try:
+                            kind, table_name, payload = result_queue.get(timeout=1)
+                        except queue.Empty:
+                            # A worker process that died never sends 'done' or 'error'
+                            for future, name in futures.items():
+                                if name in pending and future.done() and future.exception() is not None:
+                                    dispatch('error', name, f"worker failed: {future.exception()}")
+                                    pending.discard(name)
+                            continue
+
+                        if table_name not in pending:
+                            # Late batches of a table that already failed
+                            continue
+
+                        dispatch(kind, table_name, payload)
+                        if kind != 'rows' or (not queues and table_name in writer_of[table_name].failed):
+                            pending.discard(table_name)
+
+                    # Drain late batches so workers of failed tables do not block on a full queue
+                    while not all(future.done() for future in futures):
+                        try:
+                            result_queue.get(timeout=0.1)
+                        except queue.Empty:
+                            pass
+        finally:
+            for messages in queues.values():
+                messages.put(None)
+            for thread in threads:
+                thread.join()
+            for writer in writers.values():
+                writer.db_manager.close()
+
+        return results
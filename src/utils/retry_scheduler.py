@@ -0,0 +1,123 @@
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+
+class RetryScheduler:
+    """
+    Drives the reintentos helper table: one open row (status 0) per failed record,
+    due at proximo_intento. Due rows are claimed in batches through the
+    (status, proximo_intento) index and leased (proximo_intento pushed lease seconds
+    ahead) so a crash does not lose them; after each attempt a row is completed
+    (status 1), rescheduled with exponential backoff plus jitter, or given up
+    (status 2) once max_attempts is reached.
+    """
+
+    TABLE = "reintentos"
+
+    def __init__(self, db_manager, base_delay=30, max_delay=3600, max_attempts=8, jitter=0.5, lease=300) -> None:
+        self.db_manager = db_manager
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.jitter = jitter
+        self.lease = lease
+
+    def backoff(self, attempts):
+        """Seconds until the next attempt after the given number of attempts"""
+        delay = min(self.max_delay, self.base_delay * 2 ** max(0, attempts - 1))
+        # Equal jitter: keep part of the delay, randomize the rest so a burst of failures spreads out
+        return delay * (1 - self.jitter) + random.uniform(0, delay * self.jitter)
+
+    def schedule(self, table_name, entries):
+        """
+        Open a retry for each (id_local, referencia, error) entry, due now; records that
+        already have an open retry only get ultimo_error updated. Joins the caller's transaction.
+        """
+        cursor = self.db_manager.connection.cursor()
+        cursor.executemany(
+            f"INSERT INTO {self.TABLE} (tabla, id_local, referencia, status, intentos, proximo_intento, ultimo_error) "
+            f"VALUES (?, ?, ?, 0, 0, datetime('now'), ?) "
+            f"ON CONFLICT (tabla, id_local) WHERE status = 0 DO UPDATE SET ultimo_error = excluded.ultimo_error",
+            [(table_name, id_local, referencia, error) for id_local, referencia, error in entries]
+        )
+        return len(entries)
+
+    def claim_due(self, limit=500, tables=None):
+        """
+        Claim up to limit due retries (attempt counted, lease applied) and commit.
+        Returns {tabla: [(rowid, id_local, referencia, intentos), ...]}
+        """
+        table_filter = ""
+        params = []
+        if tables:
+            table_filter = f"AND tabla IN ({', '.join('?' for _ in tables)}) "
+            params.extend(tables)
+        params.append(limit)
+
+        connection = self.db_manager.connection
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                f"UPDATE {self.TABLE} SET intentos = intentos + 1, "
+                f"proximo_intento = datetime('now', '+{int(self.lease)} seconds'), ultima_revision = CURRENT_TIMESTAMP "
+                f"WHERE rowid IN ("
+                f"  SELECT rowid FROM {self.TABLE} INDEXED BY idx_{self.TABLE}_vencidos "
+                f"  WHERE status = 0 AND proximo_intento <= datetime('now') {table_filter}"
+                f"  ORDER BY proximo_intento LIMIT ?) "
+                f"RETURNING rowid, tabla, id_local, referencia, intentos",
+                params
+            )
+            claimed = cursor.fetchall()
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+        grouped = {}
+        for rowid, tabla, id_local, referencia, intentos in claimed:
+            grouped.setdefault(tabla, []).append((rowid, id_local, referencia, intentos))
+        return grouped
+
+    def complete(self, rows):
+        """Close claimed retries that succeeded; joins the caller's transaction"""
+        cursor = self.db_manager.connection.cursor()
+        cursor.executemany(
+            f"UPDATE {self.TABLE} SET status = 1, ultima_revision = CURRENT_TIMESTAMP WHERE rowid = ?",
+            [(row[0],) for row in rows]
+        )
+
+    def fail(self, rows, error=None):
+        """Reschedule claimed retries that failed again, or give up after max_attempts; joins the caller's transaction"""
+        retry = []
+        give_up = []
+        for rowid, id_local, referencia, intentos in rows:
+            if intentos >= self.max_attempts:
+                give_up.append((error, rowid))
+            else:
+                retry.append((f"+{self.backoff(intentos):.0f} seconds", error, rowid))
+
+        cursor = self.db_manager.connection.cursor()
+        if retry:
+            cursor.executemany(
+                f"UPDATE {self.TABLE} SET proximo_intento = datetime('now', ?), "
+                f"ultimo_error = COALESCE(?, ultimo_error), ultima_revision = CURRENT_TIMESTAMP WHERE rowid = ?",
+                retry
+            )
+        if give_up:
+            cursor.executemany(
+                f"UPDATE {self.TABLE} SET status = 2, "
+                f"ultimo_error = COALESCE(?, ultimo_error), ultima_revision = CURRENT_TIMESTAMP WHERE rowid = ?",
+                give_up
+            )
+            logger.warning(f"Gave up on {len(give_up)} retries after {self.max_attempts} attempts")
+        return len(retry), len(give_up)
+
+    def due_count(self):
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {self.TABLE} INDEXED BY idx_{self.TABLE}_vencidos "
+            f"WHERE status = 0 AND proximo_intento <= datetime('now')"
+        )
+        return cursor.fetchone()[0]
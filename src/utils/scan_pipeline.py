@@ -0,0 +1,176 @@
+import logging
+import queue
+import threading
+import time
+
+from .change_detector import ChangeDetector
+
+logger = logging.getLogger(__name__)
+
+# End of stream marker passed down the queues
+_DONE = object()
+
+
+class _StageError:
+    """Exception raised in a stage, forwarded downstream to the writer"""
+
+    __slots__ = ('stage', 'error')
+
+    def __init__(self, stage, error) -> None:
+        self.stage = stage
+        self.error = error
+
+
+class ScanPipeline:
+    """
+    Scans one DBF in three stages connected by bounded queues:
+
+        reader  (thread) - copies raw records out of the DBF in batches (or only hands
+                           out record ranges when the hasher is vectorized)
+        hasher  (thread) - computes the tracking rows (id, hash_comparador, ...)
+        writer  (caller) - loads the batches into the TEMP scan table and commits,
+                           then classifies and applies the scan (the only SQLite writer)
+
+    Batches are flushed by the reader when they reach batch_size records or are
+    flush_interval seconds old. A full queue blocks the stage before it, so memory
+    stays bounded by about (2 * queue_depth + 3) batches while reading, hashing and
+    SQLite commits overlap.
+    """
+
+    def __init__(self, db_manager, batch_size=5000, queue_depth=4, flush_interval=0.5) -> None:
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+        self.flush_interval = flush_interval
+        self._stop = threading.Event()
+
+    def _put(self, target, item):
+        """Blocking put that gives up once the pipeline is stopped; False if it gave up"""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source):
+        while True:
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _DONE
+
+    def _read_stage(self, reader, start, table_name, raw_queue):
+        try:
+            with self.db_manager.metrics.timer('read', table_name) as phase:
+                batch = []
+                batch_started = time.monotonic()
+                for recno, deleted, record in reader.raw_records(start):
+                    # Copied out of the mmap, the batch outlives this iteration
+                    batch.append((recno, deleted, bytes(record)))
+                    if len(batch) >= self.batch_size or (
+                            len(batch) % 256 == 0 and time.monotonic() - batch_started >= self.flush_interval):
+                        phase.add(rows=len(batch))
+                        if not self._put(raw_queue, batch):
+                            return
+                        batch = []
+                        batch_started = time.monotonic()
+                if batch:
+                    phase.add(rows=len(batch))
+                    if not self._put(raw_queue, batch):
+                        return
+            self._put(raw_queue, _DONE)
+
+        except Exception as e:
+            self._put(raw_queue, _StageError('read', e))
+
+    def _range_stage(self, vectorized, start, raw_queue):
+        # Vectorized hashing reads whole chunks straight from the memory map,
+        # the read stage only hands out record ranges
+        try:
+            for record_range in vectorized.ranges(start):
+                if not self._put(raw_queue, record_range):
+                    return
+            self._put(raw_queue, _DONE)
+
+        except Exception as e:
+            self._put(raw_queue, _StageError('read', e))
+
+    def _hash_stage(self, hasher, table_name, raw_queue, row_queue):
+        try:
+            with self.db_manager.metrics.timer('hash', table_name) as phase:
+                while True:
+                    batch = self._get(raw_queue)
+                    if batch is _DONE or isinstance(batch, _StageError):
+                        self._put(row_queue, batch)
+                        return
+                    if isinstance(batch, tuple):
+                        rows = hasher.vectorized.chunk_rows(*batch)
+                    else:
+                        rows = [hasher.row(recno, deleted, record) for recno, deleted, record in batch]
+                    phase.add(rows=len(rows))
+                    if not self._put(row_queue, rows):
+                        return
+
+        except Exception as e:
+            self._put(row_queue, _StageError('hash', e))
+
+    def run(self, table_spec, reader, hasher, batch_version, start=1, dry_run=False, partial=False,
+            before_commit=None, chunk_size=50000):
+        """
+        Scan records start.. of an opened reader and apply the changes, see ChangeDetector.finish_scan.
+        Returns {'scanned', 'new', 'changed', 'unchanged', 'deleted'}
+        """
+        table_name = table_spec.name
+        connection = self.db_manager.connection
+        detector = ChangeDetector(self.db_manager, chunk_size=chunk_size)
+
+        raw_queue = queue.Queue(maxsize=self.queue_depth)
+        row_queue = queue.Queue(maxsize=self.queue_depth)
+        self._stop.clear()
+
+        if hasher.vectorized:
+            read_stage = threading.Thread(target=self._range_stage, args=(hasher.vectorized, start, raw_queue),
+                                          name=f"scan-read-{table_name}", daemon=True)
+        else:
+            read_stage = threading.Thread(target=self._read_stage, args=(reader, start, table_name, raw_queue),
+                                          name=f"scan-read-{table_name}", daemon=True)
+        stages = [
+            read_stage,
+            threading.Thread(target=self._hash_stage, args=(hasher, table_name, raw_queue, row_queue),
+                             name=f"scan-hash-{table_name}", daemon=True)
+        ]
+
+        scanned = 0
+        try:
+            detector.create_scan_table(table_spec)
+            for stage in stages:
+                stage.start()
+
+            while True:
+                rows = self._get(row_queue)
+                if rows is _DONE:
+                    break
+                if isinstance(rows, _StageError):
+                    raise RuntimeError(f"{rows.stage} stage failed: {rows.error}") from rows.error
+                scanned += detector.load_rows(table_spec, rows)
+                # Only TEMP pages are dirty, the reader keeps going while this commits
+                connection.commit()
+
+        except Exception:
+            if connection.in_transaction:
+                connection.rollback()
+            raise
+
+        finally:
+            # Unblocks the stages when the writer stopped early
+            self._stop.set()
+            for stage in stages:
+                if stage.is_alive():
+                    stage.join()
+
+        logger.debug(f"Pipeline loaded {scanned} rows of {table_name}")
+        return detector.finish_scan(table_spec, batch_version, scanned, dry_run=dry_run,
+                                    partial=partial, before_commit=before_commit)
@@ -0,0 +1,298 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaSyncManager:
+    """
+    Diff-based schema synchronization.
+
+    Reads the current schema of the database once (sqlite_master joined with
+    pragma_table_info), compares it with the table specs and applies only the
+    statements that are needed, all inside a single transaction:
+
+        create  - table does not exist yet (initial values are seeded too)
+        alter   - only new columns that can be added with ALTER TABLE ADD COLUMN
+        index   - columns match, only declared indexes are missing or differ
+        rebuild - columns removed, or type / not null / default / pk changed;
+                  the table is copied into a new one so tracking rows are kept
+        move    - table exists in another database file than its shard layout says;
+                  it is copied into its shard and dropped from the old file
+        none    - table already matches its spec
+
+    With a shard layout every attached database file is read and the statements
+    name the schema of each table.
+    """
+
+    def __init__(self, db_manager) -> None:
+        self.db_manager = db_manager
+        # table_name -> schema it currently lives in, filled by read_schema
+        self.locations = {}
+
+    def _schemas(self):
+        return self.db_manager.shards.schemas()
+
+    def _qualified(self, schema, name):
+        return name if schema == 'main' else f"{schema}.{name}"
+
+    def read_schema(self):
+        """
+        Reads the existing tables and their columns, one query per database file.
+        Returns {table_name: [{'name', 'type', 'notnull', 'dflt_value', 'pk'}, ...]}
+        """
+        cursor = self.db_manager.connection.cursor()
+        existing = {}
+        self.locations = {}
+        for schema in self._schemas():
+            cursor.execute(
+                f"SELECT m.name AS table_name, p.name, p.type, p.\"notnull\", p.dflt_value, p.pk "
+                f"FROM {schema}.sqlite_master AS m JOIN pragma_table_info(m.name, '{schema}') AS p "
+                f"WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%' "
+                f"ORDER BY m.name, p.cid"
+            )
+            for row in cursor.fetchall():
+                if self.locations.setdefault(row[0], schema) != schema:
+                    # Same name in two files: the first one is what unqualified queries see
+                    continue
+                existing.setdefault(row[0], []).append({
+                    'name': row[1],
+                    'type': (row[2] or '').upper(),
+                    'notnull': bool(row[3]),
+                    'dflt_value': row[4],
+                    'pk': row[5]
+                })
+        return existing
+
+    def read_indexes(self):
+        """
+        Reads the explicitly created indexes (autoindexes have no sql) of every database file.
+        Returns {table_name: {index_name: sql}}
+        """
+        cursor = self.db_manager.connection.cursor()
+        indexes = {}
+        for schema in self._schemas():
+            cursor.execute(f"SELECT tbl_name, name, sql FROM {schema}.sqlite_master "
+                           f"WHERE type = 'index' AND sql IS NOT NULL")
+            for table_name, index_name, sql in cursor.fetchall():
+                if self.locations.get(table_name, schema) == schema:
+                    indexes.setdefault(table_name, {})[index_name] = sql
+        return indexes
+
+    def plan(self, specs):
+        """
+        Computes the sync plan for the given specs against the current database schema.
+        Returns a list of {'table', 'action', 'reason', 'statements', 'spec'}
+        """
+        existing = self.read_schema()
+        existing_indexes = self.read_indexes()
+
+        plan = []
+        for spec in specs:
+            if not spec:
+                continue
+
+            table_name = spec['name']
+            current_columns = existing.get(table_name)
+
+            if current_columns is None:
+                plan.append({
+                    'table': table_name,
+                    'action': 'create',
+                    'reason': 'table does not exist',
+                    'statements': [self.db_manager._build_create_table_sql(spec, if_not_exists=False)]
+                                  + self.db_manager._build_index_sqls(spec, if_not_exists=False),
+                    'spec': spec
+                })
+                continue
+
+            current_schema = self.locations.get(table_name, 'main')
+            target_schema = self.db_manager.shards.schema(table_name)
+            if current_schema != target_schema:
+                current_by_name = {col['name']: col for col in current_columns}
+                plan.append({
+                    'table': table_name,
+                    'action': 'move',
+                    'reason': f"from {current_schema} to {target_schema}",
+                    'statements': self._rebuild_statements(spec, current_by_name, current_schema, target_schema)
+                                  + self.db_manager._build_index_sqls(spec, if_not_exists=False),
+                    'spec': spec
+                })
+                continue
+
+            entry = self._plan_existing_table(spec, current_columns)
+            if entry['action'] == 'rebuild':
+                # Dropping the old table dropped its indexes too
+                entry['statements'] += self.db_manager._build_index_sqls(spec, if_not_exists=False)
+            else:
+                self._plan_indexes(entry, existing_indexes.get(table_name, {}))
+            plan.append(entry)
+
+        return plan
+
+    def _plan_indexes(self, entry, current_indexes):
+        """Adds the statements that bring the spec's indexes in line to a plan entry"""
+        spec = entry['spec']
+        table_name = spec['name']
+        managed_prefix = f"idx_{table_name}_"
+        schema = self.db_manager.shards.schema(table_name)
+
+        # sqlite_master keeps the statement without the schema, compare in that form
+        wanted = {
+            self.db_manager._index_name(table_name, index): (
+                self.db_manager._build_index_sql(table_name, index, if_not_exists=False),
+                self.db_manager._build_index_sql(table_name, index, if_not_exists=False, schema=schema)
+            )
+            for index in spec.get('indexes', [])
+        }
+
+        statements = []
+        created, dropped = [], []
+        for index_name, sql in current_indexes.items():
+            # Only indexes following our naming are managed, anything else is left alone
+            if index_name.startswith(managed_prefix) and wanted.get(index_name, (None,))[0] != sql:
+                statements.append(f"DROP INDEX {self._qualified(schema, index_name)}")
+                dropped.append(index_name)
+        for index_name, (sql, create_sql) in wanted.items():
+            if current_indexes.get(index_name) != sql:
+                statements.append(create_sql)
+                created.append(index_name)
+
+        if not statements:
+            return
+
+        reasons = []
+        if dropped:
+            reasons.append(f"drop indexes {dropped}")
+        if created:
+            reasons.append(f"create indexes {created}")
+
+        entry['statements'] = entry['statements'] + statements
+        if entry['action'] == 'none':
+            entry['action'] = 'index'
+            entry['reason'] = ', '.join(reasons)
+        else:
+            entry['reason'] += ', ' + ', '.join(reasons)
+
+    def _plan_existing_table(self, spec, current_columns):
+        """Compares an existing table with its spec and returns its plan entry"""
+        table_name = spec['name']
+        schema = self.db_manager.shards.schema(table_name)
+        spec_columns = spec['table_columns']
+
+        current_by_name = {col['name']: col for col in current_columns}
+        spec_names = {col.get('name') for col in spec_columns}
+
+        removed = [col['name'] for col in current_columns if col['name'] not in spec_names]
+        added = [col for col in spec_columns if col.get('name') not in current_by_name]
+        changed = [
+            col.get('name') for col in spec_columns
+            if col.get('name') in current_by_name and not self._column_matches(col, current_by_name[col.get('name')])
+        ]
+
+        spec_pk = [col.get('name') for col in spec_columns if col.get('pk', False)]
+        current_pk = [col['name'] for col in sorted(current_columns, key=lambda c: c['pk']) if col['pk']]
+        pk_changed = spec_pk != current_pk
+
+        entry = {'table': table_name, 'spec': spec}
+
+        if not removed and not added and not changed and not pk_changed:
+            entry.update({'action': 'none', 'reason': 'up to date', 'statements': []})
+            return entry
+
+        if removed or changed or pk_changed or not all(self._can_add_column(col) for col in added):
+            reasons = []
+            if removed:
+                reasons.append(f"removed columns {removed}")
+            if changed:
+                reasons.append(f"changed columns {changed}")
+            if pk_changed:
+                reasons.append(f"primary key {current_pk} -> {spec_pk}")
+            if added:
+                reasons.append(f"added columns {[col.get('name') for col in added]}")
+
+            entry.update({
+                'action': 'rebuild',
+                'reason': ', '.join(reasons),
+                'statements': self._rebuild_statements(spec, current_by_name, schema, schema)
+            })
+            return entry
+
+        entry.update({
+            'action': 'alter',
+            'reason': f"added columns {[col.get('name') for col in added]}",
+            'statements': [
+                f"ALTER TABLE {self._qualified(schema, table_name)} ADD COLUMN "
+                f"{self.db_manager._build_column_definition(col)}"
+                for col in added
+            ]
+        })
+        return entry
+
+    def _column_matches(self, spec_column, current_column):
+        """Checks type, not null and default of an existing column against its spec"""
+        spec_type = self.db_manager._map_column_type(spec_column.get('type', 'TEXT'))
+        if spec_type != current_column['type']:
+            return False
+
+        if bool(spec_column.get('not_null', False)) != current_column['notnull']:
+            return False
+
+        return self.db_manager._column_default_sql(spec_column) == current_column['dflt_value']
+
+    def _can_add_column(self, column):
+        """
+        ALTER TABLE ADD COLUMN cannot add primary keys, NOT NULL columns without
+        a default, or columns with a non-constant default such as CURRENT_TIMESTAMP
+        """
+        if column.get('pk', False):
+            return False
+        if column.get('not_null', False) and 'default' not in column:
+            return False
+        return column.get('default') != "CURRENT_TIMESTAMP"
+
+    def _rebuild_statements(self, spec, current_by_name, source_schema='main', target_schema='main'):
+        """
+        Statements that copy a table into a new one with the spec's layout,
+        keeping the values of the columns both layouts have in common; the new
+        table is created in target_schema (a move when it differs from source_schema)
+        """
+        table_name = spec['name']
+        source_table = self._qualified(source_schema, table_name)
+        new_table_name = self._qualified(target_schema, f"{table_name}__sync_new")
+
+        common = [col.get('name') for col in spec['table_columns'] if col.get('name') in current_by_name]
+        column_list = ', '.join(common)
+
+        return [
+            f"DROP TABLE IF EXISTS {new_table_name}",
+            self.db_manager._build_create_table_sql(spec, table_name=new_table_name, if_not_exists=False),
+            f"INSERT INTO {new_table_name} ({column_list}) SELECT {column_list} FROM {source_table}",
+            f"DROP TABLE {source_table}",
+            f"ALTER TABLE {new_table_name} RENAME TO {table_name}"
+        ]
+
+    def apply(self, plan):
+        """Applies every statement of the plan in one transaction, rolling back on any error"""
+        connection = self.db_manager.connection
+        cursor = connection.cursor()
+
+        try:
+            if not connection.in_transaction:
+                cursor.execute("BEGIN")
+            for entry in plan:
+                with self.db_manager.metrics.timer('ddl', entry['table']) as phase:
+                    for sql in entry['statements']:
+                        cursor.execute(sql)
+                    phase.add(statements=len(entry['statements']))
+
+                # Newly created tables get their initial values inside the same transaction
+                if entry['action'] == 'create' and entry['spec'].get('values'):
+                    self.db_manager._insert_initial_values(entry['spec'], commit=False)
+
+            connection.commit()
+            return True
+
+        except Exception as e:
+            connection.rollback()
+            logger.error(f"Error applying schema sync, rolled back: {e}")
+            return False
@@ -0,0 +1,69 @@
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+MAIN_SCHEMA = "main"
+_SCHEMA_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class ShardLayout:
+    """
+    Which data tables live in a database file of their own.
+
+    Each group of the shards section of setup.json is one file next to the main
+    database, <db.name>_<group>.db, attached to the coordinator connection under
+    the group name. Unqualified table names resolve across attached files, so
+    queries keep working unchanged; only DDL has to name the schema. Tables not
+    listed in any group (and every helper table) stay in the main file.
+
+        "shards": {"enabled": true, "groups": {"ventas": ["VENTA", "PARTVTA"], "cortes": ["XCORTE"]}}
+
+    SQLite allows one writer per file, so tables in different groups can be
+    written by separate connections at the same time (see DatabaseManager.open_writer).
+    """
+
+    def __init__(self, db_path=None, groups=None) -> None:
+        self.db_path = db_path
+        self.groups = {}
+        self._schema_by_table = {}
+
+        for group, tables in (groups or {}).items():
+            if not _SCHEMA_NAME.match(group) or group.lower() in (MAIN_SCHEMA, 'temp'):
+                raise ValueError(f"Invalid shard group name '{group}'")
+            self.groups[group] = list(tables)
+            for table_name in tables:
+                if table_name in self._schema_by_table:
+                    raise ValueError(f"Table {table_name} is in shard groups "
+                                     f"'{self._schema_by_table[table_name]}' and '{group}'")
+                self._schema_by_table[table_name] = group
+
+    @classmethod
+    def from_params(cls, db_path, shard_params):
+        """Layout from the shards section of setup.json; empty (everything in main) when disabled"""
+        if not shard_params.get('enabled', False):
+            return cls(db_path)
+        return cls(db_path, shard_params.get('groups', {}))
+
+    def __bool__(self):
+        return bool(self.groups)
+
+    def schema(self, table_name):
+        """Schema (attached database name) a table lives in"""
+        return self._schema_by_table.get(table_name, MAIN_SCHEMA)
+
+    def qualified(self, table_name):
+        """schema.table for sharded tables, the bare name for tables in main"""
+        schema = self.schema(table_name)
+        return table_name if schema == MAIN_SCHEMA else f"{schema}.{table_name}"
+
+    def path(self, schema):
+        """Database file of a schema"""
+        if schema == MAIN_SCHEMA:
+            return self.db_path
+        base, extension = os.path.splitext(self.db_path)
+        return f"{base}_{schema}{extension or '.db'}"
+
+    def schemas(self):
+        return [MAIN_SCHEMA] + list(self.groups)
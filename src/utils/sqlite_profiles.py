@@ -0,0 +1,52 @@
+"""
+Named SQLite performance profiles that can be selected from the db section of setup.json:
+
+    "db": {"name": "...", "path": "...", "profile": "safe-online"}
+
+or tuned on top of a preset:
+
+    "db": {"name": "...", "path": "...", "profile": {"preset": "bulk-load", "cache_size": -524288}}
+"""
+
+PROFILE_PRESETS = {
+    # Concurrent use while the uploader reads: WAL lets readers run alongside the writer,
+    # synchronous=NORMAL is durable across application crashes with WAL
+    "safe-online": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,        # 64 MB (negative values are KiB)
+        "mmap_size": 268435456,      # 256 MB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "page_size": 4096,
+        "auto_vacuum": "INCREMENTAL"  # pages freed by the prune action are released with incremental_vacuum
+    },
+    # Initial loads of historical DBFs: no fsync per commit, bigger cache and mmap.
+    # A power loss can lose the last transactions, rerun the load in that case
+    "bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -262144,       # 256 MB
+        "mmap_size": 1073741824,     # 1 GB
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+        "page_size": 8192,
+        "auto_vacuum": "INCREMENTAL"
+    }
+}
+
+# Allowed values for the text pragmas, the rest are integers
+PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+    "auto_vacuum": {"NONE", "FULL", "INCREMENTAL"}
+}
+INTEGER_PRAGMAS = ("cache_size", "mmap_size", "busy_timeout", "page_size")
+
+# Pragmas that belong to a database file rather than the connection, applied to every attached shard too
+DATABASE_PRAGMAS = ("page_size", "auto_vacuum", "journal_mode", "synchronous", "cache_size", "mmap_size")
+
+# Order in which pragmas are applied: page_size and auto_vacuum must precede the switch to WAL
+PRAGMA_ORDER = ("busy_timeout", "page_size", "auto_vacuum", "journal_mode", "synchronous", "cache_size", "mmap_size",
+                "temp_store")
@@ -0,0 +1,196 @@
+import logging
+
+from .batch_lifecycle import STATUS_KEYS
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_EVENTS = ('insert', 'update', 'delete')
+
+
+class StatusCounterManager:
+    """
+    Keeps the conteo_status helper table in step with the data tables: one row per
+    (tabla, batch_version, status) with its row count and how many of those rows are
+    flagged eliminado. AFTER INSERT / UPDATE / DELETE triggers on each data table
+    adjust the counters inside the statement that changed the rows, so monitoring
+    reads a handful of rows instead of grouping the tracking tables.
+
+    Triggers are dropped with their table (delete action, schema sync rebuilds);
+    install() puts them back and rebuild() recounts a table from scratch to repair drift.
+    A trigger can only write to its own database file, so with a shard layout every
+    shard holds the counters of its tables and read() combines them.
+    """
+
+    TABLE = "conteo_status"
+
+    def __init__(self, db_manager) -> None:
+        self.db_manager = db_manager
+
+    @staticmethod
+    def supports(table_spec):
+        """Only data tables with a status column are counted"""
+        return not table_spec.is_helper and 'status' in table_spec.column_set
+
+    def trigger_name(self, table_spec, event):
+        return f"trg_{table_spec.name}_{self.TABLE}_{event}"
+
+    def _schema(self, table_name):
+        return self.db_manager.shards.schema(table_name)
+
+    def trigger_sqls(self, table_spec):
+        schema = self._schema(table_spec.name)
+        return table_spec.statement(('status_counter_triggers', schema),
+                                    lambda spec: self._build_trigger_sqls(spec, schema))
+
+    def _build_trigger_sqls(self, table_spec, schema):
+        table_name = table_spec.name
+        counters = self.TABLE
+        has_eliminado = 'eliminado' in table_spec.column_set
+
+        def flagged(row):
+            return f"({row}.eliminado <> 0)" if has_eliminado else "0"
+
+        def add(row):
+            return (
+                f"INSERT INTO {counters} (tabla, batch_version, status, registros, eliminados) "
+                f"VALUES ('{table_name}', {row}.batch_version, {row}.status, 1, {flagged(row)}) "
+                f"ON CONFLICT (tabla, batch_version, status) DO UPDATE SET "
+                f"registros = registros + 1, eliminados = eliminados + excluded.eliminados;"
+            )
+
+        def remove(row):
+            return (
+                f"UPDATE {counters} SET registros = registros - 1, eliminados = eliminados - {flagged(row)} "
+                f"WHERE tabla = '{table_name}' AND batch_version = {row}.batch_version AND status = {row}.status;"
+            )
+
+        # Updates that leave the counted columns alone (hash, psql_id, ...) do not fire
+        watched = ['batch_version', 'status'] + (['eliminado'] if has_eliminado else [])
+        changed = ' OR '.join(f"OLD.{column} IS NOT NEW.{column}" for column in watched)
+
+        # Trigger bodies resolve table names in the trigger's own database file
+        return (
+            f"CREATE TRIGGER IF NOT EXISTS {schema}.{self.trigger_name(table_spec, 'insert')} "
+            f"AFTER INSERT ON {table_name} BEGIN {add('NEW')} END",
+            f"CREATE TRIGGER IF NOT EXISTS {schema}.{self.trigger_name(table_spec, 'update')} "
+            f"AFTER UPDATE OF {', '.join(watched)} ON {table_name} WHEN {changed} "
+            f"BEGIN {remove('OLD')} {add('NEW')} END",
+            f"CREATE TRIGGER IF NOT EXISTS {schema}.{self.trigger_name(table_spec, 'delete')} "
+            f"AFTER DELETE ON {table_name} BEGIN {remove('OLD')} END",
+        )
+
+    def _counter_spec(self):
+        specs = self.db_manager.spec_manager.get_spec([self.TABLE])
+        if not specs or not specs[0]:
+            raise ValueError(f"No specification found for helper table {self.TABLE}")
+        return specs[0]
+
+    def _schemas_with_counters(self):
+        cursor = self.db_manager.connection.cursor()
+        schemas = []
+        for schema in self.db_manager.shards.schemas():
+            cursor.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (self.TABLE,))
+            if cursor.fetchone():
+                schemas.append(schema)
+        return schemas
+
+    def missing_triggers(self, table_spec):
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(f"SELECT name FROM {self._schema(table_spec.name)}.sqlite_master "
+                       f"WHERE type = 'trigger' AND tbl_name = ?", (table_spec.name,))
+        existing = {row[0] for row in cursor.fetchall()}
+        return [event for event in TRIGGER_EVENTS if self.trigger_name(table_spec, event) not in existing]
+
+    def install(self, table_spec):
+        """
+        Create the counters table and the triggers of a data table if missing, and recount
+        the table when its triggers were not in place. Joins the caller's transaction.
+        Returns True if triggers were created
+        """
+        if not self.supports(table_spec):
+            return False
+        missing = self.missing_triggers(table_spec)
+        if not missing:
+            return False
+
+        cursor = self.db_manager.connection.cursor()
+        schema = self._schema(table_spec.name)
+        counter_spec = self._counter_spec()
+        cursor.execute(self.db_manager._build_create_table_sql(counter_spec, table_name=f"{schema}.{self.TABLE}"))
+        # A partial set would double count, start it over
+        for event in TRIGGER_EVENTS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {schema}.{self.trigger_name(table_spec, event)}")
+        for sql in self.trigger_sqls(table_spec):
+            cursor.execute(sql)
+        self._recount(table_spec)
+        logger.info(f"Status counter triggers installed on {table_spec.name}")
+        return True
+
+    def _recount(self, table_spec):
+        cursor = self.db_manager.connection.cursor()
+        counters = f"{self._schema(table_spec.name)}.{self.TABLE}"
+        eliminados = "SUM(eliminado <> 0)" if 'eliminado' in table_spec.column_set else "0"
+        # Also clears counters left in another file by a table moved between shards
+        self.forget(table_spec.name)
+        cursor.execute(
+            f"INSERT INTO {counters} (tabla, batch_version, status, registros, eliminados) "
+            f"SELECT ?, batch_version, status, COUNT(*), {eliminados} FROM {table_spec.name} "
+            f"GROUP BY batch_version, status",
+            (table_spec.name,)
+        )
+
+    def rebuild(self, table_spec):
+        """Reinstall the triggers of a data table and recount it from scratch, in one transaction"""
+        connection = self.db_manager.connection
+        try:
+            with self.db_manager.metrics.timer('counters', table_spec.name) as phase:
+                if not connection.in_transaction:
+                    connection.execute("BEGIN")
+                if not self.install(table_spec):
+                    self._recount(table_spec)
+                connection.commit()
+                phase.add(statements=2)
+        except Exception:
+            connection.rollback()
+            raise
+
+    def forget(self, table_name):
+        """Drop the counters of a table that no longer exists; joins the caller's transaction"""
+        cursor = self.db_manager.connection.cursor()
+        for schema in self._schemas_with_counters():
+            cursor.execute(f"DELETE FROM {schema}.{self.TABLE} WHERE tabla = ?", (table_name,))
+
+    def read(self, table_names=None, batch_version=None):
+        """
+        Current counters: {tabla: {batch_version: {'pending', 'uploaded', 'rejected', 'rows', 'deleted'}}}
+        """
+        conditions = ["registros > 0"]
+        params = []
+        if table_names:
+            conditions.append(f"tabla IN ({', '.join('?' for _ in table_names)})")
+            params.extend(table_names)
+        if batch_version is not None:
+            conditions.append("batch_version = ?")
+            params.append(batch_version)
+
+        schemas = self._schemas_with_counters()
+        if not schemas:
+            return {}
+        where = ' AND '.join(conditions)
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(
+            ' UNION ALL '.join(
+                f"SELECT tabla, batch_version, status, registros, eliminados FROM {schema}.{self.TABLE} WHERE {where}"
+                for schema in schemas
+            ),
+            params * len(schemas)
+        )
+        report = {}
+        for tabla, batch, status, registros, eliminados in cursor.fetchall():
+            counts = report.setdefault(tabla, {}).setdefault(
+                batch, {'pending': 0, 'uploaded': 0, 'rejected': 0, 'rows': 0, 'deleted': 0})
+            if status in STATUS_KEYS:
+                counts[STATUS_KEYS[status]] += registros
+            counts['rows'] += registros
+            counts['deleted'] += eliminados
+        return report
@@ -0,0 +1,220 @@
+import datetime
+import os
+import random
+import struct
+
+# Field layouts shaped like the point of sale tables: (name, type, length, decimals)
+TABLE_LAYOUTS = {
+    'VENTA': [
+        ('NO_REFEREN', 'C', 10, 0), ('FECHA', 'D', 8, 0), ('TIENDA', 'C', 4, 0), ('CAJA', 'C', 3, 0),
+        ('CAJERO', 'C', 6, 0), ('CLIENTE', 'C', 10, 0), ('TOTAL', 'N', 12, 2), ('IMPUESTO', 'N', 12, 2),
+        ('DESCUENTO', 'N', 12, 2), ('FORMA_PAGO', 'C', 2, 0), ('NOTA_FOLIO', 'C', 8, 0), ('OBSERVA', 'C', 60, 0),
+        ('ESTADO', 'C', 1, 0)
+    ],
+    'PARTVTA': [
+        ('NO_REFEREN', 'C', 10, 0), ('ARTICULO', 'C', 13, 0), ('DESCRIP', 'C', 40, 0), ('CANTIDAD', 'N', 10, 3),
+        ('PRECIO', 'N', 12, 2), ('DESCUENTO', 'N', 12, 2), ('IMPUESTO', 'N', 12, 2), ('TIENDA', 'C', 4, 0)
+    ],
+    'CANOTA': [
+        ('NOTA_FOLIO', 'C', 8, 0), ('FECHA', 'D', 8, 0), ('CLIENTE', 'C', 10, 0), ('TOTAL', 'N', 12, 2),
+        ('SALDO', 'N', 12, 2), ('TIENDA', 'C', 4, 0), ('OBSERVA', 'C', 40, 0), ('ESTADO', 'C', 1, 0)
+    ],
+    'XCORTE': [
+        ('FECHA', 'D', 8, 0), ('TIENDA', 'C', 4, 0), ('CAJA', 'C', 3, 0), ('VENTAS', 'N', 14, 2),
+        ('EFECTIVO', 'N', 14, 2), ('TARJETA', 'N', 14, 2), ('TICKETS', 'N', 8, 0), ('CAJERO', 'C', 6, 0)
+    ]
+}
+
+# Numeric field that a "change" mutation edits, per table
+MUTABLE_FIELDS = {'VENTA': 'TOTAL', 'PARTVTA': 'CANTIDAD', 'CANOTA': 'SALDO', 'XCORTE': 'EFECTIVO'}
+
+STORES = 100
+FIRST_DAY = datetime.date(2000, 1, 1).toordinal()
+ITEMS = ["REFRESCO 600ML", "PAN BLANCO", "LECHE ENTERA 1L", "DETERGENTE 1KG", "ATUN EN AGUA", "CAFE SOLUBLE"]
+
+
+def _day(index, per_day):
+    return datetime.date.fromordinal(FIRST_DAY + index // per_day).strftime('%Y%m%d')
+
+
+def _venta(rng, index):
+    return [
+        f"R{index + 1}", _day(index, 400), f"T{rng.randrange(STORES)}", str(rng.randint(1, 9)),
+        f"C{rng.randint(1, 500)}", f"CL{rng.randint(1, 99999)}", rng.uniform(1, 99999), rng.uniform(1, 9999),
+        rng.uniform(0, 999), str(rng.randint(1, 5)), f"N{index + 1}",
+        "VENTA DE MOSTRADOR" if rng.random() < 0.7 else "", rng.choice("ACX")
+    ]
+
+
+def _partvta(rng, index):
+    # About three lines per sale
+    return [
+        f"R{index // 3 + 1}", f"750{rng.randint(0, 9999999999):010d}", rng.choice(ITEMS), rng.uniform(1, 20),
+        rng.uniform(1, 999), rng.uniform(0, 50), rng.uniform(0, 160), f"T{rng.randrange(STORES)}"
+    ]
+
+
+def _canota(rng, index):
+    total = rng.uniform(1, 99999)
+    return [
+        f"N{index + 1}", _day(index, 100), f"CL{rng.randint(1, 99999)}", total, total * rng.random(),
+        f"T{rng.randrange(STORES)}", "NOTA DE CREDITO" if rng.random() < 0.5 else "", rng.choice("AC")
+    ]
+
+
+def _xcorte(rng, index):
+    # One cut per store and day, so FECHA + TIENDA is unique
+    sales = rng.uniform(1000, 500000)
+    cash = sales * rng.random()
+    return [
+        _day(index, STORES), f"T{index % STORES}", str(rng.randint(1, 9)), sales, cash, sales - cash,
+        rng.randint(10, 3000), f"C{rng.randint(1, 500)}"
+    ]
+
+
+RECORD_BUILDERS = {'VENTA': _venta, 'PARTVTA': _partvta, 'CANOTA': _canota, 'XCORTE': _xcorte}
+
+
+class DbfWriter:
+    """
+    Streaming dBase III writer: the header is written first with a zero record count
+    and patched on close, so files of any size are written with constant memory.
+
+        with DbfWriter(path, TABLE_LAYOUTS['VENTA']) as writer:
+            writer.write(values, deleted=False)
+    """
+
+    def __init__(self, path, fields, encoding='cp1252', last_update=datetime.date(2024, 1, 1)) -> None:
+        self.path = path
+        self.fields = fields
+        self.encoding = encoding
+        self.last_update = last_update
+        self.count = 0
+        self.record_length = 1 + sum(length for _, _, length, _ in fields)
+        self.header_length = 32 + 32 * len(fields) + 1
+        # One format string for the whole record: text left aligned and cut, numbers right aligned
+        parts = []
+        for _, field_type, length, decimals in fields:
+            if field_type == 'N':
+                parts.append(f"{{:>{length}.{decimals}f}}" if decimals else f"{{:>{length}d}}")
+            else:
+                parts.append(f"{{:<{length}.{length}}}")
+        self._format = ''.join(parts)
+        self._file = None
+        self._pending = []
+
+    def open(self):
+        self._file = open(self.path, 'wb')
+        self._file.write(self._header())
+        return self
+
+    def _header(self):
+        day = self.last_update
+        header = struct.pack('<B3BIHH20x', 0x03, day.year - 1900, day.month, day.day, self.count,
+                             self.header_length, self.record_length)
+        for name, field_type, length, decimals in self.fields:
+            header += name.encode('ascii').ljust(11, b'\x00') + field_type.encode('ascii') + b'\x00' * 4
+            header += bytes([length, decimals]) + b'\x00' * 14
+        return header + b'\r'
+
+    def write(self, values, deleted=False):
+        flag = '*' if deleted else ' '
+        self._pending.append(flag + self._format.format(*values))
+        self.count += 1
+        if len(self._pending) >= 10000:
+            self._flush()
+
+    def _flush(self):
+        data = ''.join(self._pending).encode(self.encoding, errors='replace')
+        if len(data) != len(self._pending) * self.record_length:
+            raise ValueError(f"Record values overflow the field lengths of {self.path}")
+        self._file.write(data)
+        self._pending = []
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            self._flush()
+            self._file.write(b'\x1a')
+            self._file.seek(0)
+            self._file.write(self._header())
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SyntheticDataset:
+    """
+    Reproducible point of sale DBF files that evolve over runs.
+
+    Run 0 is records rows per table. advance() adds a run with mutation rates
+    (fractions of the live records): change edits a numeric field, append adds new
+    records at the end, delete sets the deletion flag and pack removes records from
+    the file (like the day cut does). write() regenerates every table from the seed
+    with all runs applied, so the same seed, size and runs always give the same files.
+
+        dataset = SyntheticDataset('/tmp/dbf', records=100000, seed=1)
+        dataset.write()
+        dataset.advance(change=0.01, append=0.01)
+        dataset.write()
+    """
+
+    def __init__(self, folder, records=10000, seed=1, tables=None, encoding='cp1252') -> None:
+        self.folder = folder
+        self.records = records
+        self.seed = seed
+        self.tables = list(tables or TABLE_LAYOUTS)
+        self.encoding = encoding
+        self.runs = []
+
+    def advance(self, change=0.0, append=0.0, delete=0.0, pack=0.0):
+        if change + delete + pack > 1:
+            raise ValueError("change + delete + pack rates cannot exceed 1")
+        self.runs.append({'change': change, 'append': append, 'delete': delete, 'pack': pack})
+        return len(self.runs)
+
+    def path(self, table_name):
+        return os.path.join(self.folder, f"{table_name}.DBF")
+
+    def write(self, tables=None):
+        """Write the current state of the tables; returns {table_name: records written}"""
+        os.makedirs(self.folder, exist_ok=True)
+        return {table_name: self._write_table(table_name) for table_name in tables or self.tables}
+
+    def _write_table(self, table_name):
+        fields = TABLE_LAYOUTS[table_name]
+        build = RECORD_BUILDERS[table_name]
+        mutable = [name for name, _, _, _ in fields].index(MUTABLE_FIELDS[table_name])
+        # Table specific seeds; each run draws from its own stream, one number per record
+        base_rng = random.Random(f"{self.seed}:{table_name}")
+        run_rngs = [random.Random(f"{self.seed}:{table_name}:{run}") for run in range(1, len(self.runs) + 1)]
+
+        # Records born by the end of each run
+        born = [self.records]
+        for rates in self.runs:
+            born.append(born[-1] + int(self.records * rates['append']))
+
+        with DbfWriter(self.path(table_name), fields, encoding=self.encoding) as writer:
+            for index in range(born[-1]):
+                values = build(base_rng, index)
+                deleted = packed = False
+                for run, (rates, rng) in enumerate(zip(self.runs, run_rngs), start=1):
+                    draw = rng.random()
+                    if index >= born[run - 1] or packed:
+                        continue
+                    if draw < rates['pack']:
+                        packed = True
+                    elif draw < rates['pack'] + rates['delete']:
+                        deleted = True
+                    elif draw < rates['pack'] + rates['delete'] + rates['change'] and not deleted:
+                        values[mutable] += run
+                if not packed:
+                    writer.write(values, deleted=deleted)
+            return writer.count
@@ -1,13 +1,20 @@
+import logging
 import os
 import json
+from .config_store import ConfigStore
+
+logger = logging.getLogger(__name__)
 
 class TableListManager:
     def __init__(self, setup_path, data_tables_path) -> None:
         # Get the directory where this file is located (utils directory)
         utils_dir = os.path.dirname(os.path.abspath(__file__))
         
-        self.setup_path = os.path.join(utils_dir, "setup.json")
-        self.data_tables_path = os.path.join(utils_dir, "data_tables_schemas.json")
+        self.setup_path = setup_path or os.path.join(utils_dir, "setup.json")
+        self.data_tables_path = data_tables_path or os.path.join(utils_dir, "data_tables_schemas.json")
+        
+        # Shared, mtime-invalidated cache of the json config files
+        self.config_store = ConfigStore.instance()
     
     def get_list(self):
         """
@@ -26,8 +33,7 @@ class TableListManager:
         Gets the list of tables for the specified action from setup.json
         """
         try:
-            with open(self.setup_path, 'r') as file:
-                setup_data = json.load(file)
+            setup_data = self.config_store.load(self.setup_path)
             
             # Get the actions section
             actions = setup_data.get('actions', {})
@@ -36,16 +42,15 @@ class TableListManager:
             return actions.get(action, [])
             
         except FileNotFoundError:
-            print(f"Setup json file not found: {self.setup_path}")
+            logger.error(f"Setup json file not found: {self.setup_path}")
             return []
         except json.JSONDecodeError:
-            print(f"Invalid JSON in setup file: {self.setup_path}")
+            logger.error(f"Invalid JSON in setup file: {self.setup_path}")
             return []
 
     def _fetch_action(self):
         try:
-            with open(self.setup_path, 'r') as file:
-                setup_data = json.load(file)
+            setup_data = self.config_store.load(self.setup_path)
             
             # Get the execute action from actions
             actions = setup_data.get('actions', {})
@@ -54,10 +59,10 @@ class TableListManager:
             return execute_action
             
         except FileNotFoundError:
-            print(f"Setup json file not found: {self.setup_path}")
+            logger.error(f"Setup json file not found: {self.setup_path}")
             return None
         except json.JSONDecodeError:
-            print(f"Invalid JSON in setup file: {self.setup_path}")
+            logger.error(f"Invalid JSON in setup file: {self.setup_path}")
             return None
 
     def get_db_params(self):
@@ -65,15 +70,118 @@ class TableListManager:
         Gets the database parameters from setup.json
         """
         try:
-            with open(self.setup_path, 'r') as file:
-                setup_data = json.load(file)
+            setup_data = self.config_store.load(self.setup_path)
             
             # Get the db section
             return setup_data.get('db', {})
             
         except FileNotFoundError:
-            print(f"Setup json file not found: {self.setup_path}")
+            logger.error(f"Setup json file not found: {self.setup_path}")
+            return {}
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON in setup file: {self.setup_path}")
             return {}
+
+    def _fetch_section(self, section):
+        """
+        Gets a top level section (dict) of setup.json, {} if missing
+        """
+        try:
+            setup_data = self.config_store.load(self.setup_path)
+            
+            return setup_data.get(section, {})
+            
+        except FileNotFoundError:
+            logger.error(f"Setup json file not found: {self.setup_path}")
+            return {}
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON in setup file: {self.setup_path}")
+            return {}
+
+    def get_schema_sync_params(self):
+        """
+        Gets the schema sync parameters from setup.json
+        """
+        return self._fetch_section('schema_sync')
+
+    def get_dbf_params(self):
+        """
+        Gets the DBF source parameters (folder, encoding) from setup.json
+        """
+        return self._fetch_section('dbf')
+
+    def get_parallel_params(self):
+        """
+        Gets the parallel scan parameters (workers, batch size) from setup.json
+        """
+        return self._fetch_section('parallel')
+
+    def get_pipeline_params(self):
+        """
+        Gets the single-table scan pipeline parameters (batch size, queue depth, flush interval) from setup.json
+        """
+        return self._fetch_section('pipeline')
+
+    def get_upload_params(self):
+        """
+        Gets the upload parameters (server url, batch size, concurrency, polling) from setup.json
+        """
+        return self._fetch_section('upload')
+
+    def get_retry_params(self):
+        """
+        Gets the retry scheduler parameters (backoff, attempts, claim batch size) from setup.json
+        """
+        return self._fetch_section('retry')
+
+    def get_api_log_params(self):
+        """
+        Gets the api_log parameters (compression, store policy, retention) from setup.json
+        """
+        return self._fetch_section('api_log')
+
+    def get_batch_params(self):
+        """
+        Gets the batch lifecycle parameters (source, keep, delete_batch, compact) from setup.json
+        """
+        return self._fetch_section('batches')
+
+    def get_shard_params(self):
+        """
+        Gets the sharding parameters (enabled, groups) from setup.json
+        """
+        return self._fetch_section('shards')
+
+    def get_watch_params(self):
+        """
+        Gets the watch/daemon parameters (poll interval, debounce, tables per cycle, heartbeat) from setup.json
+        """
+        return self._fetch_section('watch')
+
+    def get_status_counter_params(self):
+        """
+        Gets the status counters parameters (enabled) from setup.json
+        """
+        return self._fetch_section('status_counters')
+
+    def get_logging_params(self):
+        """
+        Gets the logging parameters (level, file, metrics_path) from setup.json
+        """
+        return self._fetch_section('logging')
+
+    def get_batch_version(self):
+        """
+        Gets the current batch_version id from setup.json
+        """
+        try:
+            setup_data = self.config_store.load(self.setup_path)
+            
+            return setup_data.get('batch_version', {}).get('id')
+            
+        except FileNotFoundError:
+            logger.error(f"Setup json file not found: {self.setup_path}")
+            return None
         except json.JSONDecodeError:
-            print(f"Invalid JSON in setup file: {self.setup_path}")
-            return {}
\ No newline at end of file
+            logger.error(f"Invalid JSON in setup file: {self.setup_path}")
+            return None
\ No newline at end of file
@@ -1,57 +1,79 @@
+import logging
 import os
 import json
+from .config_store import ConfigStore
+from .compiled_spec import TableSpec
+from .hash_strategies import DEFAULT_HASH_STRATEGY
+
+logger = logging.getLogger(__name__)
 
 class TableSpecManager:
     def __init__(self, setup_path, data_tables_path) -> None:
         # Get the directory where this file is located (utils directory)
         utils_dir = os.path.dirname(os.path.abspath(__file__))
         
-        self.setup_path = os.path.join(utils_dir, "setup.json")
-        self.data_tables_path = os.path.join(utils_dir, "data_tables_schemas.json")
+        self.setup_path = setup_path or os.path.join(utils_dir, "setup.json")
+        self.data_tables_path = data_tables_path or os.path.join(utils_dir, "data_tables_schemas.json")
         self.helper_tables_path = os.path.join(utils_dir, "helper_tables_schemas.json")
+        
+        # Shared, mtime-invalidated cache of the json config files
+        self.config_store = ConfigStore.instance()
+        
+        # Compiled TableSpec objects by table name, valid while the parsed config objects they came from are current
+        self._compiled = {}
+        self._compiled_sources = None
 
     def get_spec(self, targets):
         """
-            loops array of table names and returns their specs object
+            loops array of table names and returns their compiled TableSpec objects (None for unknown tables)
         """
         # Fetch schemas once for all tables
         data_schemas = self._fetch_data_schemas()
         helper_schemas = self._fetch_helper_schemas()
         
+        # The config store hands out new objects when a file changes, so a reload drops the compiled specs
+        sources = (self._load_setup(), data_schemas, helper_schemas)
+        if self._compiled_sources is None or any(a is not b for a, b in zip(sources, self._compiled_sources)):
+            self._compiled = {}
+            self._compiled_sources = sources
+        
         specs_by_table_name = []
 
         for target in targets:
-            # First try to find in helper tables
-            current = self._fetch_helper_specs(target, helper_schemas)
-            if not current:
-                # If not found in helper tables, try data tables
-                current = self._fetch_specs(target, data_schemas)
-            specs_by_table_name.append(current)
+            if target not in self._compiled:
+                # First try to find in helper tables
+                current = self._fetch_helper_specs(target, helper_schemas)
+                if not current:
+                    # If not found in helper tables, try data tables
+                    current = self._fetch_specs(target, data_schemas)
+                self._compiled[target] = TableSpec(current) if current else None
+            specs_by_table_name.append(self._compiled[target])
         
         return specs_by_table_name
 
+    def _default_hash_strategy(self):
+        setup = self._load_setup() or {}
+        return setup.get('dbf', {}).get('hash_strategy', DEFAULT_HASH_STRATEGY)
+
+    def _load_setup(self):
+        try:
+            return self.config_store.load(self.setup_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
     def _get_setup(self, table_name):
         """
         Reads setup.json and returns the table configuration object matching the given table name
         """
         try:
-            with open(self.setup_path, 'r') as file:
-                setup_data = json.load(file)
-            
-            # Search for the table in the tables array
-            tables = setup_data.get('tables', [])
-            for table in tables:
-                if table.get('name') == table_name:
-                    return table
-            
-            # Return None if table not found
-            return None
+            # O(1) lookup in the cached tables-by-name index, None if table not found
+            return self.config_store.get_table_config(self.setup_path, table_name)
             
         except FileNotFoundError:
-            print(f"Setup json file not found: {self.setup_path}")
+            logger.error(f"Setup json file not found: {self.setup_path}")
             return None
         except json.JSONDecodeError:
-            print(f"Invalid JSON in setup file: {self.setup_path}")
+            logger.error(f"Invalid JSON in setup file: {self.setup_path}")
             return None
     
     def _fetch_data_schemas(self):
@@ -59,47 +81,53 @@ class TableSpecManager:
         Reads data_tables_schemas.json and returns combined schemas (common + specific schema types)
         """
         try:
-            with open(self.data_tables_path, 'r') as file:
-                data_schema = json.load(file)
-            
-            schemas = data_schema.get('schemas', {})
-            common_columns = schemas.get('common', {}).get('columns', [])
-            options = schemas.get('options', [])
-            
-            # Create combined schemas for each option
-            combined_schemas = {}
-            for schema_option in options:
-                if schema_option in schemas:
-                    specific_columns = schemas[schema_option].get('columns', [])
-                    # Combine common columns with specific schema columns
-                    combined_schemas[schema_option] = {
-                        'columns': common_columns + specific_columns
-                    }
-            
-            return combined_schemas
+            # Combined schemas are cached until data_tables_schemas.json changes
+            return self.config_store.derived(self.data_tables_path, 'combined_schemas', self._combine_data_schemas)
             
         except FileNotFoundError:
-            print(f"data tables schema json file not found: {self.data_tables_path}")
+            logger.error(f"data tables schema json file not found: {self.data_tables_path}")
             return None
         except json.JSONDecodeError:
-            print(f"Invalid data tables JSON in setup file: {self.data_tables_path}")
+            logger.error(f"Invalid data tables JSON in setup file: {self.data_tables_path}")
             return None
     
+    def _combine_data_schemas(self, data_schema):
+        """
+        Combines the common columns with the columns of each schema option
+        """
+        schemas = data_schema.get('schemas', {})
+        common_columns = schemas.get('common', {}).get('columns', [])
+        common_indexes = schemas.get('common', {}).get('indexes', [])
+        options = schemas.get('options', [])
+        
+        # Create combined schemas for each option
+        combined_schemas = {}
+        for schema_option in options:
+            if schema_option in schemas:
+                specific_columns = schemas[schema_option].get('columns', [])
+                specific_indexes = schemas[schema_option].get('indexes', [])
+                # Combine common columns with specific schema columns
+                combined_schemas[schema_option] = {
+                    'columns': common_columns + specific_columns,
+                    'indexes': common_indexes + specific_indexes
+                }
+        
+        return combined_schemas
+    
     def _fetch_helper_schemas(self):
         """
         Reads helper_tables_schemas.json and returns the helper table schemas
         """
         try:
-            with open(self.helper_tables_path, 'r') as file:
-                helper_schema = json.load(file)
+            helper_schema = self.config_store.load(self.helper_tables_path)
             
             return helper_schema.get('schemas', {})
             
         except FileNotFoundError:
-            print(f"Helper tables schema json file not found: {self.helper_tables_path}")
+            logger.error(f"Helper tables schema json file not found: {self.helper_tables_path}")
             return {}
         except json.JSONDecodeError:
-            print(f"Invalid helper tables JSON in file: {self.helper_tables_path}")
+            logger.error(f"Invalid helper tables JSON in file: {self.helper_tables_path}")
             return {}
 
 
@@ -110,8 +138,13 @@ class TableSpecManager:
             {
                 name: target_table,
                 schema: schema,
-                table_params: table_params,
-                table_columns: columns
+                id_fields: id_fields,
+                hash_fields: hash_fields,
+                memo_fields: memo fields whose contents count for hash_comparador,
+                reference_field / date_field: optional DBF fields for referencia / fecha_original,
+                hash_strategy: hash of hash_comparador / hash_id (table setting, else the dbf section default),
+                table_columns: columns,
+                indexes: index definitions (name, columns, include, where, unique)
 
             }
         """
@@ -123,7 +156,7 @@ class TableSpecManager:
         # Get the schema type for this table
         schema_type = table_config.get('schema')
         if schema_type not in schemas:
-            print(f"Schema type '{schema_type}' not found in data schemas")
+            logger.warning(f"Schema type '{schema_type}' not found in data schemas")
             return None
         
         # Get the columns for this schema type
@@ -138,12 +171,28 @@ class TableSpecManager:
         if skip_columns:
             all_columns = [col for col in all_columns if col.get('name') not in skip_columns]
         
+        # Indexes of the schema plus the table's own, minus those over skipped columns;
+        # skipped include columns only make an index less covering, so just those are dropped
+        all_indexes = schemas[schema_type].get('indexes', []) + table_config.get('indexes', [])
+        column_names = {col.get('name') for col in all_columns}
+        all_indexes = [
+            dict(index, include=[name for name in index['include'] if name in column_names]) if 'include' in index else index
+            for index in all_indexes
+            if all(name in column_names for name in index.get('columns', []))
+        ]
+        
         # Return the merged specification
         return {
             'name': table_config.get('name'),
             'schema': schema_type,
             'id_fields': table_config.get('id_fields', []),
+            'hash_fields': table_config.get('hash_fields', []),
+            'memo_fields': table_config.get('memo_fields', []),
+            'reference_field': table_config.get('reference_field'),
+            'date_field': table_config.get('date_field'),
+            'hash_strategy': table_config.get('hash_strategy', self._default_hash_strategy()),
             'table_columns': all_columns,
+            'indexes': all_indexes,
             'additional_columns': additional_columns,
             'skip_columns': skip_columns
         }
@@ -169,7 +218,9 @@ class TableSpecManager:
             'name': table_name,
             'schema': 'helper',  # Mark as helper table
             'id_fields': [],
+            'hash_fields': [],
             'table_columns': columns,
+            'indexes': table_def.get('indexes', []),
             'additional_columns': [],
             'skip_columns': [],
             'values': values  # Include values for insertion
@@ -0,0 +1,133 @@
+import logging
+import hashlib
+
+from .dbf_reader import DbfReader
+
+logger = logging.getLogger(__name__)
+
+
+class TailScanManager:
+    """
+    Decides how much of a DBF has to be scanned, using the header info saved in
+    the estado_dbf helper table on the previous cycle:
+
+        skip - file size and mtime are unchanged, nothing to read
+        tail - physical_position table that only grew: scan records after the
+               previous count; a sampled checksum of the earlier records must
+               still match, so in-place edits fall back to a full scan
+        full - everything else (first scan, file shrank or was packed, edits)
+    """
+
+    STATE_TABLE = "estado_dbf"
+
+    def __init__(self, db_manager, sample_size=64) -> None:
+        self.db_manager = db_manager
+        self.sample_size = sample_size
+
+    def get_state(self, table_name, batch_version):
+        """
+        Saved header info of a table, or None if never scanned into batch_version (or the
+        helper table is missing). The state of another batch says nothing about the rows
+        of this one, so the table is scanned fully into the new batch.
+        """
+        cursor = self.db_manager.connection.cursor()
+        try:
+            cursor.execute(
+                f"SELECT registros, ultima_actualizacion, tamano, mtime_ns, muestra, batch_version "
+                f"FROM {self.STATE_TABLE} WHERE tabla = ?",
+                (table_name,)
+            )
+        except Exception as e:
+            logger.warning(f"Could not read {self.STATE_TABLE}, scanning {table_name} fully: {e}")
+            return None
+
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        if row[5] != batch_version:
+            logger.info(f"Last scan of {table_name} went into batch {row[5]}, scanning fully into {batch_version}")
+            return None
+        return {
+            'registros': row[0],
+            'ultima_actualizacion': row[1],
+            'tamano': row[2],
+            'mtime_ns': row[3],
+            'muestra': row[4]
+        }
+
+    def is_unchanged(self, state, dbf_path):
+        """
+        True when the file has the same size and mtime as in the saved state and its header
+        still holds the saved record count and last update date (bytes 1-7; no need to map
+        it). The header catches in-place edits made with the mtime restored or not yet moved.
+        """
+        if not state:
+            return False
+        record_count, last_update, size, mtime_ns = DbfReader.peek_header(dbf_path)
+        return (
+            size == state['tamano'] and mtime_ns == state['mtime_ns']
+            and record_count == state['registros']
+            and (last_update.isoformat() if last_update else None) == state['ultima_actualizacion']
+        )
+
+    def plan(self, reader, state, schema):
+        """Returns (mode, start_recno, reason) for an opened reader"""
+        if not state:
+            return 'full', 1, 'no previous scan'
+
+        if schema != 'physical_position':
+            return 'full', 1, f"{schema} tables are always scanned fully"
+
+        previous_count = state['registros']
+        if reader.record_count < previous_count:
+            return 'full', 1, f"record count went down {previous_count} -> {reader.record_count}"
+
+        if self.sample_checksum(reader, previous_count) != state['muestra']:
+            return 'full', 1, 'sampled records changed in place'
+
+        return 'tail', previous_count + 1, f"{reader.record_count - previous_count} appended records"
+
+    def sample_positions(self, count):
+        """Evenly spread record numbers in 1..count, always including the first and the last"""
+        if count <= 0:
+            return []
+        samples = min(self.sample_size, count)
+        if samples == 1:
+            return [count]
+        return sorted({1 + (i * (count - 1)) // (samples - 1) for i in range(samples)})
+
+    def sample_checksum(self, reader, count):
+        """Checksum of the sampled records (deletion flag included) among the first count records"""
+        digest = hashlib.blake2b(digest_size=16)
+        buffer = reader._buffer
+        record_length = reader.record_length
+        for recno in self.sample_positions(count):
+            offset = reader.record_offset(recno)
+            digest.update(recno.to_bytes(4, 'little'))
+            digest.update(buffer[offset:offset + record_length])
+        return digest.hexdigest()
+
+    def header_info(self, reader):
+        """Header info of an opened reader, as saved in the state table"""
+        return {
+            'registros': reader.record_count,
+            'ultima_actualizacion': reader.last_update.isoformat() if reader.last_update else None,
+            'tamano': reader.file_size,
+            'mtime_ns': reader.file_mtime_ns,
+            'muestra': self.sample_checksum(reader, reader.record_count)
+        }
+
+    def save_state(self, table_name, info, batch_version):
+        """Store header info (see header_info) of a scan into batch_version; joins the caller's transaction"""
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(
+            f"INSERT INTO {self.STATE_TABLE} "
+            f"(tabla, registros, ultima_actualizacion, tamano, mtime_ns, muestra, batch_version, revisado) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP) "
+            f"ON CONFLICT (tabla) DO UPDATE SET registros = excluded.registros, "
+            f"ultima_actualizacion = excluded.ultima_actualizacion, tamano = excluded.tamano, "
+            f"mtime_ns = excluded.mtime_ns, muestra = excluded.muestra, "
+            f"batch_version = excluded.batch_version, revisado = excluded.revisado",
+            (table_name, info['registros'], info['ultima_actualizacion'], info['tamano'],
+             info['mtime_ns'], info['muestra'], batch_version)
+        )
@@ -0,0 +1,123 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubUploadServer:
+    """
+    Local stand-in for the upload server, so uploads can be exercised offline.
+
+        POST /lotes          {"tabla", "batch_version", "registros": [{"id", ...}]}
+                             -> 202 {"id_cola": n}
+        GET  /lotes/<id>     -> {"estado": "pendiente"} until the batch is processed, then
+                                {"estado": "completado", "registros": [{"id", "psql_id", "status": "ok" | "error", "error"}]}
+
+    delay: seconds before a queued batch is processed; fail_every: every n-th record
+    comes back as an error; post_error_every: every n-th POST answers 503.
+
+        with StubUploadServer(delay=0.2) as server:
+            manager = UploadManager(db_manager, server.url)
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, fail_every=0, post_error_every=0) -> None:
+        self.delay = delay
+        self.fail_every = fail_every
+        self.post_error_every = post_error_every
+        self.batches = {}
+        self.posts = 0
+        self.records = 0
+        self._lock = threading.Lock()
+        self._next_psql_id = 1
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, document):
+                body = json.dumps(document).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                if self.path.rstrip('/') != '/lotes':
+                    return self._reply(404, {'error': 'not found'})
+                try:
+                    document = json.loads(body)
+                except ValueError:
+                    return self._reply(400, {'error': 'invalid json'})
+                return self._reply(*stub._queue_batch(document))
+
+            def do_GET(self):
+                match = re.fullmatch(r'/lotes/(\d+)', self.path.rstrip('/'))
+                if not match:
+                    return self._reply(404, {'error': 'not found'})
+                return self._reply(*stub._batch_status(int(match.group(1))))
+
+        return Handler
+
+    def _queue_batch(self, document):
+        with self._lock:
+            self.posts += 1
+            if self.post_error_every and self.posts % self.post_error_every == 0:
+                return 503, {'error': 'servicio no disponible'}
+
+            results = []
+            for record in document.get('registros', []):
+                self.records += 1
+                if self.fail_every and self.records % self.fail_every == 0:
+                    results.append({'id': record.get('id'), 'psql_id': None, 'status': 'error',
+                                    'error': 'registro rechazado'})
+                else:
+                    results.append({'id': record.get('id'), 'psql_id': self._next_psql_id, 'status': 'ok'})
+                    self._next_psql_id += 1
+
+            id_cola = len(self.batches) + 1
+            self.batches[id_cola] = {'ready_at': time.monotonic() + self.delay, 'registros': results}
+            return 202, {'id_cola': id_cola}
+
+    def _batch_status(self, id_cola):
+        with self._lock:
+            batch = self.batches.get(id_cola)
+        if batch is None:
+            return 404, {'error': 'lote no encontrado'}
+        if time.monotonic() < batch['ready_at']:
+            return 200, {'id_cola': id_cola, 'estado': 'pendiente'}
+        return 200, {'id_cola': id_cola, 'estado': 'completado', 'registros': batch['registros']}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='upload-stub', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
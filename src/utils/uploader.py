@@ -0,0 +1,350 @@
+import asyncio
+import json
+import logging
+import time
+
+from .http_pool import AsyncHttpPool, HttpError
+from .api_log import ApiLogManager
+
+logger = logging.getLogger(__name__)
+
+# Tracking columns sent for each record, when the table has them
+DOCUMENT_COLUMNS = ('hash_comparador', 'referencia', 'fecha_original', 'eliminado', 'clave_eliminacion')
+
+
+class UploadManager:
+    """
+    Uploads the pending rows (status = 0) of data tables in batches.
+
+    Pending rows are paged through the partial pendientes index, grouped into
+    batches of batch_size and each batch is POSTed as one document; at most
+    concurrency batches are in flight, over a pool of keep-alive connections.
+    The queue id (id_cola) returned by the POST is saved on the batch's rows right
+    away and polled until the server has processed the batch, then psql_id and
+    status of the whole batch and its api_log entry are written in one transaction:
+
+        status 1  record accepted (psql_id set)
+        status 2  record rejected, or its batch could not be posted; a retry is opened
+                  in reintentos when a retry_scheduler is given (see run_retries)
+        status 0  not resolved (polling timed out or failed): the row keeps its id_cola
+                  and the next run polls that queue id again instead of posting it
+
+    Rows in flight (status 0, id_cola <> 0, psql_id = 0) are left out of fetch_pending;
+    each run first resumes them by id_cola. A queue id the server no longer knows (404)
+    is cleared so its rows are posted again.
+
+    Rows whose hash_comparador changed while their batch was in flight stay pending.
+    A batch that fails outside the HTTP exchange (e.g. a database error) is logged and
+    counted in errors without stopping the other batches of its table.
+    document_builder(table_spec, row) can replace the per-record document (a dict
+    with id plus DOCUMENT_COLUMNS). Calls are logged through api_log (an
+    ApiLogManager, uncompressed with everything stored when not given).
+    """
+
+    def __init__(self, db_manager, base_url, batch_size=500, concurrency=4, connections=4, timeout=30,
+                 poll_interval=1.0, poll_timeout=120, document_builder=None, retry_scheduler=None, api_log=None) -> None:
+        self.db_manager = db_manager
+        self.base_url = base_url
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.connections = connections
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.poll_timeout = poll_timeout
+        self.document_builder = document_builder
+        self.retry_scheduler = retry_scheduler
+        self.api_log = api_log or ApiLogManager(db_manager, compress=False)
+
+    def run(self, specs, batch_version):
+        """Upload the pending rows of the given data table specs; returns {table_name: counts or None on error}"""
+        return asyncio.run(self._run(specs, batch_version))
+
+    def run_retries(self, specs, claimed, batch_version):
+        """
+        Send again the records of retries claimed with RetryScheduler.claim_due ({tabla: rows}),
+        one bulk upload per table; returns {table_name: counts or None on error}
+        """
+        specs = [spec for spec in specs if spec.name in claimed]
+        return asyncio.run(self._run(specs, batch_version, claimed))
+
+    async def _run(self, specs, batch_version, claimed=None):
+        pool = AsyncHttpPool(self.base_url, size=self.connections, timeout=self.timeout)
+        results = {}
+        try:
+            for spec in specs:
+                try:
+                    with self.db_manager.metrics.timer('upload', spec.name):
+                        if claimed is None:
+                            results[spec.name] = await self._upload_table(spec, batch_version, pool)
+                        else:
+                            results[spec.name] = await self._retry_table(spec, batch_version, pool, claimed[spec.name])
+                    logger.info(f"Uploaded {spec.name}: {results[spec.name]}")
+                except Exception as e:
+                    logger.error(f"Error uploading table {spec.name}: {e}")
+                    results[spec.name] = None
+        finally:
+            await pool.close()
+        return results
+
+    async def _upload_table(self, spec, batch_version, pool):
+        counts = {'batches': 0, 'resumed': 0, 'uploaded': 0, 'rejected': 0, 'unresolved': 0, 'errors': 0}
+        slots = asyncio.Semaphore(self.concurrency)
+
+        # Batches accepted by an earlier run but never resolved: poll them, do not post again
+        async def resume(id_cola, page):
+            async with slots:
+                return await self._resume_batch(spec, batch_version, id_cola, page, pool)
+
+        in_flight = self._in_flight(spec, batch_version)
+        outcomes = await asyncio.gather(*(resume(id_cola, page) for id_cola, page in in_flight.items()),
+                                        return_exceptions=True)
+        self._add_counts(spec, counts, 'resumed', outcomes)
+
+        tasks = []
+        after_id = None
+
+        try:
+            while True:
+                # Next page is read while earlier batches are in flight
+                await slots.acquire()
+                page = self.db_manager.fetch_pending(spec, batch_version, limit=self.batch_size, after_id=after_id)
+                if not page:
+                    slots.release()
+                    break
+                after_id = page[-1][0]
+
+                task = asyncio.create_task(self._upload_batch(spec, batch_version, page, pool))
+                task.add_done_callback(lambda _: slots.release())
+                tasks.append(task)
+        except BaseException:
+            # Paging failed: do not leave the batches already started running unawaited
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        self._add_counts(spec, counts, 'batches', await asyncio.gather(*tasks, return_exceptions=True))
+        return counts
+
+    @staticmethod
+    def _add_counts(spec, counts, counter, outcomes):
+        """Add the counts of gathered batches; a batch that raised is logged and counted in errors"""
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                logger.error(f"Batch of {spec.name} failed: {type(outcome).__name__}: {outcome}")
+                counts['errors'] += 1
+                continue
+            counts[counter] += 1
+            for key, value in outcome.items():
+                counts[key] += value
+
+    async def _retry_table(self, spec, batch_version, pool, retries):
+        counts = {'batches': 0, 'uploaded': 0, 'rejected': 0, 'unresolved': 0, 'errors': 0,
+                  'completed': 0, 'rescheduled': 0, 'abandoned': 0}
+        ids = [row[1] for row in retries]
+        # Only records still rejected are sent, the others were resolved by a later scan or upload
+        page = [(record_id, hash_value) for record_id, hash_value, status in self._tracking_rows(spec, batch_version, ids)
+                if status == 2]
+
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def upload(batch):
+            async with slots:
+                return await self._upload_batch(spec, batch_version, batch, pool)
+
+        batches = [page[start:start + self.batch_size] for start in range(0, len(page), self.batch_size)]
+        outcomes = await asyncio.gather(*(upload(batch) for batch in batches), return_exceptions=True)
+        self._add_counts(spec, counts, 'batches', outcomes)
+
+        statuses = {str(record_id): status for record_id, _, status in self._tracking_rows(spec, batch_version, ids)}
+        failed = [row for row in retries if statuses.get(str(row[1])) == 2]
+        done = [row for row in retries if statuses.get(str(row[1])) != 2]
+
+        connection = self.db_manager.connection
+        try:
+            if not connection.in_transaction:
+                connection.execute("BEGIN")
+            self.retry_scheduler.complete(done)
+            rescheduled, abandoned = self.retry_scheduler.fail(failed)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+        counts.update({'completed': len(done), 'rescheduled': rescheduled, 'abandoned': abandoned})
+        return counts
+
+    def _tracking_rows(self, spec, batch_version, ids):
+        """(id, hash_comparador, status) of the given tracking ids"""
+        sql = spec.statement('upload_tracking_rows', lambda spec: (
+            f"SELECT {spec.id_column}, hash_comparador, status FROM {spec.name} "
+            f"WHERE batch_version = ? AND {spec.id_column} IN (SELECT value FROM json_each(?))"
+        ))
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(sql, (batch_version, json.dumps(ids)))
+        return cursor.fetchall()
+
+    def _in_flight(self, spec, batch_version):
+        """{id_cola: [(id, hash_comparador), ...]} of pending rows already accepted by the server"""
+        if not {'id_cola', 'psql_id'} <= spec.column_set:
+            return {}
+        sql = spec.statement('upload_in_flight', lambda spec: (
+            f"SELECT id_cola, {spec.id_column}, hash_comparador FROM {spec.name} "
+            f"WHERE id_cola <> 0 AND psql_id = 0 AND status = 0 AND batch_version = ? "
+            f"ORDER BY id_cola"
+        ))
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(sql, (batch_version,))
+        batches = {}
+        for id_cola, record_id, hash_value in cursor.fetchall():
+            batches.setdefault(id_cola, []).append((record_id, hash_value))
+        return batches
+
+    def _set_queue(self, spec, batch_version, page, id_cola):
+        """Save (or clear, id_cola 0) the queue id of a batch's rows, in its own transaction"""
+        if 'id_cola' not in spec.column_set:
+            return
+        connection = self.db_manager.connection
+        try:
+            if not connection.in_transaction:
+                connection.execute("BEGIN")
+            connection.executemany(
+                f"UPDATE {spec.name} SET id_cola = ? "
+                f"WHERE batch_version = ? AND {spec.id_column} = ? AND hash_comparador = ?",
+                [(id_cola, batch_version, record_id, hash_value) for record_id, hash_value in page]
+            )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    def _documents(self, spec, batch_version, page):
+        """Per-record documents of a page of pending rows (id, hash_comparador)"""
+        columns = [column for column in DOCUMENT_COLUMNS if column in spec.column_set]
+        sql = spec.statement('upload_documents', lambda spec: (
+            f"SELECT {spec.id_column}, {', '.join(columns)} FROM {spec.name} "
+            f"WHERE batch_version = ? AND {spec.id_column} IN (SELECT value FROM json_each(?))"
+        ))
+        cursor = self.db_manager.connection.cursor()
+        cursor.execute(sql, (batch_version, json.dumps([row[0] for row in page])))
+
+        documents = []
+        for row in cursor.fetchall():
+            document = {'id': row[0]}
+            document.update(zip(columns, row[1:]))
+            if self.document_builder:
+                document = self.document_builder(spec, document)
+            documents.append(document)
+        return documents
+
+    async def _upload_batch(self, spec, batch_version, page, pool):
+        documents = self._documents(spec, batch_version, page)
+        request = {'tabla': spec.name, 'batch_version': batch_version, 'registros': documents}
+        post_text = get_text = None
+        id_cola = None
+        results = []
+        batch_error = None
+
+        try:
+            status, post_data, post_text = await pool.request_json('POST', '/lotes', request)
+            if status not in (200, 201, 202) or not post_data or 'id_cola' not in post_data:
+                raise HttpError(f"POST /lotes answered {status}: {post_text[:200]}")
+            id_cola = post_data['id_cola']
+            # From here on the batch is on the server: a failed or timed out poll is resumed next run
+            self._set_queue(spec, batch_version, page, id_cola)
+
+            results, get_text = await self._poll(spec, id_cola, pool)
+
+        except HttpError as e:
+            logger.error(f"Upload of {len(page)} rows of {spec.name} failed: {e}")
+            if id_cola is None:
+                # Never accepted by the server: the whole batch is rejected and retried later
+                batch_error = str(e)
+                results = [{'id': record_id, 'status': 'error', 'error': batch_error} for record_id, _ in page]
+
+        return self._apply_batch(spec, batch_version, page, request, id_cola, results, post_text, get_text)
+
+    async def _poll(self, spec, id_cola, pool):
+        """GET /lotes/<id_cola> until processed or poll_timeout; returns (results, response text), None results on 404"""
+        deadline = time.monotonic() + self.poll_timeout
+        while True:
+            status, get_data, get_text = await pool.request_json('GET', f"/lotes/{id_cola}")
+            if status == 404:
+                return None, get_text
+            if status == 200 and get_data and get_data.get('estado') != 'pendiente':
+                return get_data.get('registros', []), get_text
+            if time.monotonic() >= deadline:
+                logger.warning(f"Batch {id_cola} of {spec.name} not processed after {self.poll_timeout}s")
+                return [], get_text
+            await asyncio.sleep(self.poll_interval)
+
+    async def _resume_batch(self, spec, batch_version, id_cola, page, pool):
+        """Poll a batch posted by an earlier run and apply its outcome"""
+        request = {'tabla': spec.name, 'batch_version': batch_version,
+                   'registros': self._documents(spec, batch_version, page)}
+        get_text = None
+        results = []
+        try:
+            results, get_text = await self._poll(spec, id_cola, pool)
+        except HttpError as e:
+            logger.error(f"Polling batch {id_cola} of {spec.name} failed: {e}")
+
+        if results is None:
+            logger.warning(f"Batch {id_cola} of {spec.name} unknown to the server, its {len(page)} rows will be sent again")
+            self._set_queue(spec, batch_version, page, 0)
+            results = []
+        return self._apply_batch(spec, batch_version, page, request, id_cola, results, None, get_text)
+
+    def _apply_batch(self, spec, batch_version, page, request, id_cola, results, post_text, get_text):
+        """Write the outcome of one batch, its retries and its api_log entry in one transaction"""
+        hashes = dict(page)
+        references = {document.get('id'): document.get('referencia') for document in request['registros']}
+        has_psql_id = 'psql_id' in spec.column_set
+        has_id_cola = 'id_cola' in spec.column_set
+        queue_values = (id_cola,) if has_id_cola else ()
+
+        accepted = []
+        rejected = []
+        retries = []
+        for result in results:
+            record_id = result.get('id')
+            if record_id not in hashes:
+                continue
+            key = (batch_version, record_id, hashes[record_id])
+            if result.get('status') == 'ok':
+                psql_values = (result.get('psql_id') or 0,) if has_psql_id else ()
+                accepted.append(psql_values + queue_values + key)
+            else:
+                rejected.append(queue_values + key)
+                retries.append((record_id, references.get(record_id), result.get('error')))
+
+        accepted_set = "status = 1" + (", psql_id = ?" if has_psql_id else "") + (", id_cola = ?" if has_id_cola else "")
+        rejected_set = "status = 2" + (", id_cola = ?" if has_id_cola else "")
+        where = f"WHERE batch_version = ? AND {spec.id_column} = ? AND hash_comparador = ?"
+
+        connection = self.db_manager.connection
+        cursor = connection.cursor()
+        try:
+            if not connection.in_transaction:
+                connection.execute("BEGIN")
+            if accepted:
+                cursor.executemany(f"UPDATE {spec.name} SET {accepted_set} {where}", accepted)
+            if rejected:
+                cursor.executemany(f"UPDATE {spec.name} SET {rejected_set} {where}", rejected)
+            if retries and self.retry_scheduler:
+                self.retry_scheduler.schedule(spec.name, retries)
+            self.api_log.log(spec.name, None if id_cola is None else str(id_cola),
+                             json.dumps(request, ensure_ascii=False), post_text, get_text,
+                             error=len(accepted) < len(page))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+        self.db_manager.metrics.add('upload', spec.name, rows=len(page),
+                                    statements=2 + len(accepted) + len(rejected))
+        return {
+            'uploaded': len(accepted),
+            'rejected': len(rejected),
+            'unresolved': len(page) - len(accepted) - len(rejected)
+        }
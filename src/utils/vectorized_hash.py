@@ -0,0 +1,123 @@
+from .hash_strategies import FIELD_PADDING
+
+try:
+    import numpy as np
+except ImportError:  # optional, RecordHasher falls back to the per-record path
+    np = None
+
+# Records hashed per chunk, large enough that NumPy call overhead is negligible
+DEFAULT_CHUNK_RECORDS = 131072
+
+
+def numpy_available():
+    return np is not None
+
+
+class VectorizedHasher:
+    """
+    Computes the tracking rows of a RecordHasher chunk by chunk with NumPy.
+
+    The records of a chunk are viewed as a (records x record_length) byte matrix
+    over the memory map; the id_fields / hash_fields columns are sliced out as
+    fixed-width byte strings, trimmed and joined for the whole chunk at once, and
+    the deletion flags are a single comparison. Only the digests themselves are
+    still computed per record. Used for natural_key and composed_hash tables,
+    physical_position ids are just the record numbers.
+
+    Fields are trimmed of FIELD_PADDING (spaces and NULs) exactly like
+    build_field_normalizer, so ids do not depend on which path computed them.
+    """
+
+    def __init__(self, hasher, chunk_records=DEFAULT_CHUNK_RECORDS) -> None:
+        if np is None:
+            raise RuntimeError("NumPy is not installed")
+        self.hasher = hasher
+        self.reader = hasher.reader
+        self.chunk_records = max(1, chunk_records)
+
+    def _matrix(self, start, count):
+        reader = self.reader
+        return np.frombuffer(reader._buffer, dtype=np.uint8, count=count * reader.record_length,
+                             offset=reader.record_offset(start)).reshape(count, reader.record_length)
+
+    @staticmethod
+    def _trimmed_column(matrix, begin, end):
+        """
+        One field of every record with FIELD_PADDING trimmed from both ends, as an array
+        of byte strings. Trimmed on the byte matrix: np.char.strip stops at NUL in its
+        chars argument, and the fixed-width S dtype only drops trailing NULs.
+        """
+        field = matrix[:, begin:end]
+        width = end - begin
+        content = np.ones(field.shape, dtype=bool)
+        for pad in FIELD_PADDING:
+            content &= field != pad
+        has_content = content.any(axis=1)
+        first = np.where(has_content, content.argmax(axis=1), 0)
+        stop = np.where(has_content, width - content[:, ::-1].argmax(axis=1), 0)
+
+        # Shift each field left to its first content byte and NUL-fill past its last one;
+        # the S dtype then drops that fill, inner NULs are kept
+        positions = np.arange(width)
+        shifted = np.take_along_axis(field, np.minimum(positions + first[:, None], width - 1), axis=1)
+        shifted[positions >= (stop - first)[:, None]] = 0
+        return np.ascontiguousarray(shifted).view(f"S{width}").ravel()
+
+    def _joined_fields(self, matrix, slices, separator):
+        """Trimmed fields of every record joined with separator, as an array of byte strings"""
+        joined = None
+        for begin, end in slices:
+            column = self._trimmed_column(matrix, begin, end)
+            joined = column if joined is None else np.char.add(np.char.add(joined, separator), column)
+        return joined
+
+    def _ids(self, matrix):
+        hasher = self.hasher
+        if hasher.schema == 'natural_key':
+            joined = self._joined_fields(matrix, hasher._id_slices, b'|')
+            return np.char.decode(joined, self.reader.encoding, 'replace').tolist()
+
+        joined = self._joined_fields(matrix, hasher._hash_slices, hasher.separator)
+        digest = hasher.digest
+        return [digest(value) for value in joined.tolist()]
+
+    def chunk_rows(self, start, stop):
+        """Tracking rows of records start..stop (1-based, inclusive), same as RecordHasher.row"""
+        stop = min(stop, self.reader.record_count)
+        count = stop - start + 1
+        if count <= 0:
+            return []
+
+        hasher = self.hasher
+        matrix = self._matrix(start, count)
+        deleted = (matrix[:, 0] == ord('*')).tolist()
+        ids = self._ids(matrix)
+
+        # One copy of the chunk; hashes and optional fields read slices of it
+        length = self.reader.record_length
+        records = memoryview(matrix.tobytes())
+        digest = hasher.digest
+        reference = hasher._reference
+        date = hasher._date
+
+        rows = []
+        for index in range(count):
+            record = records[index * length:(index + 1) * length]
+            rows.append((
+                ids[index],
+                digest(record[1:]),
+                reference(record) if reference else None,
+                date(record) if date else None,
+                1 if deleted[index] else 0
+            ))
+        return rows
+
+    def ranges(self, start=1, stop=None):
+        """(start, stop) record ranges of at most chunk_records records"""
+        stop = self.reader.record_count if stop is None else min(stop, self.reader.record_count)
+        for chunk_start in range(start, stop + 1, self.chunk_records):
+            yield chunk_start, min(chunk_start + self.chunk_records - 1, stop)
+
+    def rows(self, start=1, stop=None):
+        for chunk_start, chunk_stop in self.ranges(start, stop):
+            yield from self.chunk_rows(chunk_start, chunk_stop)
@@ -0,0 +1,241 @@
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+from .dbf_reader import DbfReader
+
+logger = logging.getLogger(__name__)
+
+# Header bytes 1-7: last update date (YMD) and record count, rewritten by every append
+STAMP_HEADER_BYTES = 8
+
+
+def read_stamp(path):
+    """
+    Cheap change stamp of a DBF: size, mtime and the header's update date and record
+    count. The header is read too because a POS that keeps the file open does not
+    always move the mtime until it closes it. None if the file cannot be read.
+    """
+    try:
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            header = file.read(STAMP_HEADER_BYTES)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, header
+
+
+class DebounceScheduler:
+    """
+    Per-table debounce of DBF changes.
+
+    A POS writes a sale as a burst (header, records, memo, index), so a table is only
+    due once it has been quiet for quiet seconds since its last observed change, or
+    max_delay seconds after the first change of a burst that never settles. Failed
+    syncs are retried with an exponential backoff capped at max_delay.
+    """
+
+    def __init__(self, quiet=2.0, max_delay=30.0) -> None:
+        self.quiet = quiet
+        self.max_delay = max(max_delay, quiet)
+        self.stamps = {}
+        self.first_change = {}
+        self.last_change = {}
+        self.failures = {}
+
+    def observe(self, table_name, stamp, now):
+        """Record the current stamp of a table; returns True if it changed since the last poll"""
+        if stamp is None or self.stamps.get(table_name) == stamp:
+            return False
+        self.stamps[table_name] = stamp
+        self.first_change.setdefault(table_name, now)
+        self.last_change[table_name] = now
+        return True
+
+    def pending(self):
+        return list(self.first_change)
+
+    def due(self, now):
+        """Tables ready to sync, the longest waiting first"""
+        ready = [
+            table_name for table_name, first in self.first_change.items()
+            if now - self.last_change[table_name] >= self.quiet or now - first >= self.max_delay
+        ]
+        return sorted(ready, key=self.first_change.get)
+
+    def done(self, table_name):
+        self.first_change.pop(table_name, None)
+        self.last_change.pop(table_name, None)
+        self.failures.pop(table_name, None)
+
+    def failed(self, table_name, now):
+        """Schedule a failed table again after the backoff delay"""
+        failures = self.failures[table_name] = self.failures.get(table_name, 0) + 1
+        delay = min(self.max_delay, self.quiet * 2 ** failures)
+        # due() compares against quiet, so shift the change time forward by the extra wait
+        self.first_change[table_name] = now + delay - self.max_delay
+        self.last_change[table_name] = now + delay - self.quiet
+        return delay
+
+
+class WatchManager:
+    """
+    Long running sync loop: keeps one DatabaseManager (connection, compiled specs,
+    shard writers' layout) open and, every interval seconds, stats the DBF of each
+    watched table. Changed tables go through the DebounceScheduler and at most
+    max_tables of them are scanned per cycle with DatabaseManager.scan_tables, so the
+    parallel and shard settings still decide how the work is spread. With upload on,
+    the scanned tables are uploaded right after.
+
+    The settings are read again every cycle (setup.json is mtime-cached), so the
+    table list and timings can change without restarting. A heartbeat JSON with the
+    state of every table is written to heartbeat_path every heartbeat_interval seconds.
+
+    Change detection is by polling; a poll costs one stat and an 8 byte read per table.
+    """
+
+    def __init__(self, db_manager) -> None:
+        self.db_manager = db_manager
+        self.scheduler = DebounceScheduler()
+        self.stop_event = threading.Event()
+        self.started = None
+        self.cycles = 0
+        self.syncs = 0
+        self.last_error = None
+        self.tables = {}
+        self._paths = {}
+        self._last_heartbeat = 0.0
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _params(self):
+        params = self.db_manager.list_manager.get_watch_params()
+        self.scheduler.quiet = params.get('quiet', 2.0)
+        self.scheduler.max_delay = max(params.get('max_delay', 30.0), self.scheduler.quiet)
+        return params
+
+    def _table_names(self, params):
+        return params.get('tables') or self.db_manager.list_manager._fetch_list('scan')
+
+    def _dbf_path(self, table_name, folder):
+        path = self._paths.get(table_name)
+        if path is None or not os.path.exists(path):
+            path = self._paths[table_name] = DbfReader.find_table_file(folder, table_name)
+        return path
+
+    def _table_state(self, table_name):
+        return self.tables.setdefault(table_name, {
+            'state': 'idle', 'last_change': None, 'last_sync': None, 'last_result': None, 'failures': 0
+        })
+
+    def poll(self, table_names, now):
+        """Stat the DBF of every table and feed the scheduler; returns the tables that changed"""
+        folder = self.db_manager.list_manager.get_dbf_params().get('path')
+        changed = []
+        for table_name in table_names:
+            path = self._dbf_path(table_name, folder)
+            if path and self.scheduler.observe(table_name, read_stamp(path), now):
+                changed.append(table_name)
+                state = self._table_state(table_name)
+                state['state'] = 'pending'
+                state['last_change'] = _timestamp()
+        return changed
+
+    def sync(self, table_names, upload=False):
+        """Scan (and optionally upload) the given tables; returns {table: counts or None}"""
+        results = {}
+        try:
+            # The stamp already changed: an unchanged-header skip could miss an in-place edit
+            self.db_manager.scan_tables(table_names, results=results, force=True)
+            if upload:
+                scanned = [name for name in table_names if results.get(name) is not None]
+                if scanned and not self.db_manager.upload_tables(scanned):
+                    self.last_error = f"upload failed for {scanned}"
+        except Exception as e:
+            logger.error(f"Error syncing {table_names}: {e}")
+            self.last_error = f"{type(e).__name__}: {e}"
+        return results
+
+    def cycle(self, now=None):
+        """One poll + sync round; returns the tables synced"""
+        params = self._params()
+        now = time.monotonic() if now is None else now
+        table_names = self._table_names(params)
+        self.poll(table_names, now)
+
+        due = self.scheduler.due(now)[:max(1, params.get('max_tables', 4))]
+        if due:
+            logger.info(f"Syncing changed tables: {due}")
+            upload = params.get('upload', False) and bool(self.db_manager.list_manager.get_upload_params().get('url'))
+            results = self.sync(due, upload=upload)
+            for table_name in due:
+                state = self._table_state(table_name)
+                counts = results.get(table_name)
+                if counts is None:
+                    delay = self.scheduler.failed(table_name, time.monotonic())
+                    state['state'] = 'failed'
+                    state['failures'] += 1
+                    logger.warning(f"Sync of {table_name} failed, retrying in {delay:.0f}s")
+                else:
+                    self.scheduler.done(table_name)
+                    state.update(state='idle', last_sync=_timestamp(), last_result=counts, failures=0)
+                    self.syncs += 1
+
+        self.cycles += 1
+        return due
+
+    def heartbeat(self, params):
+        """Status of the daemon, written atomically to heartbeat_path if configured"""
+        status = {
+            'pid': os.getpid(),
+            'started': self.started,
+            'updated': _timestamp(),
+            'cycles': self.cycles,
+            'syncs': self.syncs,
+            'pending': self.scheduler.pending(),
+            'last_error': self.last_error,
+            'tables': self.tables
+        }
+        path = params.get('heartbeat_path')
+        if path:
+            try:
+                temp_path = f"{path}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as file:
+                    json.dump(status, file, indent=2, default=str)
+                os.replace(temp_path, path)
+            except OSError as e:
+                logger.error(f"Error writing heartbeat to {path}: {e}")
+        logger.debug(f"Heartbeat: {self.cycles} cycles, {self.syncs} syncs, pending {status['pending']}")
+        return status
+
+    def run(self, max_cycles=None):
+        """Poll until stop() (or max_cycles rounds); the database must already be connected"""
+        self.started = _timestamp()
+        logger.info("Watching DBF files for changes")
+        while not self.stop_event.is_set():
+            params = self._params()
+            try:
+                self.cycle()
+            except Exception as e:
+                logger.error(f"Error in watch cycle: {e}")
+                self.last_error = f"{type(e).__name__}: {e}"
+
+            now = time.monotonic()
+            if now - self._last_heartbeat >= params.get('heartbeat_interval', 30):
+                self.heartbeat(params)
+                self._last_heartbeat = now
+
+            if max_cycles is not None and self.cycles >= max_cycles:
+                break
+            self.stop_event.wait(params.get('interval', 1.0))
+
+        self.heartbeat(self._params())
+        logger.info(f"Watch stopped after {self.cycles} cycles and {self.syncs} table syncs")
+
+
+def _timestamp():
+    return datetime.datetime.now().isoformat(timespec='seconds')